@@ -1,10 +1,11 @@
 from datetime import datetime, timedelta
 
-from firebase_admin import firestore
 from plyer import notification
 
-# Firebase initialization
-db = firestore.client()
+from storage import get_db
+
+# Initialize the document store
+db = get_db()
 
 
 def send_desktop_notification(title, message):
@@ -0,0 +1,368 @@
+import atexit
+import queue
+import threading
+
+import numpy as np
+import pyttsx3
+import speech_recognition as sr
+
+SPEECH_RATE = 250  # Adjust speaking rate if needed
+
+# Barge-in tuning: speech must be this much louder than the recognizer's energy threshold, for this long,
+# before playback is cut, so the assistant's own voice leaking into the microphone does not interrupt it
+BARGE_IN_ENERGY_FACTOR = 1.5
+BARGE_IN_MIN_SPEECH = 0.3  # seconds
+BARGE_IN_PHRASE_LIMIT = 10  # seconds
+# Sample types of the raw microphone buffers, by sample width in bytes
+SAMPLE_TYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def rms(buffer, sample_width):
+    """
+    Returns the root mean square of a buffer of raw signed samples, as audioop.rms() did.
+    """
+    samples = np.frombuffer(buffer, SAMPLE_TYPES[sample_width]).astype(np.float64)
+    return int(np.sqrt(np.mean(samples ** 2))) if len(samples) else 0
+
+
+class MicrophoneSource:
+    """
+    Audio source backed by a single microphone stream that stays open for the whole session.
+    """
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+        self._microphone = None
+        self._stream = None
+
+    def _open(self):
+        if self._stream is None:
+            self._microphone = sr.Microphone()
+            self._stream = self._microphone.__enter__()
+        return self._stream
+
+    def recognize(self, audio):
+        """
+        Recognizes recorded audio.
+
+        Returns:
+            str: The text, None if nothing was understood, or an empty string if the voice service is
+            unavailable.
+        """
+        try:
+            command = self.recognizer.recognize_google(audio)
+            print("Command : " + command)
+            return command
+        except sr.UnknownValueError:
+            return None
+        except sr.RequestError:
+            return ""
+
+    def listen(self):
+        """
+        Blocks until a phrase is recognized.
+
+        Returns:
+            str: The recognized text, or an empty string if the voice service is unavailable.
+        """
+        source = self._open()
+        while True:
+            print("Listening...")
+            try:
+                audio = self.recognizer.listen(source)
+            except sr.WaitTimeoutError:
+                continue
+            command = self.recognize(audio)
+            if command is not None:
+                return command
+
+    def listen_for_barge_in(self, stop_event, on_speech_start):
+        """
+        Watches the microphone while speech is playing.
+
+        Calls on_speech_start as soon as the user starts talking, then records the phrase until the
+        user pauses and recognizes it.
+
+        Parameters:
+            stop_event (threading.Event): Set when playback finished without an interruption.
+            on_speech_start (callable): Called once speech is detected, should stop playback.
+
+        Returns:
+            str: The recognized phrase, None if there was no barge-in, or the recorded sr.AudioData if the
+            voice service was unavailable, for recognize() to retry.
+        """
+        source = self._open()
+        seconds_per_buffer = source.CHUNK / source.SAMPLE_RATE
+        onset_buffers = max(1, int(BARGE_IN_MIN_SPEECH / seconds_per_buffer))
+        pause_buffers = max(1, int(self.recognizer.pause_threshold / seconds_per_buffer))
+        limit_buffers = int(BARGE_IN_PHRASE_LIMIT / seconds_per_buffer)
+
+        frames = []
+        loud = 0
+        while not stop_event.is_set():
+            buffer = source.stream.read(source.CHUNK)
+            frames = (frames + [buffer])[-onset_buffers:]
+            energy = rms(buffer, source.SAMPLE_WIDTH)
+            loud = loud + 1 if energy > self.recognizer.energy_threshold * BARGE_IN_ENERGY_FACTOR else 0
+            if loud >= onset_buffers:
+                break
+        else:
+            return None
+
+        on_speech_start()
+        quiet = 0
+        while quiet < pause_buffers and len(frames) < limit_buffers:
+            buffer = source.stream.read(source.CHUNK)
+            frames.append(buffer)
+            energy = rms(buffer, source.SAMPLE_WIDTH)
+            quiet = quiet + 1 if energy <= self.recognizer.energy_threshold else 0
+
+        audio = sr.AudioData(b"".join(frames), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        phrase = self.recognize(audio)
+        # Playback is already cut: rather than lose the phrase, keep the audio to try again
+        return audio if phrase == "" else phrase
+
+    def close(self):
+        if self._microphone is not None:
+            self._microphone.__exit__(None, None, None)
+            self._microphone = None
+            self._stream = None
+
+
+class Pyttsx3Sink:
+    """
+    TTS sink speaking through pyttsx3. Must be created and used on the speech worker thread.
+    """
+
+    def __init__(self):
+        self._stop_requested = threading.Event()
+        self.engine = pyttsx3.init()
+        self.engine.setProperty('rate', SPEECH_RATE)
+        # Stop requests are honoured from inside the engine loop, the only place pyttsx3 allows it
+        self.engine.connect('started-word', self._on_word)
+
+    def _on_word(self, name, location, length):
+        if self._stop_requested.is_set():
+            self.engine.stop()
+
+    def say(self, text):
+        """
+        Speaks text, returning when it has been spoken or stop() was called.
+        """
+        self.engine.say(text)
+        self.engine.runAndWait()
+        self._stop_requested.clear()
+
+    def stop(self):
+        """
+        Cuts the current utterance short. Safe to call from any thread.
+        """
+        self._stop_requested.set()
+
+
+class PrintSink:
+    """
+    Fallback sink used when no TTS engine is available.
+    """
+
+    def say(self, text):
+        print(text)
+
+    def stop(self):
+        pass
+
+
+# The audio source and TTS sink in use, replaceable through configure()
+_source = None
+_sink = None
+_sink_factory = None
+
+# Utterances waiting to be spoken, as (text, interruptible, on_start callback, done event) tuples
+_speech_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_source_lock = threading.Lock()
+
+# Phrase the user spoke over interruptible speech, handed to the next listen(); the recorded audio instead if
+# it could not be recognized yet
+_barge_in_utterance = None
+
+
+def configure(source=None, sink_factory=None):
+    """
+    Replaces the audio source and TTS sink, e.g. with fakes for testing.
+
+    The source needs listen(), recognize(audio) and listen_for_barge_in(stop_event, on_speech_start)
+    methods, and the sink say(text) and stop() methods like MicrophoneSource and Pyttsx3Sink; tests/audio_fakes
+    has scripted ones. The sink must be set before the first speak().
+
+    Parameters:
+        source: The audio source to listen on.
+        sink_factory (callable): Builds the TTS sink, called on the speech worker thread.
+    """
+    global _source, _sink_factory
+    if source is not None:
+        _source = source
+    if sink_factory is not None:
+        _sink_factory = sink_factory
+
+
+def _get_source():
+    global _source
+    if _source is None:
+        _source = MicrophoneSource()
+    return _source
+
+
+def _create_sink():
+    if _sink_factory is not None:
+        return _sink_factory()
+    try:
+        return Pyttsx3Sink()
+    except Exception as e:
+        print(f"Text-to-speech unavailable, printing instead: {e}")
+        return PrintSink()
+
+
+def _discard_pending_speech():
+    while True:
+        try:
+            _, _, _, done = _speech_queue.get_nowait()
+        except queue.Empty:
+            return
+        done.set()
+        _speech_queue.task_done()
+
+
+def _say_interruptible(text):
+    """
+    Speaks text while watching the microphone, stopping playback as soon as the user talks over it.
+    """
+    global _barge_in_utterance
+    finished = threading.Event()
+    heard = []
+
+    def watch():
+        with _source_lock:
+            heard.append(_get_source().listen_for_barge_in(finished, _sink.stop))
+
+    watcher = threading.Thread(target=watch, name="barge-in-watcher", daemon=True)
+    watcher.start()
+    _sink.say(text)
+    finished.set()
+    watcher.join()
+
+    if heard and heard[0] is not None:
+        _barge_in_utterance = heard[0]
+        # The user has taken over, whatever was still queued is no longer wanted
+        _discard_pending_speech()
+
+
+def _speech_worker():
+    """
+    Speaks queued utterances one after another on a single TTS sink.
+    """
+    global _sink
+    # pyttsx3 engines have to be driven from the thread that created them
+    _sink = _create_sink()
+
+    while True:
+        text, interruptible, on_start, done = _speech_queue.get()
+        try:
+            if on_start is not None:
+                on_start()
+            if interruptible:
+                _say_interruptible(text)
+            else:
+                _sink.say(text)
+        except Exception as e:
+            print(f"Error during speech: {e}")
+        finally:
+            done.set()
+            _speech_queue.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_speech_worker, name="speech-worker", daemon=True)
+            _worker.start()
+
+
+def speak(text, wait=False, interruptible=False, on_start=None):
+    """
+    Queues text to be spoken by the background speech worker and returns right away.
+
+    Parameters:
+        text (str): The text to speak.
+        wait (bool): Block until this utterance has been spoken.
+        interruptible (bool): Keep listening while speaking and stop as soon as the user talks;
+            the user's phrase is returned by the next listen().
+        on_start (callable): Called on the speech worker right before the utterance starts playing.
+
+    Returns:
+        threading.Event: Set once the utterance has been spoken, cut short or discarded.
+    """
+    _ensure_worker()
+    done = threading.Event()
+    _speech_queue.put((text, interruptible, on_start, done))
+    if wait:
+        done.wait()
+    return done
+
+
+def wait_for_speech():
+    """
+    Blocks until every queued utterance has been spoken.
+    """
+    _speech_queue.join()
+
+
+def interrupted():
+    """
+    Tells whether the user barged in and their phrase has not been picked up by listen() yet.
+    Callers producing speech piece by piece should stop queueing more when this is True.
+    """
+    return _barge_in_utterance is not None
+
+
+def listen():
+    """
+    Captures a voice command from the shared audio source.
+
+    Queued speech is allowed to finish first, so prompts are heard before listening starts
+    and the assistant does not pick up its own voice. If the user interrupted speech, the
+    interrupting phrase is returned straight away.
+
+    Returns:
+        str: The recognized command, or an empty string if the voice service is unavailable.
+    """
+    global _barge_in_utterance
+    wait_for_speech()
+    command = None
+    if _barge_in_utterance is not None:
+        utterance, _barge_in_utterance = _barge_in_utterance, None
+        if isinstance(utterance, str):
+            return utterance
+        # Recorded while the voice service was unavailable: try it again
+        with _source_lock:
+            command = _get_source().recognize(utterance)
+
+    if command is None:
+        with _source_lock:
+            command = _get_source().listen()
+    if command == "":
+        speak("Voice service unavailable.")
+    return command
+
+
+@atexit.register
+def close():
+    """
+    Lets pending speech finish and releases the audio source.
+    """
+    if _worker is not None:
+        wait_for_speech()
+    if isinstance(_source, MicrophoneSource):
+        _source.close()
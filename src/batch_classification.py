@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+from config import CLASSIFICATION_MANIFEST, CLASSIFY_MAX_CHARS, CLASSIFY_READ_WORKERS, CLASSIFY_WORKERS
+from text_extraction import read_window
+
+PROMPT = "Classify this file content to a category, say only work or personal: "
+# Categories, and the folders move_into_categories() creates for them under the classified folder
+CATEGORIES = ("work", "personal")
+
+
+def read_excerpt(path, max_chars=CLASSIFY_MAX_CHARS):
+    """
+    Reads the start of a document's text, as much as is sent for classification.
+
+    Returns:
+        tuple: (excerpt, hash of the excerpt), or (None, None) for binary, empty or unreadable files.
+    """
+    try:
+        excerpt = read_window(path, max_chars)
+    except OSError:
+        return None, None
+    if not excerpt.strip():
+        return None, None
+    return excerpt, hashlib.sha256(excerpt.encode("utf-8")).hexdigest()
+
+
+def parse_category(text):
+    text = text.strip().lower()
+    return "work" if "work" in text else "personal"
+
+
+class ClassificationManifest:
+    """
+    Local record of classified files: the category of each path, and of each content hash, so files whose
+    content was already classified, wherever they are, are not sent to Gemini again.
+    """
+
+    def __init__(self, path=CLASSIFICATION_MANIFEST):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        self.by_hash = data.get("by_hash", {})
+        self.files = data.get("files", {})
+
+    def category_for(self, content_hash):
+        return self.by_hash.get(content_hash)
+
+    def record(self, path, content_hash, category):
+        with self._lock:
+            self.by_hash[content_hash] = category
+            self.files[str(path)] = {"hash": content_hash, "category": category,
+                                     "classified_at": datetime.now().isoformat(timespec="seconds")}
+
+    def moved(self, old_path, new_path):
+        with self._lock:
+            entry = self.files.pop(str(old_path), None)
+            if entry is not None:
+                self.files[str(new_path)] = entry
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_suffix(".tmp")
+            temporary.write_text(json.dumps({"by_hash": self.by_hash, "files": self.files}, indent=1),
+                                 encoding="utf-8")
+            temporary.replace(self.path)
+
+
+def classify_file(model, path, manifest=None, max_chars=CLASSIFY_MAX_CHARS):
+    """
+    Classifies one file as work or personal from the start of its content, reusing a previous result for
+    the same content.
+
+    Returns:
+        str: "work" or "personal", or None if the file is not text.
+    """
+    manifest = ClassificationManifest() if manifest is None else manifest
+    excerpt, content_hash = read_excerpt(path, max_chars)
+    if excerpt is None:
+        return None
+    category = manifest.category_for(content_hash)
+    if category is None:
+        category = parse_category(model.generate_content(PROMPT + excerpt, call_site="classify_document").text)
+        manifest.record(path, content_hash, category)
+        manifest.save()
+    return category
+
+
+def list_files(folder):
+    """
+    Lists the files under a folder, skipping hidden files and folders, and the category folders that earlier
+    runs moved classified files into.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")
+                       and not (dirpath == str(folder) and name in CATEGORIES)]
+        files.extend(Path(dirpath) / name for name in filenames if not name.startswith("."))
+    return files
+
+
+def classify_folder(model, folder, workers=CLASSIFY_WORKERS, read_workers=CLASSIFY_READ_WORKERS,
+                    max_chars=CLASSIFY_MAX_CHARS, manifest=None):
+    """
+    Classifies every document under a folder as work or personal.
+
+    Files are read concurrently, only their first max_chars characters; contents already classified are
+    answered from the manifest and the rest go to Gemini through a pool of at most workers requests.
+
+    Parameters:
+        model (GeminiClient): The Gemini model to classify with.
+        folder (Path): The folder to classify, subfolders included.
+        workers (int): Most Gemini requests in flight at once.
+        read_workers (int): Files read at once.
+        max_chars (int): Characters of each file sent for classification.
+        manifest (ClassificationManifest): Where results are recorded, the default manifest if not given.
+
+    Returns:
+        dict: {"categories": {path: category}, "classified", "cached", "skipped", "errors", "seconds",
+        "files_per_second"}
+    """
+    manifest = ClassificationManifest() if manifest is None else manifest
+    started = time.perf_counter()
+    files = list_files(folder)
+    report = {"categories": {}, "classified": 0, "cached": 0, "skipped": 0, "errors": 0}
+
+    with ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="classify-reader") as readers:
+        excerpts = list(readers.map(lambda path: (path, *read_excerpt(path, max_chars)), files))
+
+    to_classify = {}
+    for path, excerpt, content_hash in excerpts:
+        if excerpt is None:
+            report["skipped"] += 1
+        elif manifest.category_for(content_hash) is not None:
+            report["categories"][path] = manifest.category_for(content_hash)
+            manifest.record(path, content_hash, report["categories"][path])
+            report["cached"] += 1
+        else:
+            # Files with the same content are only sent once
+            to_classify.setdefault(content_hash, (excerpt, []))[1].append(path)
+
+    def classify(item):
+        content_hash, (excerpt, paths) = item
+        try:
+            response = model.generate_content(PROMPT + excerpt, call_site="classify_document")
+            return content_hash, paths, parse_category(response.text)
+        except Exception as e:
+            print(f"Error classifying '{paths[0]}': {e}")
+            return content_hash, paths, None
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="classifier") as pool:
+        for content_hash, paths, category in pool.map(classify, to_classify.items()):
+            if category is None:
+                report["errors"] += len(paths)
+                continue
+            for path in paths:
+                manifest.record(path, content_hash, category)
+                report["categories"][path] = category
+                report["classified"] += 1
+    manifest.save()
+
+    report["seconds"] = time.perf_counter() - started
+    report["files_per_second"] = len(files) / report["seconds"] if report["seconds"] else 0.0
+    print(f"Classified {len(report['categories'])} of {len(files)} files in {report['seconds']:.1f} s "
+          f"({report['files_per_second']:.1f} files/s): {report['classified']} by Gemini, {report['cached']} "
+          f"from the manifest, {report['skipped']} not text, {report['errors']} errors.")
+    return report
+
+
+def move_into_categories(folder, categories, manifest=None):
+    """
+    Moves classified files into a "work" or "personal" folder directly under the classified folder.
+
+    Parameters:
+        folder (Path): The classified folder.
+        categories (dict): {path: category}, e.g. classify_folder()["categories"].
+
+    Returns:
+        int: The number of files moved.
+    """
+    manifest = ClassificationManifest() if manifest is None else manifest
+    moved = 0
+    for path, category in categories.items():
+        target_folder = Path(folder) / category
+        if Path(path).parent == target_folder:
+            continue
+        target_folder.mkdir(exist_ok=True)
+        target = target_folder / Path(path).name
+        # Never overwrite a file already there
+        counter = 1
+        while target.exists():
+            target = target_folder / f"{Path(path).stem} ({counter}){Path(path).suffix}"
+            counter += 1
+        try:
+            shutil.move(str(path), str(target))
+        except OSError as e:
+            print(f"Error moving '{path}': {e}")
+            continue
+        manifest.moved(path, target)
+        moved += 1
+    manifest.save()
+    print(f"Moved {moved} files into category folders in '{folder}'.")
+    return moved
+
+
+class _FakeModel:
+    """
+    Stands in for Gemini in the benchmark: answers after a fixed latency, like a request would.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt, call_site=None):
+        time.sleep(self.latency)
+        return SimpleNamespace(text=random.choice(CATEGORIES))
+
+
+def benchmark(file_count=400, latency=0.05, workers=CLASSIFY_WORKERS):
+    """
+    Times classify_folder() on generated text files with a fake model taking latency seconds per call, then
+    again with every file answered from the manifest.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        folder = Path(directory) / "documents"
+        for index in range(file_count):
+            subfolder = folder / f"folder{index % 10}"
+            subfolder.mkdir(parents=True, exist_ok=True)
+            (subfolder / f"file{index}.txt").write_text(f"Document {index}\n" + "Some text. " * 200,
+                                                       encoding="utf-8")
+        manifest = ClassificationManifest(Path(directory) / "manifest.json")
+        first = classify_folder(_FakeModel(latency), folder, workers=workers, manifest=manifest)
+        rerun = classify_folder(_FakeModel(latency), folder, workers=workers, manifest=manifest)
+    print(f"{file_count} files, {latency * 1000:.0f} ms per call, {workers} workers: "
+          f"{first['files_per_second']:.0f} files/s, rerun from the manifest {rerun['files_per_second']:.0f} files/s")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,153 @@
+import fnmatch
+import os
+import re
+import shutil
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import BULK_WORKERS
+
+FileInfo = namedtuple("FileInfo", ["name", "path", "size", "modified"])
+
+SORT_KEYS = {
+    "name": (lambda info: info.name.lower(), False),
+    "size": (lambda info: info.size, True),
+    "date": (lambda info: info.modified, True),
+}
+
+
+def scan_files(folder, pattern="*", recursive=False):
+    """
+    Lists the files in a folder whose name matches a glob pattern.
+
+    Uses os.scandir, whose entries carry the file type and, on most systems, the stat result from the directory
+    listing itself, so thousands of files cost a single listing instead of a stat call each.
+
+    Parameters:
+        folder (Path): The folder to list.
+        pattern (str): Glob pattern on the file name, e.g. "*.pdf"; matched case-insensitively.
+        recursive (bool): Include files in subfolders.
+
+    Returns:
+        list of FileInfo: The matching files.
+    """
+    pattern = pattern.lower()
+    files, stack = [], [str(folder)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.is_file() and fnmatch.fnmatchcase(entry.name.lower(), pattern):
+                            stat = entry.stat()
+                            files.append(FileInfo(entry.name, Path(entry.path), stat.st_size, stat.st_mtime))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Error reading '{folder}': {e}")
+    return files
+
+
+def sort_files(files, sort_by="name"):
+    """
+    Sorts files by "name" (A to Z), "size" (largest first) or "date" (newest first).
+    """
+    key, reverse = SORT_KEYS.get(sort_by, SORT_KEYS["name"])
+    return sorted(files, key=key, reverse=reverse)
+
+
+def to_glob(text):
+    """
+    Turns a spoken selection into a glob pattern: "star dot pdf", ".pdf" and "pdf" all become "*.pdf"; a pattern
+    with wildcards or a full file name is kept as it is.
+    """
+    pattern = re.sub(r"\bstar\b", "*", text.strip().lower())
+    pattern = re.sub(r"\s*\bdot\b\s*", ".", pattern).replace(" ", "")
+    if "*" in pattern or "?" in pattern or "." in pattern[1:]:
+        return pattern
+    return "*" + pattern if pattern.startswith(".") else "*." + pattern
+
+
+def _free_target(folder, name, claimed):
+    target = folder / name
+    counter = 1
+    while target in claimed or target.exists():
+        target = folder / f"{Path(name).stem} ({counter}){Path(name).suffix}"
+        counter += 1
+    claimed.add(target)
+    return target
+
+
+def _run(operation, files, workers):
+    done, errors = 0, 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk") as pool:
+        for ok in pool.map(operation, files):
+            done += ok
+            errors += not ok
+    return done, errors
+
+
+def bulk_move(files, target_folder, workers=BULK_WORKERS):
+    """
+    Moves files into a folder, several at a time, never overwriting a file already there. Files already in
+    the folder are left where they are.
+
+    Files on the same filesystem as the folder are renamed, which only updates the directory entries; the
+    others are copied and deleted by shutil.move.
+
+    Parameters:
+        files (list of FileInfo): The files to move, e.g. from scan_files().
+        target_folder (Path): The folder to move them into.
+
+    Returns:
+        tuple: (files moved, errors)
+    """
+    target_folder = Path(target_folder)
+    target_folder.mkdir(parents=True, exist_ok=True)
+    target_device = os.stat(target_folder).st_dev
+    # Moving a file into its own folder would only rename it to "name (1)"
+    resolved_target = target_folder.resolve()
+    files = [info for info in files if info.path.parent.resolve() != resolved_target]
+    # Names are claimed up front, so parallel moves of files with the same name cannot collide
+    claimed = set()
+    plan = [(info, _free_target(target_folder, info.name, claimed)) for info in files]
+
+    def move(item):
+        info, target = item
+        try:
+            if os.stat(info.path).st_dev == target_device:
+                os.rename(info.path, target)
+            else:
+                shutil.move(str(info.path), str(target))
+            return True
+        except OSError as e:
+            print(f"Error moving '{info.path}': {e}")
+            return False
+
+    moved, errors = _run(move, plan, workers)
+    print(f"Moved {moved} files to '{target_folder}'" + (f", {errors} failed." if errors else "."))
+    return moved, errors
+
+
+def bulk_delete(files, workers=BULK_WORKERS):
+    """
+    Deletes files, several at a time.
+
+    Returns:
+        tuple: (files deleted, errors)
+    """
+    def delete(info):
+        try:
+            os.unlink(info.path)
+            return True
+        except OSError as e:
+            print(f"Error deleting '{info.path}': {e}")
+            return False
+
+    deleted, errors = _run(delete, files, workers)
+    print(f"Deleted {deleted} files" + (f", {errors} failed." if errors else "."))
+    return deleted, errors
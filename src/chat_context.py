@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CHAT_HISTORY_TURNS, CHAT_TOKEN_BUDGET
+
+# Rough size of a Gemini token in characters, good enough for budgeting without a count_tokens round-trip
+CHARS_PER_TOKEN = 4
+# Upper bound for the rolling summary
+SUMMARY_WORDS = 200
+# Share of the token budget recalled turns may add on top of the summary and the kept turns
+RECALL_BUDGET_SHARE = 0.25
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a text.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ChatContext:
+    """
+    Bounded conversation context for the Gemini chat.
+
+    The last turns are kept verbatim as long as they fit in the token budget; turns falling out of it are
+    folded into a rolling summary in the background. Every request sends the summary, the kept turns and
+    the new command, so prompt size no longer grows with the length of the session. A recall function can
+    add the few past turns most relevant to the command, from any earlier session, within RECALL_BUDGET_SHARE
+    of the token budget.
+    """
+
+    def __init__(self, model, summary="", turns=None, on_summary=None, max_turns=CHAT_HISTORY_TURNS,
+                 token_budget=CHAT_TOKEN_BUDGET, recall=None):
+        """
+        Parameters:
+            model (GeminiClient): The Gemini model to chat with.
+            summary (str): Summary of the conversation so far, e.g. from the previous session.
+            turns (list of tuple): Recent (command, response) turns, oldest first.
+            on_summary (callable): Called with each new summary so it can be persisted.
+            max_turns (int): Most turns kept verbatim.
+            token_budget (int): Most tokens for the summary and the kept turns together.
+            recall (callable): Returns relevant past (command, response) turns for a command.
+        """
+        self.model = model
+        self.summary = summary
+        self.turns = []
+        self.on_summary = on_summary
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.recall = recall
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summarizer")
+        # Carry the summary over to this session, so the next one starts from it even if this one never compacts
+        if summary and on_summary is not None:
+            self._summarizer.submit(on_summary, summary)
+        for command, response in turns or []:
+            self.record_turn(command, response)
+
+    def _recalled(self, command):
+        if self.recall is None or not command:
+            return []
+        try:
+            return self.recall(command)
+        except Exception as e:
+            print(f"Error recalling past conversations: {e}")
+            return []
+
+    def _fit_recalled(self, recalled):
+        """
+        Keeps the recalled turns, most relevant first, that fit in their share of the token budget.
+        """
+        budget = self.token_budget * RECALL_BUDGET_SHARE
+        kept = []
+        for past_command, past_response in recalled:
+            tokens = estimate_tokens(past_command) + estimate_tokens(past_response)
+            if tokens <= budget:
+                kept.append((past_command, past_response))
+                budget -= tokens
+        return kept
+
+    def history(self, command=None):
+        """
+        Returns the bounded history to send with the next message, in start_chat() format.
+        """
+        recalled = self._recalled(command)
+        with self._lock:
+            history = []
+            if self.summary:
+                history.append({"role": "user", "parts": "Summary of our conversation so far: " + self.summary})
+                history.append({"role": "model", "parts": "Got it, I'll keep that in mind."})
+            recalled = self._fit_recalled([turn for turn in recalled if turn not in self.turns])
+            if recalled:
+                exchanges = "\n".join(f"User: {past_command}\nAssistant: {past_response}"
+                                      for past_command, past_response in recalled)
+                history.append({"role": "user", "parts": "Possibly relevant exchanges from earlier "
+                                                         "conversations:\n" + exchanges})
+                history.append({"role": "model", "parts": "Noted, I'll use them if they are relevant."})
+            for command, response in self.turns:
+                history.append({"role": "user", "parts": command})
+                history.append({"role": "model", "parts": response})
+            return history
+
+    def send_message(self, command, stream=False):
+        """
+        Sends a command along with the bounded history. The caller records the turn with record_turn()
+        once the full response text is known.
+        """
+        return self.model.start_chat(history=self.history(command)).send_message(command, stream=stream)
+
+    def _tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(command) + estimate_tokens(response)
+                                                  for command, response in self.turns)
+
+    def record_turn(self, command, response):
+        """
+        Adds a turn, moving the oldest turns out of the verbatim window if it is over its limits.
+        """
+        with self._lock:
+            self.turns.append((command, response))
+            evicted = []
+            while self.turns and (len(self.turns) > self.max_turns or self._tokens() > self.token_budget):
+                evicted.append(self.turns.pop(0))
+        if evicted:
+            self._summarizer.submit(self._fold_into_summary, evicted)
+
+    def _fold_into_summary(self, evicted):
+        """
+        Updates the rolling summary with turns that left the verbatim window.
+        """
+        transcript = "\n".join(f"User: {command}\nAssistant: {response}" for command, response in evicted)
+        prompt = (f"Update the summary of a conversation between a user and their voice assistant with the new "
+                  f"exchanges below. Keep facts, preferences and open requests, in under {SUMMARY_WORDS} words. "
+                  f"Reply with the summary only.\n\nCurrent summary: {self.summary or '(none)'}\n\n"
+                  f"New exchanges:\n{transcript}")
+        try:
+            summary = self.model.generate_content(prompt, call_site="chat_summary", cache=False).text.strip()
+        except Exception as e:
+            print(f"Error updating conversation summary: {e}")
+            return
+        with self._lock:
+            self.summary = summary
+        if self.on_summary is not None:
+            self.on_summary(summary)
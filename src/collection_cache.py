@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import CACHE_MAX_ENTRIES, CACHE_TTL
+from listing import Pager
+from storage import get_db
+
+
+class CollectionCache:
+    """
+    Read-through cache of one collection's documents and query results.
+
+    The cache is filled on first use and kept fresh by an on_snapshot listener on the collection: a change
+    updates the cached document and drops the cached query results, which may no longer match. If the
+    listener cannot be attached or stops, entries expire after ttl seconds instead. Documents and query
+    results share one LRU bound.
+    """
+
+    def __init__(self, name, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        """
+        Parameters:
+            name (str): The collection to cache.
+            max_entries (int): Most documents and query results kept.
+            ttl (float): Lifetime of an entry in seconds while no listener is keeping the cache fresh.
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # ("doc", id) or ("query", key) -> (value, time it was read)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every change, so a read that raced with a change does not store stale data
+        self._generation = 0
+        self._watch = None
+        self._listening = False
+
+    def _collection(self):
+        return get_db().collection(self.name)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listening:
+                return
+            self._listening = True
+        try:
+            self._watch = self._collection().on_snapshot(self._on_snapshot)
+        except Exception as e:
+            print(f"Live updates unavailable for {self.name}, caching for {self.ttl}s instead: {e}")
+
+    def _live(self):
+        return self._watch is not None and getattr(self._watch, "is_active", True)
+
+    def _on_snapshot(self, documents, changes, read_time):
+        """
+        Listener callback, runs on the listener's thread.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key[0] == "query"]:
+                del self._entries[key]
+            for change in changes:
+                key = ("doc", change.document.id)
+                # Only refresh documents already cached; the initial snapshot lists the whole collection
+                if key in self._entries:
+                    value = None if change.type.name == "REMOVED" else change.document.to_dict()
+                    self._entries[key] = (value, time.monotonic())
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self._live() or time.monotonic() - entry[1] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[0], self._generation
+            self.misses += 1
+            return False, None, self._generation
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_document(self, doc_id):
+        """
+        Returns a document's data, or None if it does not exist. Missing documents are cached too.
+        """
+        self._ensure_listener()
+        key = ("doc", doc_id)
+        found, value, generation = self._lookup(key)
+        if not found:
+            snapshot = self._collection().document(doc_id).get()
+            value = snapshot.to_dict() if snapshot.exists else None
+            self._store(key, value, generation)
+        return dict(value) if value is not None else None
+
+    def _query(self, filters):
+        query = self._collection()
+        for field, op, operand in filters:
+            query = query.where(field, op, operand)
+        return query
+
+    def query(self, filters=(), order_by=None, fields=None, limit=None):
+        """
+        Returns the data of the documents matching a query, with their IDs under "id".
+
+        Parameters:
+            filters (list of tuple): (field, operator, value) conditions, as passed to where().
+            order_by (str): Field to sort by; ties are broken by document ID.
+            fields (list of str): Only fetch these fields.
+            limit (int): Most documents returned.
+
+        Returns:
+            list of dict: The matching documents.
+        """
+        self._ensure_listener()
+        key = ("query", repr((list(filters), order_by, fields, limit)))
+        found, value, generation = self._lookup(key)
+        if not found:
+            query = self._query(filters)
+            if fields is not None:
+                query = query.select(fields)
+            if order_by:
+                query = query.order_by(order_by)
+                if order_by != "__name__":
+                    query = query.order_by("__name__")
+            if limit is not None:
+                query = query.limit(limit)
+            value = [dict(doc.to_dict(), id=doc.id) for doc in query.stream()]
+            self._store(key, value, generation)
+        return [dict(document) for document in value]
+
+    def pager(self, filters, fields, order_by="__name__"):
+        """
+        Returns a listing.Pager over a query whose first page is answered from the cache; later pages, only
+        read if the user asks for them, come from the store.
+        """
+        if order_by != "__name__" and order_by not in fields:
+            fields = list(fields) + [order_by]
+        return Pager(self._query(filters), fields, order_by,
+                     first_page=lambda count: self.query(filters, order_by, fields, count))
+
+    def invalidate(self, doc_id=None):
+        """
+        Drops a document and every query result after a local write, without waiting for the listener.
+        Drops everything if no document is given.
+        """
+        with self._lock:
+            self._generation += 1
+            if doc_id is None:
+                self._entries.clear()
+                return
+            self._entries.pop(("doc", doc_id), None)
+            for key in [key for key in self._entries if key[0] == "query"]:
+                del self._entries[key]
+
+    def close(self):
+        """
+        Stops the listener.
+        """
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name):
+    """
+    Returns the shared cache of a collection, created on first use.
+    """
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = CollectionCache(name)
+        return _caches[name]
+
+
+def cache_stats():
+    """
+    Returns hits, misses and hit rate per cached collection.
+
+    Returns:
+        dict: {collection: {"hits", "misses", "hit_rate", "entries", "live"}}
+    """
+    stats = {}
+    for name, cache in _caches.items():
+        lookups = cache.hits + cache.misses
+        stats[name] = {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "hit_rate": cache.hits / lookups if lookups else 0.0,
+            "entries": len(cache._entries),
+            "live": cache._live(),
+        }
+    return stats
+
+
+def print_cache_report():
+    """
+    Prints how many reads each collection cache answered without a round-trip.
+    """
+    stats = cache_stats()
+    if not stats:
+        return
+    print("\nCollection cache:")
+    for name, entry in stats.items():
+        print(f"  {name:<20} {entry['hits']:5d} hits, {entry['misses']:5d} misses ({entry['hit_rate']:.0%} "
+              f"saved), {entry['entries']} entries, {'live' if entry['live'] else 'TTL'}")
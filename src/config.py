@@ -32,3 +32,98 @@ SPOTIPY_REDIRECT_URI = os.getenv("SPOTIPY_REDIRECT_URI")
 
 # YouTube API key
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+
+# Send every command to the Gemini chat, not only the ones no feature handles (the original behaviour)
+CHAT_ON_EVERY_COMMAND = os.getenv("CHAT_ON_EVERY_COMMAND", "false").lower() == "true"
+
+# Chat context sent to Gemini: recent turns kept verbatim, within a token budget; older turns are summarized
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "10"))
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "4000"))
+
+# How session and note IDs are made: "sortable" (time-ordered, generated locally) or "counter" (legacy numeric)
+SESSION_ID_MODE = os.getenv("SESSION_ID_MODE", "sortable")
+NOTE_ID_MODE = os.getenv("NOTE_ID_MODE", "counter")
+
+# Storage backend: "firestore", or "sqlite" for a local database file
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", os.path.join(os.path.expanduser("~"), ".aura", "aura.db"))
+
+# In-process cache of the tasks, notes, custom commands and preferences collections: entries kept at most,
+# and their lifetime in seconds when no live listener keeps them up to date
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+# Local full-text index of the notes
+NOTE_INDEX_PATH = os.getenv("NOTE_INDEX_PATH", os.path.join(os.path.expanduser("~"), ".aura", "note_index.db"))
+
+# Long-term memory: vector index of every conversation turn, embedded with "hashing" (offline) or "gemini",
+# and how many relevant past turns are added to each chat request
+MEMORY_INDEX_DIR = os.getenv("MEMORY_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".aura", "memory"))
+MEMORY_EMBEDDER = os.getenv("MEMORY_EMBEDDER", "hashing")
+MEMORY_RECALL_TURNS = int(os.getenv("MEMORY_RECALL_TURNS", "3"))
+
+# Documents per page when listing notes, tasks and meetings
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "10"))
+
+# Local index of file and folder names used by the document and meeting features
+FILE_INDEX_PATH = os.getenv("FILE_INDEX_PATH", os.path.join(os.path.expanduser("~"), ".aura", "file_index.db"))
+
+# Summaries of large files and transcripts: tokens per chunk, concurrent requests, and where results are cached
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".aura", "summaries"))
+
+# Batch classification of folders: Gemini requests in flight, files read at once, characters sent per file,
+# and the local manifest of results
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", "8"))
+CLASSIFY_READ_WORKERS = int(os.getenv("CLASSIFY_READ_WORKERS", "16"))
+CLASSIFY_MAX_CHARS = int(os.getenv("CLASSIFY_MAX_CHARS", "4000"))
+CLASSIFICATION_MANIFEST = os.getenv("CLASSIFICATION_MANIFEST",
+                                    os.path.join(os.path.expanduser("~"), ".aura", "classifications.json"))
+
+# Text extraction: characters per streamed block, file size from which text files are memory-mapped, where the
+# text of PDF and DOCX files is cached, and how much of a document is shown at a time
+EXTRACT_BLOCK_CHARS = int(os.getenv("EXTRACT_BLOCK_CHARS", "65536"))
+EXTRACT_MMAP_THRESHOLD = int(os.getenv("EXTRACT_MMAP_THRESHOLD", str(4 << 20)))
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".aura", "extracted"))
+DOCUMENT_WINDOW_CHARS = int(os.getenv("DOCUMENT_WINDOW_CHARS", "3000"))
+
+# Duplicate finder: files hashed at once, and bytes hashed from each end of a file before hashing it in full
+DUPLICATE_WORKERS = int(os.getenv("DUPLICATE_WORKERS", "8"))
+DUPLICATE_SAMPLE_BYTES = int(os.getenv("DUPLICATE_SAMPLE_BYTES", "8192"))
+
+# Bulk document operations: files moved or deleted at once
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "8"))
+
+# Disk cache of Gemini responses: where it is kept, most responses kept, default lifetime in seconds, lifetimes
+# per call site ("summarize_note=86400,summarize_email=3600"), and call sites never cached
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".aura", "llm_cache.db"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_TTLS = os.getenv("LLM_CACHE_TTLS", "")
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "general_recommendations,chat_summary")
+
+# Shared Gemini client: model, requests started per minute, requests in flight at once, seconds before a
+# request times out, and retries of rate-limited or failed requests
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_RATE_PER_MINUTE = float(os.getenv("GEMINI_RATE_PER_MINUTE", "60"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+
+# Gemini usage ledger: where calls are recorded, days they are kept, hours covered by the report, and input
+# token budgets per call site ("summarize_email=2000,summarize_chunk=4000"); prompts over budget are cut, or
+# chunked for the summarize_* call sites
+LLM_USAGE_PATH = os.getenv("LLM_USAGE_PATH", os.path.join(os.path.expanduser("~"), ".aura", "llm_usage.db"))
+LLM_USAGE_RETENTION_DAYS = float(os.getenv("LLM_USAGE_RETENTION_DAYS", "30"))
+LLM_USAGE_WINDOW_HOURS = float(os.getenv("LLM_USAGE_WINDOW_HOURS", "24"))
+LLM_INPUT_BUDGETS = os.getenv("LLM_INPUT_BUDGETS", "")
+
+# Whisper transcription worker: model, and seconds without a job before the model is unloaded
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_IDLE_TIMEOUT = float(os.getenv("WHISPER_IDLE_TIMEOUT", "600"))
+# Parallel transcription of long recordings: worker processes, longest segment sent to Whisper in seconds,
+# and shortest pause in seconds that splits speech
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "2"))
+SEGMENT_MAX_SECONDS = float(os.getenv("SEGMENT_MAX_SECONDS", "30"))
+VAD_MIN_SILENCE = float(os.getenv("VAD_MIN_SILENCE", "0.5"))
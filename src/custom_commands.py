@@ -1,46 +1,15 @@
 import subprocess
 
-import google.generativeai as genai
-import pyttsx3
-import speech_recognition as sr
-from firebase_admin import firestore
+from audio_io import listen, speak
+from collection_cache import get_cache
+from gemini_client import get_model
+from storage import get_db
 
-from config import GEMINI_API_KEY
-
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
-
-# Firebase initialization
-db = firestore.client()
+# Initialize the document store
+db = get_db()
 
 # Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
-
-
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
+model = get_model()
 
 
 def check_and_execute_command(command_name):
@@ -49,12 +18,13 @@ def check_and_execute_command(command_name):
     generates code suggestions with Gemini, and stores the command.
     """
     command_ref = db.collection("custom_commands").document(command_name)
-    command_doc = command_ref.get()
+    commands = get_cache("custom_commands")
+    command_doc = commands.get_document(command_name)
 
     # Step 1: Check if the command exists
-    if command_doc.exists:
+    if command_doc is not None:
         # Execute existing command
-        command_action = command_doc.to_dict()["action"]
+        command_action = command_doc["action"]
         subprocess.run(command_action, shell=True)
         speak(f"Executed existing command '{command_name}'.")
     else:
@@ -73,7 +43,8 @@ def check_and_execute_command(command_name):
                 try:
                     # Step 4: Pass command description to Gemini
                     gemini_response = model.generate_content(
-                        "Suggest a command that can be executed in shell and perform this action : " + command_description + "\nOnly write the command and nothing else. not even quotation marks or endline characters.")
+                        "Suggest a command that can be executed in shell and perform this action : " + command_description + "\nOnly write the command and nothing else. not even quotation marks or endline characters.",
+                        call_site="suggest_command")
                     suggested_command = gemini_response.text.strip()
                 except Exception as e:
                     speak(f"Error generating command suggestion: {e}")
@@ -89,6 +60,7 @@ def check_and_execute_command(command_name):
                     command_ref.set({
                         "action": suggested_command
                     })
+                    commands.invalidate(command_ref.id)
                     speak(f"Custom command '{command_name}' added successfully and ready for use.")
                 else:
                     speak("Command creation canceled.")
@@ -1,25 +1,27 @@
-import os
+import re
 import shutil
+from datetime import datetime
 from pathlib import Path
 
-import google.generativeai as genai
-import pyttsx3
-import speech_recognition as sr
-from firebase_admin import firestore
-
-from config import GEMINI_API_KEY
-
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
-
-# Initialize Firestore
-db = firestore.client()
+from audio_io import listen, speak
+from batch_classification import classify_file, classify_folder, move_into_categories
+from bulk_operations import bulk_delete, bulk_move, scan_files, sort_files, to_glob
+from config import DOCUMENT_WINDOW_CHARS
+from duplicate_finder import find_duplicates, format_size, print_duplicate_report
+from file_index import find_path, index_folders
+from gemini_client import get_model
+from listing import NEXT_PAGE_WORDS, ListPager, browse
+from storage import get_db
+from summarization import Summarizer
+from text_extraction import iter_windows
+
+# Initialize the document store
+db = get_db()
 
 # Initialize Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+model = get_model()
+# Large files are summarized in chunks, and unchanged files answered from the cache
+document_summarizer = Summarizer(model, "Summarize the following file content")
 
 # Common folders as base directories for searches
 COMMON_FOLDERS = {
@@ -87,7 +89,7 @@ def delete_document(file_name, base_folder_name):
     Deletes a document.
 
     Parameters:
-        file_name (str): The name of the file to delete.
+        file_name (str or Path): The name of the file to delete, or its exact path.
     """
     base_directory = COMMON_FOLDERS.get(base_folder_name.lower(), Path(base_folder_name))
 
@@ -95,7 +97,7 @@ def delete_document(file_name, base_folder_name):
         print(f"Base directory '{base_directory}' does not exist.")
         return
 
-    file_path = findfile(file_name, base_directory)
+    file_path = file_name if isinstance(file_name, Path) else findfile(file_name, base_directory)
     if file_path:
         file_path.unlink()
         print(f"Document '{file_name}' deleted.")
@@ -103,12 +105,13 @@ def delete_document(file_name, base_folder_name):
         print(f"Document '{file_name}' not found.")
 
 
-def summarize_document(file_name, base_folder_name):
+def summarize_document(file_name, base_folder_name, speak_summary=False):
     """
     Summarizes the content of a document using Gemini.
 
     Parameters:
         file_name (str): The name of the file to summarize.
+        speak_summary (bool): Stream the summary and speak it sentence by sentence as it arrives.
 
     Returns:
         str: The summary of the document.
@@ -121,10 +124,8 @@ def summarize_document(file_name, base_folder_name):
 
     file_path = findfile(file_name, base_directory)
     if file_path:
-        with open(file_path, "r", encoding="utf-8") as file:
-            content = file.read()
-        response = model.generate_content("Summarize the following file content: " + content)
-        return response.text
+        return document_summarizer.summarize_file(file_path, "summarize_document", speak_summary,
+                                                  intro=f"The summary of {file_name} is:")
     else:
         print(f"Document '{file_name}' not found.")
 
@@ -147,19 +148,78 @@ def classify_document(file_name, base_folder_name):
 
     file_path = findfile(file_name, base_directory)
     if file_path:
-        with open(file_path, "r", encoding="utf-8") as file:
-            content = file.read()
-        response = model.generate_content(
-            "Classify this file content to a category, say only work or personal: " + content)
-        print(f"Document '{file_name}' classified as: {response.text.strip()}")
-        return response.text.strip()
+        category = classify_file(model, file_path)
+        print(f"Document '{file_name}' classified as: {category}")
+        return category
     else:
         print(f"Document '{file_name}' not found.")
 
 
+def classify_folder_voice_interaction():
+    """
+    Classifies every document in a folder, then offers to sort them into work and personal folders.
+    """
+    speak("Which base folder should I classify?")
+    base_folder_name = listen().lower()
+    base_directory = COMMON_FOLDERS.get(base_folder_name, Path(base_folder_name))
+    if not base_directory.exists():
+        speak(f"Base directory {base_folder_name} does not exist.")
+        return
+    speak("Which folder inside it? Say the base folder's name again to classify all of it.")
+    target_folder_name = listen().lower()
+    folder = base_directory if target_folder_name == base_folder_name else find_folder(base_directory,
+                                                                                       target_folder_name)
+    if not folder:
+        speak(f"Folder {target_folder_name} not found.")
+        return
+
+    speak(f"Classifying the documents in {folder.name}.")
+    report = classify_folder(model, folder)
+    categories = report["categories"]
+    work = sum(1 for category in categories.values() if category == "work")
+    speak(f"Classified {len(categories)} documents, {work} work and {len(categories) - work} personal, at "
+          f"{report['files_per_second']:.1f} files per second.")
+    if categories:
+        speak("Should I move them into work and personal folders?")
+        if "yes" in listen().lower():
+            moved = move_into_categories(folder, categories)
+            speak(f"Moved {moved} documents.")
+
+
+def find_duplicates_voice_interaction():
+    """
+    Reports duplicate files in common folders, then offers to delete the extra copies.
+    """
+    speak("Which folders should I check for duplicates? Say all for every common folder.")
+    answer = listen().lower()
+    names = [name for name in COMMON_FOLDERS if name in answer] if "all" not in answer else list(COMMON_FOLDERS)
+    folders = {name: COMMON_FOLDERS[name] for name in names if COMMON_FOLDERS[name].exists()}
+    if not folders:
+        speak("I didn't recognize any of those folders.")
+        return
+
+    speak("Looking for duplicates.")
+    report = find_duplicates(folders.values())
+    print_duplicate_report(report)
+    if not report:
+        speak("There are no duplicate files.")
+        return
+    total = sum(group["reclaimable"] for group in report)
+    copies = sum(len(group["duplicates"]) for group in report)
+    speak(f"I found {copies} duplicate copies taking {format_size(total)}. The list is on the console. "
+          "Should I delete the copies and keep the oldest of each?")
+    if "yes" not in listen().lower():
+        return
+    for group in report:
+        for path in group["duplicates"]:
+            base_folder = next(name for name, folder in folders.items() if path.is_relative_to(folder))
+            delete_document(path, base_folder)
+    speak(f"Deleted {copies} duplicates, {format_size(total)} reclaimed.")
+
+
 def retrieve_document(file_name, base_folder_name):
     """
-    Retrieves the path of a specific document within a target folder in a base folder.
+    Shows a document on the console, a window at a time, asking before each next part of a long one.
 
     Parameters:
         base_folder_name (str): The name of the base folder to start searching from.
@@ -167,7 +227,7 @@ def retrieve_document(file_name, base_folder_name):
         document_name (str): The name of the document to retrieve.
 
     Returns:
-        Path: The path of the document if found, or None if not found.
+        str: The text shown, or None if the document was not found.
     """
 
     base_directory = COMMON_FOLDERS.get(base_folder_name.lower(), Path(base_folder_name))
@@ -178,28 +238,37 @@ def retrieve_document(file_name, base_folder_name):
 
     file_path = findfile(file_name, base_directory)
     if file_path:
-        with open(file_path, "r") as file:
-            content = file.read()
-        print(f"\nContent of '{file_name}':\n{content}")
-        return content
+        shown = []
+        windows = iter_windows(file_path, DOCUMENT_WINDOW_CHARS)
+        window = next(windows, None)
+        print(f"\nContent of '{file_name}':")
+        while window is not None:
+            print(window)
+            shown.append(window)
+            window = next(windows, None)
+            if window is None:
+                break
+            speak("Say more to read on, or stop.")
+            answer = listen().lower()
+            if not any(word in answer for word in NEXT_PAGE_WORDS):
+                windows.close()
+                break
+        return "".join(shown)
     else:
         print(f"Document '{file_name}' not found.")
 
 
 def findfile(name, path):
-    """Searches for a file by name in a specified base directory."""
-    for dirpath, _, filenames in os.walk(path):
-        for filename in filenames:
-            if Path(filename).stem.lower() == name:
-                return Path(dirpath) / filename
-
-    print(f"File '{name}' not found in '{path}'.")
-    return None
+    """Searches for a file by name in a specified base directory, through the file index."""
+    file_path = find_path(path, name)
+    if file_path is None:
+        print(f"File '{name}' not found in '{path}'.")
+    return file_path
 
 
 def find_folder(base_directory, target_folder_name):
     """
-    Recursively searches for a folder by name starting from a base directory.
+    Searches for a folder by name below a base directory, through the file index.
 
     Parameters:
         base_directory (Path): The directory to start searching from.
@@ -208,12 +277,10 @@ def find_folder(base_directory, target_folder_name):
     Returns:
         Path: The full path to the target folder if found, or None if not found.
     """
-    for root, dirs, _ in os.walk(base_directory):
-        for dir_name in dirs:
-            if dir_name.lower() == target_folder_name.lower():
-                return Path(root) / dir_name
-    print(f"Folder '{target_folder_name}' not found in '{base_directory}'.")
-    return None
+    target_path = find_path(base_directory, target_folder_name, is_dir=True)
+    if target_path is None:
+        print(f"Folder '{target_folder_name}' not found in '{base_directory}'.")
+    return target_path
 
 
 def move_document(file_name, current_base_folder_name, target_folder_name):
@@ -258,16 +325,71 @@ def move_document(file_name, current_base_folder_name, target_folder_name):
         print(f"Target folder '{target_folder_name}' not found.")
 
 
-def list_documents(base_folder_name, target_folder_name):
+def resolve_folder(base_folder_name, target_folder_name):
+    """
+    Returns a folder given as a base folder and a folder inside it, the base folder itself if both names are
+    the same, or None if either is not found.
     """
-    Lists all documents in a target folder within a specified base folder.
+    base_directory = COMMON_FOLDERS.get(base_folder_name.lower(), Path(base_folder_name))
+    if not base_directory.exists():
+        print(f"Base directory '{base_directory}' does not exist.")
+        return None
+    if base_folder_name == target_folder_name:
+        return base_directory
+    return find_folder(base_directory, target_folder_name)
+
+
+def bulk_document_voice_interaction(command):
+    """
+    Moves or deletes every file in a folder that matches a glob pattern or extension.
+    """
+    speak("Which files? Say an extension like pdf, or a pattern like star report star.")
+    pattern = to_glob(listen())
+    speak("Which base folder are they in?")
+    base_folder = listen().lower()
+    speak("Which folder inside it? Say the base folder's name again for the base folder itself.")
+    folder = resolve_folder(base_folder, listen().lower())
+    if not folder:
+        speak("I couldn't find that folder.")
+        return
+    files = scan_files(folder, pattern)
+    if not files:
+        speak(f"No files match {pattern}.")
+        return
+
+    if "move" in command or "transfer" in command or "shift" in command:
+        speak(f"{len(files)} files match. Which base folder should they move to?")
+        target_base = listen().lower()
+        speak("And which folder inside it?")
+        target = resolve_folder(target_base, listen().lower())
+        if not target:
+            speak("I couldn't find the target folder.")
+            return
+        speak(f"Should I move all {len(files)} files matching {pattern} to {target.name}?")
+        if "yes" not in listen().lower():
+            return
+        moved, errors = bulk_move(files, target)
+        speak(f"Moved {moved} files." + (f" {errors} could not be moved." if errors else ""))
+    else:
+        speak(f"{len(files)} files match {pattern}. Should I delete all of them?")
+        if "yes" not in listen().lower():
+            return
+        deleted, errors = bulk_delete(files)
+        speak(f"Deleted {deleted} files." + (f" {errors} could not be deleted." if errors else ""))
+
+
+def list_documents(base_folder_name, target_folder_name, sort_by="name", pattern="*"):
+    """
+    Lists the documents in a target folder within a specified base folder, a page at a time.
 
     Parameters:
         base_folder_name (str): The name of the base folder to start searching from.
         target_folder_name (str): The name of the folder to list documents from.
+        sort_by (str): "name", "size" (largest first) or "date" (newest first).
+        pattern (str): Glob pattern the file names must match.
 
     Returns:
-        list: A list of document paths within the target folder.
+        list: The paths of the documents shown.
     """
     base_directory = COMMON_FOLDERS.get(base_folder_name.lower(), Path(base_folder_name))
 
@@ -282,40 +404,33 @@ def list_documents(base_folder_name, target_folder_name):
         target_path = find_folder(base_directory, target_folder_name)
 
     if target_path and target_path.exists():
-        documents = [file for file in target_path.iterdir() if file.is_file()]
+        documents = sort_files(scan_files(target_path, pattern), sort_by)
         print(f"Documents in '{target_path}':")
-        for doc in documents:
-            print(doc.name)
-        return documents
+        shown = browse(ListPager(documents), describe_file, "documents")
+        return [info.path for info in shown]
     else:
         print(f"Target folder '{target_folder_name}' not found.")
         return []
 
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
+def describe_file(info):
+    return f"{info.name}  ({format_size(info.size)}, {datetime.fromtimestamp(info.modified):%Y-%m-%d %H:%M})"
 
 
 def document_management_voice_interaction(command):
+    # Index the common folders once, in the background, so lookups no longer walk them
+    index_folders(COMMON_FOLDERS.values())
+    if ("classify" in command or "categorize" in command) and ("folder" in command or "all" in command):
+        classify_folder_voice_interaction()
+        return
+    if "duplicate" in command:
+        find_duplicates_voice_interaction()
+        return
+    if any(word in command for word in ("move", "transfer", "shift", "delete", "remove", "erase", "trash")) and \
+            re.search(r"\b(all|every|bulk|matching)\b", command):
+        bulk_document_voice_interaction(command)
+        return
+
     speak("What is the name of the document or file?")
     file_name = listen().lower()
     if "create" in command or "add" in command or "make" in command:
@@ -346,8 +461,9 @@ def document_management_voice_interaction(command):
     elif "summarize" in command or "summary" in command or "abstract" in command:
         speak("Which base folder is this document in?")
         base_folder = listen().lower()
-        summary = summarize_document(file_name, base_folder)
-        speak(f"The summary of {file_name} is: {summary}")
+        summary = summarize_document(file_name, base_folder, speak_summary=True)
+        if not summary:
+            speak(f"Sorry, I couldn't summarize {file_name}.")
 
     elif "classify" in command or "category" in command or "categorize" in command:
         speak("Which base folder is this document in?")
@@ -374,7 +490,10 @@ def document_management_voice_interaction(command):
         base_folder = listen().lower()
         speak("Which target folder would you like to list documents from?")
         target_folder = listen().lower()
-        list_documents(base_folder, target_folder)
+        speak("Sort them by name, size or date?")
+        answer = listen().lower()
+        sort_by = next((key for key in ("size", "date") if key in answer), "name")
+        list_documents(base_folder, target_folder, sort_by)
         speak("Listing documents complete.")
 
     else:
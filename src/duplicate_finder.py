@@ -0,0 +1,133 @@
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import DUPLICATE_SAMPLE_BYTES, DUPLICATE_WORKERS
+from summarization import file_digest
+
+
+def format_size(size):
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _scan(folder, files, seen):
+    stack = [folder]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            # Hard links to one file, or a folder scanned twice, free nothing
+                            if (stat.st_dev, stat.st_ino) not in seen:
+                                seen.add((stat.st_dev, stat.st_ino))
+                                files.append((stat.st_size, stat.st_mtime, entry.path))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def _sample_digest(path, size, sample_bytes):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        digest.update(file.read(sample_bytes))
+        if size > sample_bytes:
+            file.seek(max(size - sample_bytes, sample_bytes))
+            digest.update(file.read(sample_bytes))
+    return digest.hexdigest()
+
+
+def _regroup(groups, key, pool):
+    """
+    Splits each group of paths by key(path), computed in the pool, keeping subgroups of two or more.
+    """
+    paths = [path for group in groups for path in group]
+
+    def safe_key(path):
+        try:
+            return key(path)
+        except OSError:
+            return None
+
+    keys = dict(zip(paths, pool.map(safe_key, paths)))
+    regrouped = []
+    for group in groups:
+        subgroups = defaultdict(list)
+        for path in group:
+            if keys[path] is not None:
+                subgroups[keys[path]].append(path)
+        regrouped.extend(subgroup for subgroup in subgroups.values() if len(subgroup) > 1)
+    return regrouped
+
+
+def find_duplicates(folders, workers=DUPLICATE_WORKERS, sample_bytes=DUPLICATE_SAMPLE_BYTES, min_size=1):
+    """
+    Finds files with identical content under one or more folders.
+
+    Files are grouped by size first, which costs no reads. Files sharing a size are then grouped by a hash of
+    their first and last sample_bytes, and only those still alike are hashed in full, so most files are never
+    read beyond a few KB. Hashing runs in a pool of threads.
+
+    Parameters:
+        folders (list of Path): The folders to scan, subfolders included.
+        workers (int): Files hashed at once.
+        sample_bytes (int): Bytes hashed from each end of a file before hashing it in full.
+        min_size (int): Smaller files are ignored; empty files are always ignored.
+
+    Returns:
+        list of dict: One group per content, {"size", "keep", "duplicates", "reclaimable"}, with the oldest
+        copy kept, largest reclaimable space first.
+    """
+    files, seen = [], set()
+    for folder in folders:
+        _scan(str(folder), files, seen)
+
+    by_size = defaultdict(list)
+    modified = {}
+    for size, mtime, path in files:
+        if size >= max(min_size, 1):
+            by_size[size].append(path)
+            modified[path] = mtime
+    sizes = {path: size for size, group in by_size.items() for path in group}
+    groups = [group for group in by_size.values() if len(group) > 1]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="duplicates") as pool:
+        groups = _regroup(groups, lambda path: _sample_digest(path, sizes[path], sample_bytes), pool)
+        # The samples of files up to two samples long already cover all of them
+        sampled_whole = [group for group in groups if sizes[group[0]] <= 2 * sample_bytes]
+        to_hash = [group for group in groups if sizes[group[0]] > 2 * sample_bytes]
+        groups = sampled_whole + _regroup(to_hash, file_digest, pool)
+
+    report = []
+    for group in groups:
+        group.sort(key=lambda path: (modified[path], path))
+        size = sizes[group[0]]
+        report.append({"size": size, "keep": Path(group[0]), "duplicates": [Path(path) for path in group[1:]],
+                       "reclaimable": size * (len(group) - 1)})
+    report.sort(key=lambda group: group["reclaimable"], reverse=True)
+    return report
+
+
+def print_duplicate_report(report, limit=20):
+    """
+    Prints the groups of duplicates that free the most space, and the total.
+    """
+    total = sum(group["reclaimable"] for group in report)
+    print(f"{len(report)} files have duplicates; {format_size(total)} can be reclaimed.")
+    for rank, group in enumerate(report[:limit], start=1):
+        copies = len(group["duplicates"])
+        print(f"{rank}. {format_size(group['reclaimable'])}: keep '{group['keep']}', {copies} "
+              f"{'copy' if copies == 1 else 'copies'} of {format_size(group['size'])}:")
+        for path in group["duplicates"]:
+            print(f"     {path}")
+    if len(report) > limit:
+        print(f"... and {len(report) - limit} more.")
@@ -2,29 +2,22 @@ import base64
 import os.path
 from email.mime.text import MIMEText
 
-import google.generativeai as genai  # Ensure Gemini API client is imported
-import pyttsx3
-import speech_recognition as sr
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-from config import GEMINI_API_KEY, GMAIL_CREDENTIALS_PATH, GMAIL_TOKEN_PATH
-
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
+from audio_io import listen, speak
+from config import GMAIL_CREDENTIALS_PATH, GMAIL_TOKEN_PATH
+from gemini_client import get_model
 
 # Define the Gmail API scope
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly',
           'https://www.googleapis.com/auth/gmail.send']
 
 # Initialize Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+model = get_model()
 
 
 def authenticate_gmail():
@@ -96,7 +89,7 @@ def summarize_email(service, email_id):
         snippet = message['snippet']
 
         # Summarize the email content using Gemini
-        summary = model.generate_content(f"Summarize this email: {snippet}")
+        summary = model.generate_content(f"Summarize this email: {snippet}", call_site="summarize_email")
         print("Summary:", summary.text)
 
     except HttpError as error:
@@ -109,7 +102,7 @@ def send_email_with_generated_response(service, email_id):
         snippet = message['snippet']
 
         # Generate response using Gemini
-        response = model.generate_content("Reply to this email: " + snippet)
+        response = model.generate_content("Reply to this email: " + snippet, call_site="reply_email")
         print("Generated Response:", response.text)
 
         # Extract sender's email to reply to
@@ -123,29 +116,6 @@ def send_email_with_generated_response(service, email_id):
         print(f"An error occurred: {error}")
 
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
-
-
 # Example usage
 def email_voice_interaction(command):
     creds = authenticate_gmail()
@@ -2,20 +2,14 @@ import os
 import subprocess
 import webbrowser
 
-import pyttsx3
-import speech_recognition as sr
 import spotipy
 from googleapiclient.discovery import build
 from spotipy.oauth2 import SpotifyOAuth
 from word2number import w2n
 
+from audio_io import listen, speak
 from config import SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_SECRET, SPOTIPY_REDIRECT_URI, YOUTUBE_API_KEY
 
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
-
 # Initialize Spotify and YouTube APIs
 scope = "user-read-playback-state user-modify-playback-state user-read-currently-playing"
 sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=SPOTIPY_CLIENT_ID,
@@ -150,29 +144,6 @@ def handle_command(command, input_text=None):
         print(f"Unknown command: {command}")
 
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
-
-
 def entertainment_control_voice_interaction(command):
     # Listen for media-related commands
 
@@ -0,0 +1,429 @@
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from config import FILE_INDEX_PATH
+
+# Lowest trigram similarity for a fuzzy candidate
+FUZZY_THRESHOLD = 0.4
+# Candidates scored exactly after the trigram count preselection
+FUZZY_CANDIDATES = 100
+# Preselection reads the postings of the name's rarest trigrams, at least this many, up to this many postings
+MIN_PRESELECT_TRIGRAMS = 3
+MAX_POSTINGS = 5000
+# Underscores, dashes, dots and runs of spaces all read as one space, as names are usually spoken
+SEPARATORS = re.compile(r"[\s_\-.]+")
+
+
+def name_key(name):
+    """
+    Normalizes a file stem or folder name for matching: lower case, separators as single spaces.
+    """
+    return SEPARATORS.sub(" ", name.lower()).strip()
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+class FileIndex:
+    """
+    Persistent index of the file and folder names under a set of root folders, in a local SQLite file.
+
+    The index records every directory's mtime. A directory's mtime changes whenever an entry is added,
+    removed or renamed directly inside it, so refresh() only has to stat each directory and rescan the
+    ones that changed, instead of walking the whole tree.
+
+    Directories are walked without holding any lock, and changes are written on a connection of their own;
+    with SQLite's write-ahead log, lookups on the other connection keep reading the last committed index
+    while a root is being built or refreshed.
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        self._writer = None
+        self._write_lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS roots (root TEXT PRIMARY KEY, built_at REAL);
+                CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, root TEXT NOT NULL, mtime_ns INTEGER);
+                CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, root TEXT NOT NULL, parent TEXT NOT NULL,
+                    name TEXT NOT NULL, key TEXT NOT NULL, is_dir INTEGER NOT NULL, depth INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS entries_key ON entries (root, key);
+                CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+                CREATE TABLE IF NOT EXISTS trigrams (trigram TEXT NOT NULL, entry INTEGER NOT NULL,
+                    PRIMARY KEY (trigram, entry)) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS trigrams_entry ON trigrams (entry);
+            """)
+        self._writer = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+
+    def is_built(self, root):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM roots WHERE root = ?", (str(root),)).fetchone() is not None
+
+    def _add_entry(self, root, parent, name, is_dir, depth):
+        key = name_key(name if is_dir else Path(name).stem)
+        entry = self._writer.execute(
+            "INSERT INTO entries (root, parent, name, key, is_dir, depth) VALUES (?, ?, ?, ?, ?, ?)",
+            (root, parent, name, key, int(is_dir), depth)).lastrowid
+        self._writer.executemany("INSERT OR IGNORE INTO trigrams (trigram, entry) VALUES (?, ?)",
+                                 [(trigram, entry) for trigram in trigrams(key)])
+
+    @staticmethod
+    def _scan_tree(directory, depth, tree):
+        """
+        Walks a directory and everything below it, appending (directory, mtime_ns, depth, children) to tree;
+        children are (name, is_dir) pairs. Touches only the file system.
+        """
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as scanner:
+                children = [(child.name, child.is_dir(follow_symlinks=False)) for child in scanner]
+        except OSError:
+            return tree
+        tree.append((directory, mtime_ns, depth, children))
+        for name, is_dir in children:
+            if is_dir:
+                FileIndex._scan_tree(os.path.join(directory, name), depth + 1, tree)
+        return tree
+
+    def _insert_tree(self, root, tree):
+        for directory, mtime_ns, depth, children in tree:
+            self._writer.execute("INSERT OR REPLACE INTO dirs (path, root, mtime_ns) VALUES (?, ?, ?)",
+                                 (directory, root, mtime_ns))
+            for name, is_dir in children:
+                self._add_entry(root, directory, name, is_dir, depth)
+
+    def _remove_entry(self, entry):
+        self._writer.execute("DELETE FROM trigrams WHERE entry = ?", (entry,))
+        self._writer.execute("DELETE FROM entries WHERE id = ?", (entry,))
+
+    def _forget_directory(self, directory):
+        """
+        Drops the entries of a directory and of every directory below it.
+        """
+        prefix = directory.rstrip(os.sep) + os.sep
+        directories = [directory] + [row[0] for row in self._writer.execute(
+            "SELECT path FROM dirs WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))]
+        for path in directories:
+            self._writer.execute("DELETE FROM trigrams WHERE entry IN (SELECT id FROM entries WHERE parent = ?)",
+                                 (path,))
+            self._writer.execute("DELETE FROM entries WHERE parent = ?", (path,))
+            self._writer.execute("DELETE FROM dirs WHERE path = ?", (path,))
+
+    def _scan_changes(self, root, directory):
+        """
+        Reads a changed directory's entries and walks the subdirectories that are new to the index, without
+        writing anything.
+
+        Returns:
+            tuple: (children as {name: is_dir}, trees of the new subdirectories), or None if it is unreadable.
+        """
+        try:
+            with os.scandir(directory) as scanner:
+                children = {child.name: child.is_dir(follow_symlinks=False) for child in scanner}
+        except OSError:
+            return None
+        with self.lock:
+            existing = {name: bool(is_dir) for name, is_dir in self.connection.execute(
+                "SELECT name, is_dir FROM entries WHERE parent = ?", (directory,))}
+        depth = len(Path(directory).relative_to(root).parts)
+        new_trees = [self._scan_tree(os.path.join(directory, name), depth + 1, [])
+                     for name, is_dir in children.items() if is_dir and existing.get(name) is not True]
+        return children, new_trees
+
+    def _apply_changes(self, root, directory, mtime_ns, children, new_trees):
+        """
+        Applies the changes in one directory's entries; unchanged subdirectories are left alone.
+        """
+        existing = {name: (entry, bool(is_dir)) for entry, name, is_dir in self._writer.execute(
+            "SELECT id, name, is_dir FROM entries WHERE parent = ?", (directory,))}
+        depth = len(Path(directory).relative_to(root).parts)
+        for name, (entry, is_dir) in existing.items():
+            if children.get(name) != is_dir:
+                self._remove_entry(entry)
+                if is_dir:
+                    self._forget_directory(os.path.join(directory, name))
+        for name, is_dir in children.items():
+            if name not in existing or existing[name][1] != is_dir:
+                self._add_entry(root, directory, name, is_dir, depth)
+        for tree in new_trees:
+            # A refresh that ran meanwhile may have indexed the subdirectory already
+            if tree and existing.get(os.path.basename(tree[0][0]), (None, False))[1] is not True:
+                self._insert_tree(root, tree)
+        self._writer.execute("UPDATE dirs SET mtime_ns = ? WHERE path = ?", (mtime_ns, directory))
+
+    def _write(self, apply):
+        """
+        Runs apply() in one write transaction on the writer connection.
+        """
+        with self._write_lock:
+            self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                result = apply()
+                self._writer.execute("COMMIT")
+            except Exception:
+                self._writer.execute("ROLLBACK")
+                raise
+            return result
+
+    def build(self, root):
+        """
+        Indexes everything under a root folder from scratch.
+
+        Returns:
+            int: The number of files and folders indexed.
+        """
+        root = str(root)
+        tree = self._scan_tree(root, 0, [])
+
+        def apply():
+            self._forget_directory(root)
+            self._insert_tree(root, tree)
+            self._writer.execute("INSERT OR REPLACE INTO roots (root, built_at) VALUES (?, ?)", (root, time.time()))
+
+        self._write(apply)
+        return sum(len(children) for _, _, _, children in tree)
+
+    def refresh(self, root):
+        """
+        Brings a root's index up to date by rescanning only the directories whose mtime changed.
+
+        Returns:
+            int: The number of directories rescanned.
+        """
+        root = str(root)
+        with self.lock:
+            known = self.connection.execute("SELECT path, mtime_ns FROM dirs WHERE root = ? ORDER BY path",
+                                            (root,)).fetchall()
+        changes = []
+        for directory, mtime_ns in known:
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                current = None
+            if current == mtime_ns:
+                continue
+            # Deleted or moved directories are only forgotten; their entry goes when their parent, whose mtime
+            # changed too, is rescanned
+            changes.append((directory, current, None if current is None else self._scan_changes(root, directory)))
+        if not changes:
+            return 0
+
+        def apply():
+            for directory, current, scanned in changes:
+                if current is None:
+                    self._forget_directory(directory)
+                elif scanned is not None:
+                    self._apply_changes(root, directory, current, *scanned)
+
+        self._write(apply)
+        return len(changes)
+
+    def find(self, root, name, is_dir=False, limit=5, fuzzy=True):
+        """
+        Looks a name up under a root folder.
+
+        Files match on their stem, folders on their name, both case-insensitively and with separators
+        normalized. If nothing matches exactly, names sharing enough trigrams with the name are returned.
+
+        Parameters:
+            root (Path): The root folder, as indexed.
+            name (str): The file stem or folder name.
+            is_dir (bool): Look for folders instead of files.
+            limit (int): Most candidates returned.
+            fuzzy (bool): Fall back to similar names when there is no exact match.
+
+        Returns:
+            list of tuple: (score, Path) candidates, best first; exact matches score 1.0, shallowest first.
+        """
+        root, key = str(root), name_key(name)
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT parent, name FROM entries WHERE root = ? AND key = ? AND is_dir = ? ORDER BY depth, parent "
+                "LIMIT ?", (root, key, int(is_dir), limit)).fetchall()
+            if rows or not fuzzy:
+                return [(1.0, Path(parent) / entry_name) for parent, entry_name in rows]
+
+            # Candidates come from the rarest trigrams of the name: common ones like "ent" would pull in most of
+            # the tree without telling names apart
+            query_trigrams = trigrams(key)
+            frequencies = sorted((self.connection.execute("SELECT COUNT(*) FROM trigrams WHERE trigram = ?",
+                                                          (trigram,)).fetchone()[0], trigram)
+                                 for trigram in query_trigrams)
+            selected, postings = [], 0
+            for frequency, trigram in frequencies:
+                if frequency and len(selected) >= MIN_PRESELECT_TRIGRAMS and postings + frequency > MAX_POSTINGS:
+                    break
+                selected.append(trigram)
+                postings += frequency
+            # Only names under this root and of this kind compete for the candidate slots
+            rows = self.connection.execute(
+                f"SELECT entries.parent, entries.name, entries.key FROM "
+                f"(SELECT trigrams.entry, COUNT(*) AS shared FROM trigrams "
+                f"JOIN entries AS candidates ON candidates.id = trigrams.entry "
+                f"WHERE trigrams.trigram IN ({', '.join('?' * len(selected))}) "
+                f"AND candidates.root = ? AND candidates.is_dir = ? "
+                f"GROUP BY trigrams.entry ORDER BY shared DESC LIMIT ?) AS matches "
+                f"JOIN entries ON entries.id = matches.entry",
+                (*selected, root, int(is_dir), FUZZY_CANDIDATES)).fetchall()
+        candidates = []
+        for parent, entry_name, entry_key in rows:
+            # Dice coefficient of the two trigram sets
+            entry_trigrams = trigrams(entry_key)
+            score = 2 * len(query_trigrams & entry_trigrams) / (len(query_trigrams) + len(entry_trigrams))
+            if score >= FUZZY_THRESHOLD:
+                candidates.append((score, Path(parent) / entry_name))
+        candidates.sort(key=lambda candidate: (-candidate[0], str(candidate[1])))
+        return candidates[:limit]
+
+    def close(self):
+        with self.lock, self._write_lock:
+            if self.connection is not None:
+                self.connection.close()
+                self._writer.close()
+                self.connection = None
+                self._writer = None
+
+
+_index = None
+_index_lock = threading.Lock()
+_building = set()
+
+
+def get_file_index():
+    """
+    Returns the file index at FILE_INDEX_PATH, opened on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FileIndex(FILE_INDEX_PATH)
+        return _index
+
+
+def _build_in_background(root):
+    with _index_lock:
+        if root in _building:
+            return
+        _building.add(root)
+
+    def build():
+        try:
+            count = get_file_index().build(root)
+            print(f"Indexed {count} files and folders in '{root}'.")
+        except Exception as e:
+            print(f"Error indexing '{root}': {e}")
+        finally:
+            _building.discard(root)
+
+    threading.Thread(target=build, name="file-indexer", daemon=True).start()
+
+
+def index_folders(roots):
+    """
+    Starts indexing, in the background, the given folders that exist and have not been indexed yet.
+    """
+    index = get_file_index()
+    for root in roots:
+        if Path(root).is_dir() and not index.is_built(root):
+            _build_in_background(str(root))
+
+
+def _walk(root, name, is_dir):
+    # The original lookup, used until a root has been indexed
+    key = name_key(name)
+    for dirpath, dirnames, filenames in os.walk(root):
+        for entry in (dirnames if is_dir else filenames):
+            if name_key(entry if is_dir else Path(entry).stem) == key:
+                return Path(dirpath) / entry
+    return None
+
+
+def find_path(root, name, is_dir=False):
+    """
+    Finds a file by stem, or a folder by name, under a root folder.
+
+    Uses the persistent index: an exact hit that still exists is returned right away; a miss or a hit
+    that has since disappeared refreshes the changed directories and looks again. A root that has not
+    been indexed yet is walked as before while it is indexed in the background. Similar names are
+    printed when nothing matches.
+
+    Parameters:
+        root (Path): The folder to search in.
+        name (str): The file stem or folder name.
+        is_dir (bool): Look for a folder instead of a file.
+
+    Returns:
+        Path: The best match, or None.
+    """
+    index = get_file_index()
+    root = str(root)
+    if not index.is_built(root):
+        _build_in_background(root)
+        return _walk(root, name, is_dir)
+
+    for attempt in range(2):
+        candidates = index.find(root, name, is_dir)
+        exact = [path for score, path in candidates if score == 1.0 and path.exists()]
+        if exact:
+            return exact[0]
+        if attempt == 0:
+            index.refresh(root)
+
+    if candidates:
+        print("Did you mean: " + ", ".join(path.name for _, path in candidates) + "?")
+    return None
+
+
+def benchmark(directories=2000, files_per_directory=20, lookups=200):
+    """
+    Compares a full os.walk lookup with the index on a synthetic tree.
+    """
+    with tempfile.TemporaryDirectory() as temp:
+        root = Path(temp) / "tree"
+        for number in range(directories):
+            directory = root / f"group {number % 40}" / f"project_{number}"
+            directory.mkdir(parents=True)
+            for file_number in range(files_per_directory):
+                (directory / f"report-{number}-{file_number}.txt").touch()
+        names = [f"report {number * 7 % directories} {number % files_per_directory}" for number in range(lookups)]
+
+        started = time.perf_counter()
+        for name in names[:10]:
+            _walk(root, name, False)
+        print(f"os.walk lookup: {(time.perf_counter() - started) / 10 * 1000:.1f} ms")
+
+        index = FileIndex(str(Path(temp) / "files.db"))
+        started = time.perf_counter()
+        count = index.build(root)
+        print(f"build: {count} entries in {time.perf_counter() - started:.2f} s")
+
+        started = time.perf_counter()
+        index.refresh(root)
+        print(f"refresh, nothing changed: {(time.perf_counter() - started) * 1000:.1f} ms")
+        (root / "group 3" / "project_3" / "new notes.txt").touch()
+        started = time.perf_counter()
+        rescanned = index.refresh(root)
+        print(f"refresh, one file added: {(time.perf_counter() - started) * 1000:.1f} ms, {rescanned} rescanned")
+
+        for label, queries in (("exact", names), ("fuzzy", [name.replace("report", "reprot") for name in names])):
+            started = time.perf_counter()
+            for name in queries:
+                index.find(root, name)
+            print(f"{label} lookup: {(time.perf_counter() - started) / len(queries) * 1000:.2f} ms")
+        print(f"new file found: {index.find(root, 'new notes')}")
+        index.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,284 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+
+from config import (GEMINI_API_KEY, GEMINI_MAX_CONCURRENCY, GEMINI_MAX_RETRIES, GEMINI_MODEL, GEMINI_RATE_PER_MINUTE,
+                    GEMINI_TIMEOUT)
+from llm_cache import CachedResponse, RecordingStream, cache_key, get_response_cache
+from llm_usage import fit_to_budget, record_call, response_tokens
+
+# Errors worth another try: rate limits, overload, timeouts and dropped connections
+RETRYABLE_ERRORS = (api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted,
+                    api_exceptions.ServiceUnavailable, api_exceptions.InternalServerError,
+                    api_exceptions.DeadlineExceeded, TimeoutError, ConnectionError)
+# First retry delay in seconds, doubled on each further retry, and the longest delay
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+
+def _text(response):
+    try:
+        return response.text
+    except ValueError:
+        return None  # Blocked responses have no text
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: allows bursts of up to capacity requests, then rate requests per second.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes one token, waiting for it if the bucket is empty.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _ChatSession:
+    """
+    A Gemini chat session whose messages go through the client's limits.
+    """
+
+    def __init__(self, client, session):
+        self._client = client
+        self._session = session
+
+    def send_message(self, content, stream=False, call_site="chat", **kwargs):
+        kwargs["request_options"] = self._client._request_options(kwargs)
+        record = self._client._recorder(call_site, list(self._session.history) + [content])
+        try:
+            response = self._client._call(lambda: self._session.send_message(content, stream=stream, **kwargs),
+                                          call_site, retry=not stream, hold_slot=stream)
+        except Exception:
+            record("error")
+            raise
+        if stream:
+            return RecordingStream(response, lambda text, last_chunk: record("sent", last_chunk, text),
+                                   on_close=self._client._release_slot)
+        record("sent", response, _text(response))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class GeminiClient:
+    """
+    The one Gemini client shared by every feature.
+
+    Every request waits for a token from a rate limiter and a slot in a bounded number of concurrent requests,
+    has a timeout, and is retried with exponential backoff and full jitter on rate limits, overload and timeouts.
+    generate_content() first looks in the response cache, and identical prompts already in flight are sent once,
+    with every caller getting the same response. Prompts over their call site's input budget are cut, and every
+    call is recorded in the usage ledger. All methods are safe to call from any thread.
+    """
+
+    def __init__(self, model_name=GEMINI_MODEL, rate_per_minute=GEMINI_RATE_PER_MINUTE,
+                 max_concurrency=GEMINI_MAX_CONCURRENCY, timeout=GEMINI_TIMEOUT, max_retries=GEMINI_MAX_RETRIES,
+                 response_cache=None):
+        """
+        Parameters:
+            model_name (str): The Gemini model.
+            rate_per_minute (float): Most requests started per minute, after an initial burst of a few.
+            max_concurrency (int): Most requests in flight at once.
+            timeout (float): Seconds before a request is abandoned.
+            max_retries (int): Retries after the first attempt.
+            response_cache (ResponseCache): The cache to use, the shared one by default.
+        """
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(rate_per_minute / 60, max(1.0, min(max_concurrency, rate_per_minute / 60 * 5)))
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._response_cache = response_cache
+        # Prompt key -> Future of the request in flight
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.retries = 0
+        self.coalesced = 0
+
+    def _call(self, request, call_site, retry=True, hold_slot=False):
+        """
+        Runs a request within the rate limit and concurrency bound, retrying it if it fails transiently.
+        With hold_slot, a successful request keeps its slot until the caller calls _release_slot(), for streams
+        whose response is only read after the request returns.
+        """
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            self._slots.acquire()
+            held = False
+            try:
+                response = request()
+                held = hold_slot
+                return response
+            except RETRYABLE_ERRORS as e:
+                if not retry or attempt >= self.max_retries:
+                    raise
+                error = e
+            finally:
+                if not held:
+                    self._slots.release()
+            attempt += 1
+            self.retries += 1
+            # Full jitter: clients that failed together do not retry together
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            print(f"[{call_site}] Gemini request failed ({type(error).__name__}), retrying in {delay:.1f} s")
+            time.sleep(delay)
+
+    def _release_slot(self):
+        self._slots.release()
+
+    def _recorder(self, call_site, contents, truncated=False):
+        """
+        Returns a function that records the outcome of a request started now in the usage ledger.
+        """
+        started = time.perf_counter()
+
+        def record(status, response=None, text=None):
+            input_tokens, output_tokens = response_tokens(response, contents, text)
+            record_call(call_site, self.model_name, input_tokens, output_tokens, time.perf_counter() - started,
+                        status, truncated)
+
+        return record
+
+    def _request_options(self, kwargs):
+        options = dict(kwargs.pop("request_options", None) or {})
+        options.setdefault("timeout", self.timeout)
+        return options
+
+    def generate_content(self, contents, *, call_site="generate_content", cache=True, stream=False, **kwargs):
+        """
+        Same as GenerativeModel.generate_content(), through the limits, the response cache and coalescing.
+
+        Parameters:
+            contents: The prompt.
+            call_site (str): Name of the caller, for its cache TTL, its input budget and the reports.
+            cache (bool): False for calls whose answer should never be reused, e.g. conversational ones.
+            stream (bool): Stream the response. Streams are not retried once started, not coalesced, and a
+                cached response comes as a single chunk.
+        """
+        contents, truncated = fit_to_budget(contents, call_site)
+        record = self._recorder(call_site, contents, truncated)
+        response_cache = self._response_cache or get_response_cache()
+        key = cache_key(self.model_name, contents, kwargs)
+        use_cache = cache and key is not None and response_cache.enabled_for(call_site)
+        if use_cache:
+            cached = response_cache.get(key, call_site)
+            if cached is not None:
+                record("cached", text=cached)
+                return CachedResponse(cached)
+        request_options = self._request_options(kwargs)
+        started = time.perf_counter()
+
+        def request():
+            return self.model.generate_content(contents, stream=stream, request_options=request_options, **kwargs)
+
+        def send():
+            try:
+                return self._call(request, call_site, hold_slot=stream)
+            except Exception:
+                record("error")
+                raise
+
+        if stream:
+            response = send()
+
+            def on_complete(text, last_chunk):
+                record("sent", last_chunk, text)
+                if use_cache and text:
+                    response_cache.put(key, call_site, text, time.perf_counter() - started)
+
+            # The stream keeps its request slot until it is read to the end, fails or is dropped
+            return RecordingStream(response, on_complete, on_close=self._release_slot)
+
+        if key is None:
+            response = send()
+            record("sent", response, _text(response))
+            return response
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            self.coalesced += 1
+            try:
+                response = future.result()
+            except Exception:
+                record("error")
+                raise
+            record("coalesced", response, _text(response))
+            return response
+        try:
+            response = send()
+            future.set_result(response)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+        text = _text(response)
+        record("sent", response, text)
+        if use_cache and text is not None:
+            response_cache.put(key, call_site, text, time.perf_counter() - started)
+        return response
+
+    def start_chat(self, history=None, **kwargs):
+        """
+        Starts a chat session whose send_message() goes through the limits; chat turns are never cached.
+        """
+        return _ChatSession(self, self.model.start_chat(history=history or [], **kwargs))
+
+    def embed_content(self, call_site="embed_content", **kwargs):
+        """
+        Same as genai.embed_content(), through the limits.
+        """
+        kwargs["request_options"] = self._request_options(kwargs)
+        record = self._recorder(call_site, kwargs.get("content", ""))
+        try:
+            result = self._call(lambda: genai.embed_content(**kwargs), call_site)
+        except Exception:
+            record("error")
+            raise
+        record("sent", text="")
+        return result
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_model():
+    """
+    Returns the shared Gemini client for GEMINI_MODEL, configured on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            genai.configure(api_key=GEMINI_API_KEY)
+            _client = GeminiClient()
+        return _client
@@ -0,0 +1,98 @@
+import secrets
+import threading
+import time
+
+# Crockford base32, whose characters sort in the same order as the values they encode
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# Leading letter of sortable IDs, so they sort after the legacy numeric IDs in the same collection
+SORTABLE_PREFIX = "T"
+# Leading letter and digit count of counter IDs: zero-padded numbers sort in numeric order ("N0000000010" after
+# "N0000000009", where "10" sorted before "9"), after the unpadded legacy IDs and before the sortable ones
+COUNTER_PREFIX = "N"
+COUNTER_WIDTH = 10
+
+_last_millis = 0
+_last_random = 0
+_lock = threading.Lock()
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def new_sortable_id():
+    """
+    Generates a time-ordered ID locally, without any round-trip.
+
+    The ID is a prefix letter, a 48-bit millisecond timestamp and 80 random bits (as in ULID), in
+    Crockford base32. IDs from the same process made within the same millisecond increment the random
+    part, so they still sort in creation order; IDs from different clients practically never collide.
+
+    Returns:
+        str: A 27 character ID whose string order is its creation order.
+    """
+    global _last_millis, _last_random
+    with _lock:
+        millis = time.time_ns() // 1_000_000
+        if millis <= _last_millis:
+            millis = _last_millis
+            random_part = (_last_random + 1) % (1 << 80)
+        else:
+            random_part = secrets.randbits(80)
+        _last_millis, _last_random = millis, random_part
+    return SORTABLE_PREFIX + _encode(millis, 10) + _encode(random_part, 16)
+
+
+def next_counter_id(db, counter_name):
+    """
+    Atomically increments a legacy counter document in the metadata collection and returns the new value.
+
+    The read and write happen in one transaction, so concurrent clients never get the same number.
+
+    Parameters:
+        db: The document store from storage.get_db().
+        counter_name (str): The counter document, e.g. "session_counter".
+
+    Returns:
+        int: The next number.
+    """
+    return db.increment_counter("metadata", counter_name)
+
+
+def counter_id(number):
+    """
+    Returns the document ID of a counter value, e.g. "N0000000012" for 12.
+    """
+    return f"{COUNTER_PREFIX}{number:0{COUNTER_WIDTH}d}"
+
+
+def normalize_id(text):
+    """
+    Turns an ID as a user said or typed it into the stored form: "12", "n12" and "N 12" become "N0000000012".
+    Any other ID is returned stripped of surrounding spaces.
+    """
+    text = text.strip()
+    digits = text[1:].strip() if text[:1].upper() == COUNTER_PREFIX else text
+    return counter_id(int(digits)) if digits.isdigit() else text
+
+
+def next_id(db, kind, mode):
+    """
+    Returns a new ID for a session, note, etc.
+
+    Parameters:
+        db: The document store, only used in counter mode.
+        kind (str): What the ID is for, e.g. "session"; counter mode uses the "<kind>_counter" document.
+        mode (str): "sortable" for a time-ordered ID made locally, "counter" for the next number from a
+            counter document, as a counter_id().
+
+    Returns:
+        str: The new ID, usable as a document ID.
+    """
+    if mode == "counter":
+        return counter_id(next_counter_id(db, f"{kind}_counter"))
+    return new_sortable_id()
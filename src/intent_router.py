@@ -0,0 +1,270 @@
+import time
+from collections import deque, namedtuple
+from pathlib import Path
+
+from module_registry import FEATURE_MODULES
+
+# Weight of each kind of trigger word declared in FEATURE_MODULES
+KEYWORD_WEIGHT = 1.0
+WEAK_KEYWORD_WEIGHT = 0.5
+CONTEXT_WEIGHT = 0.25
+# Multi-word phrases are more specific than single words
+PHRASE_BONUS = 0.5
+# Bonus for the feature owning the last keyword; in "open the task file" the head noun is "file"
+HEAD_BONUS = 0.1
+
+# Word endings accepted after a keyword, so "task" also matches "tasks" and "transcribe" matches "transcribed"
+INFLECTIONS = ("", "s", "es", "d", "ed", "ing")
+
+CORPUS_PATH = Path(__file__).with_name("intent_corpus.tsv")
+
+Intent = namedtuple("Intent", ["feature", "score", "confidence", "matches"])
+
+
+def build_automaton(patterns):
+    """
+    Compiles patterns into an Aho-Corasick automaton.
+
+    Parameters:
+        patterns (list of str): The patterns to match.
+
+    Returns:
+        tuple: (goto, fail, output) tables; output maps a state to the indices of the patterns ending there.
+    """
+    goto = [{}]
+    output = [[]]
+    for index, pattern in enumerate(patterns):
+        state = 0
+        for char in pattern:
+            if char not in goto[state]:
+                goto.append({})
+                output.append([])
+                goto[state][char] = len(goto) - 1
+            state = goto[state][char]
+        output[state].append(index)
+
+    # Breadth-first pass to compute failure links, merging outputs along them
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in goto[state].items():
+            queue.append(next_state)
+            if state:
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+            output[next_state] = output[next_state] + output[fail[next_state]]
+    return goto, fail, output
+
+
+def compile_router(features=None):
+    """
+    Compiles every feature's trigger words into a single matcher.
+
+    Parameters:
+        features (dict): Feature declarations, FEATURE_MODULES by default.
+
+    Returns:
+        dict: The compiled router, used by route().
+    """
+    features = FEATURE_MODULES if features is None else features
+    patterns = []
+    # (feature, kind, weight) for each pattern, a word may be declared by several features
+    owners = []
+    index_of = {}
+    for feature, spec in features.items():
+        for kind, weight in (("keywords", KEYWORD_WEIGHT), ("weak_keywords", WEAK_KEYWORD_WEIGHT),
+                             ("context", CONTEXT_WEIGHT)):
+            for word in spec.get(kind, []):
+                word = word.lower()
+                if word not in index_of:
+                    index_of[word] = len(patterns)
+                    patterns.append(word)
+                    owners.append([])
+                owners[index_of[word]].append((feature, kind, weight + PHRASE_BONUS if " " in word else weight))
+
+    goto, fail, output = build_automaton(patterns)
+    return {
+        "patterns": patterns,
+        "owners": owners,
+        "goto": goto,
+        "fail": fail,
+        "output": output,
+        "order": {feature: position for position, feature in enumerate(features)},
+    }
+
+
+def _find_matches(router, text):
+    """
+    Yields (pattern index, start, end) for every whole-word pattern occurrence in one pass over the text.
+    """
+    goto, fail, output, patterns = router["goto"], router["fail"], router["output"], router["patterns"]
+    state = 0
+    for position, char in enumerate(text):
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        for index in output[state]:
+            start = position - len(patterns[index]) + 1
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            end = position + 1
+            while end < len(text) and text[end].isalnum():
+                end += 1
+            if text[position + 1:end] in INFLECTIONS:
+                yield index, start, end
+
+
+def route(command, router=None):
+    """
+    Scores every feature against a command in a single pass and ranks the candidates.
+
+    Parameters:
+        command (str): The voice command.
+        router (dict): A router from compile_router(), the default one if not given.
+
+    Returns:
+        list of Intent: Candidate features, best first. Empty if nothing matched, meaning the command
+        should go to the conversational fallback.
+    """
+    router = _default_router if router is None else router
+    text = command.lower()
+
+    # Each word counts once per feature, at the highest weight it was declared with
+    weights = {}
+    triggered = set()
+    last_keyword = {}
+    matches = {}
+    for index, start, end in _find_matches(router, text):
+        for feature, kind, weight in router["owners"][index]:
+            word = router["patterns"][index]
+            feature_weights = weights.setdefault(feature, {})
+            feature_weights[word] = max(weight, feature_weights.get(word, 0))
+            matches.setdefault(feature, []).append(word)
+            # Only a keyword triggers a feature; weak ones like "next" or "stop" are too common to route alone
+            if kind == "keywords":
+                triggered.add(feature)
+            if kind != "context":
+                last_keyword[feature] = max(end, last_keyword.get(feature, 0))
+
+    scores = {feature: sum(weights[feature].values()) for feature in triggered}
+    if not scores:
+        return []
+    head = max(triggered, key=last_keyword.get)
+    scores[head] += HEAD_BONUS
+
+    total = sum(scores.values())
+    ranked = sorted(scores, key=lambda feature: (-scores[feature], router["order"][feature]))
+    return [Intent(feature, scores[feature], scores[feature] / total, matches[feature]) for feature in ranked]
+
+
+def best_feature(command, router=None, is_custom_command=None):
+    """
+    Returns the best-scoring feature for a command, or None for the conversational fallback.
+
+    Parameters:
+        command (str): The voice command.
+        router (dict): A router from compile_router(), the default one if not given.
+        is_custom_command (callable): Tells whether a command is a custom command the user saved. Custom
+            commands are saved under the whole command, e.g. "open calculator", so one that no keyword matches
+            still goes to custom_commands instead of the chat.
+    """
+    intents = route(command, router)
+    if intents:
+        return intents[0].feature
+    if is_custom_command is not None and is_custom_command(command):
+        return "custom_commands"
+    return None
+
+
+_default_router = compile_router()
+
+
+def load_corpus(path=CORPUS_PATH):
+    """
+    Loads the labelled utterance corpus: one "utterance<TAB>feature" per line, "chat" for the fallback.
+
+    Returns:
+        list of tuple: (utterance, expected feature or None) pairs.
+    """
+    corpus = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            utterance, feature = line.split("\t")
+            corpus.append((utterance, None if feature == "chat" else feature))
+    return corpus
+
+
+# The entertainment words of the routing this replaced, as they were, missing comma after "look" included
+ORIGINAL_ENTERTAINMENT_COMMANDS = ["play", "pause", "stop", "resume", "skip", "next", "previous", "shuffle", "repeat",
+                                   "look" "volume up", "volume down", "increase", "decrease", "seek", "jump"]
+
+
+def substring_route(command):
+    """
+    The previous routing, the if/elif chain of voice_interaction.activate_module as it was: the first branch
+    with one of its words anywhere in the command. Kept for comparison in the benchmark.
+    """
+    if "task" in command:
+        return "tasks"
+    elif "web" in command or "search" in command or "browse" in command:
+        return "web"
+    elif "note" in command:
+        return "notes"
+    elif "document" in command or "file" in command or "folder" in command or "directory" in command or \
+            "drive" in command:
+        return "documents"
+    elif "translation" in command or "translate" in command:
+        return "translation"
+    elif "email" in command or "mail" in command or "inbox" in command:
+        return "email"
+    elif "weather" in command or "news" in command or "headline" in command or "article" in command:
+        return "weather_and_news"
+    elif "recommendation" in command or "suggestion" in command or "advice" in command or \
+            "recommendations" in command or "recommend" in command:
+        return "recommendations"
+    elif "entertainment" in command or "music" in command or "video" in command or "movie" in command or \
+            "spotify" in command or "youtube" in command or \
+            any(cmd in command for cmd in ORIGINAL_ENTERTAINMENT_COMMANDS):
+        return "entertainment"
+    elif "meeting" in command or "summary" in command or "transcript" in command or "transcribe" in command:
+        return "meetings"
+    elif "custom" in command or "execute" in command or "run" in command or "perform" in command or \
+            "open" in command or "launch" in command or "start" in command:
+        return "custom_commands"
+    return None
+
+
+def benchmark(repeat=200):
+    """
+    Reports routing accuracy on the labelled corpus and the per-command routing cost.
+    """
+    corpus = load_corpus()
+    # As if the user had saved every custom command of the corpus
+    saved_commands = {utterance for utterance, expected in corpus if expected == "custom_commands"}
+
+    def scored_router(command):
+        return best_feature(command, is_custom_command=saved_commands.__contains__)
+
+    for name, router_fn in (("scored router", scored_router), ("substring chain", substring_route)):
+        misses = [(utterance, expected, router_fn(utterance)) for utterance, expected in corpus
+                  if router_fn(utterance) != expected]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for utterance, _ in corpus:
+                router_fn(utterance)
+        per_command = (time.perf_counter() - started) / (repeat * len(corpus))
+
+        print(f"{name}: {len(corpus) - len(misses)}/{len(corpus)} correct "
+              f"({(len(corpus) - len(misses)) / len(corpus):.1%}), {per_command * 1e6:.1f} us per command")
+        for utterance, expected, got in misses:
+            print(f"  '{utterance}': expected {expected or 'chat'}, got {got or 'chat'}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,77 +1,233 @@
+import atexit
+import queue
+import threading
+import time
 from datetime import datetime
 
-import google.generativeai as genai
-from firebase_admin import firestore
+from chat_context import ChatContext
+from config import CHAT_HISTORY_TURNS, SESSION_ID_MODE, MEMORY_RECALL_TURNS
+from gemini_client import get_model
+from id_service import new_sortable_id, next_id
+from memory_index import get_memory_index, index_history
+from storage import DESCENDING, get_db
+from streaming_speech import speak_streamed_response
 
-from config import GEMINI_API_KEY
+# Initialize the document store
+db = get_db()
 
-# Initialize Firestore
-db = firestore.client()
+# Each session is a document in interaction_history, with one document per turn in its messages subcollection
+MESSAGES_SUBCOLLECTION = "messages"
+WRITE_BATCH_SIZE = 400  # Turns per WriteBatch, Firestore allows 500 writes including the session documents
+WRITE_LINGER = 0.5  # Seconds the writer waits for more turns before committing a batch
+WRITE_RETRY_DELAY = 5.0  # Seconds before turns that failed to save are tried again
+FLUSH_TIMEOUT = 30.0  # Longest wait for pending turns at exit, e.g. while the store is unreachable
 
-# Configure GEMINI API
-genai.configure(api_key=GEMINI_API_KEY)
+# Turns waiting for the background writer, as (session_id, message key, message) tuples
+_pending_turns = queue.Queue()
+_sessions_written = set()
 
 
-# Function to get and increment session ID
+# Function to get a new session ID
 def get_next_session_id():
     """
-    Retrieve and increment the session ID from a dedicated counter document in Firestore.
+    Get a new session ID: a time-ordered ID made locally, or the next number from the session counter
+    document in Firestore when SESSION_ID_MODE is "counter".
     """
-    counter_ref = db.collection("metadata").document("session_counter")
-    counter_doc = counter_ref.get()
-    current_id = counter_doc.to_dict().get("count", 0) if counter_doc.exists else 0
-    next_id = current_id + 1
-    counter_ref.set({"count": next_id})  # Update the counter in Firestore
-    return next_id  # Use plain numeric ID
+    return next_id(db, "session", SESSION_ID_MODE)
 
 
-# Retrieve Latest Session's History by ID
+# Retrieve Latest Session's Summary and History by ID
 def get_last_session_history():
     """
-    Retrieve the chat history from the latest session in Firestore.
+    Retrieve the conversation summary and the last turns of the latest session in Firestore.
+
+    Returns:
+        tuple: (summary, turns) where turns is a list of (command, response) pairs, oldest first.
     """
-    # Fetch the latest session document by ordering by ID in descending order
-    sessions = db.collection("interaction_history").order_by("__name__", direction=firestore.Query.DESCENDING).limit(
+    # Fetch the latest session document by ordering by ID in descending order; time-ordered and zero-padded
+    # counter session IDs sort by creation time, and after the legacy unpadded numeric ones
+    sessions = db.collection("interaction_history").order_by("__name__", direction=DESCENDING).limit(
         1).stream()
+    summary = ""
     history = []
 
-    # Get messages from the latest session
+    # Get the last turns of the latest session, oldest first
     for session in sessions:
-        messages = session.to_dict().get("messages", [])
+        session_data = session.to_dict()
+        summary = session_data.get("summary", "")
+        # Sessions saved before turns moved to their own documents keep them in a "messages" array
+        messages = session_data.get("messages")
+        if messages is None:
+            turns = session.reference.collection(MESSAGES_SUBCOLLECTION).order_by(
+                "__name__", direction=DESCENDING).limit(CHAT_HISTORY_TURNS).stream()
+            messages = reversed([turn.to_dict() for turn in turns])
+        else:
+            messages = messages[-CHAT_HISTORY_TURNS:]
         for message in messages:
             if "command" in message and "response" in message:
-                history.append({"role": "user", "parts": message["command"]})
-                history.append({"role": "model", "parts": message["response"]})
+                history.append((message["command"], message["response"]))
 
     # print("Retrieved history:", history)
-    return history
+    return summary, history
+
 
+def save_summary(session_id: str, summary: str):
+    """
+    Persists the rolling conversation summary on the session document.
+    """
+    db.collection("interaction_history").document(str(session_id)).set({"summary": summary}, merge=True)
+
+
+def recall_turns(session_id, command):
+    """
+    Returns the past turns, from sessions other than the current one, most relevant to a command.
 
-# GEMINI Interaction with History
-def initialize_chat_with_gemini(history):
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    chat = model.start_chat(history=history)
+    Returns:
+        list of tuple: Up to MEMORY_RECALL_TURNS (command, response) pairs.
+    """
+    return [(turn["command"], turn["response"])
+            for _, turn in get_memory_index().search(command, k=MEMORY_RECALL_TURNS, exclude_session=str(session_id))]
+
+
+def _backfill_memory():
+    """
+    Indexes the turns saved before the memory index existed. Later turns are indexed as they are written.
+    """
+    try:
+        added = index_history(db)
+        if added:
+            print(f"Indexed {added} past turns for recall.")
+    except Exception as e:
+        print(f"Error indexing interaction history: {e}")
+
+
+# GEMINI Interaction with a bounded history and recall of relevant past turns
+def initialize_chat_with_gemini(session_id, summary, history):
+    model = get_model()
+    chat = ChatContext(model, summary, history, on_summary=lambda new_summary: save_summary(session_id, new_summary),
+                       recall=lambda command: recall_turns(session_id, command))
     return chat
 
 
-# Save or Append to Continuous Chat in Firestore
-def save_to_chat(session_id: int, command: str, response: str):
-    chat_ref = db.collection("interaction_history").document(str(session_id))  # Use numeric ID as string
-    new_message = {"timestamp": datetime.now(), "command": command, "response": response}
-    chat_ref.set({"messages": firestore.ArrayUnion([new_message])}, merge=True)
+def _commit_turns(turns):
+    """
+    Writes a group of turns, and the documents of sessions seen for the first time, in one WriteBatch.
+    """
+    batch = db.batch()
+    sessions = db.collection("interaction_history")
+    new_sessions = []
+    for session_id, key, message in turns:
+        session_ref = sessions.document(str(session_id))
+        if session_id not in _sessions_written and session_id not in new_sessions:
+            batch.set(session_ref, {"started_at": message["timestamp"]}, merge=True)
+            new_sessions.append(session_id)
+        batch.set(session_ref.collection(MESSAGES_SUBCOLLECTION).document(key), message)
+    batch.commit()
+    _sessions_written.update(new_sessions)
+
+
+def _history_writer():
+    """
+    Background writer: collects pending turns for up to WRITE_LINGER seconds and commits them together.
+    Turns are indexed for recall once they are saved; turns that failed to save are kept and tried again with
+    the next batch.
+    """
+    failed = []
+    while True:
+        turns = failed or [_pending_turns.get()]
+        deadline = time.monotonic() + WRITE_LINGER
+        while len(turns) < WRITE_BATCH_SIZE:
+            try:
+                turns.append(_pending_turns.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        try:
+            _commit_turns(turns)
+        except Exception as e:
+            print(f"Error saving interaction history, retrying in {WRITE_RETRY_DELAY:.0f} s: {e}")
+            failed = turns
+            time.sleep(WRITE_RETRY_DELAY)
+            continue
+        failed = []
+        try:
+            get_memory_index().add([{"session_id": str(session_id), "key": key, "command": message["command"],
+                                     "response": message["response"], "timestamp": message["timestamp"]}
+                                    for session_id, key, message in turns
+                                    if "response" in message and not message.get("carried_over")])
+        except Exception as e:
+            print(f"Error indexing interaction history: {e}")
+        finally:
+            for _ in turns:
+                _pending_turns.task_done()
+
+
+threading.Thread(target=_history_writer, name="history-writer", daemon=True).start()
+
+
+# Save a turn to the session's messages in Firestore, in the background
+def save_to_chat(session_id: str, command: str, response: str = None, routed_to: str = None,
+                 carried_over: bool = False):
+    """
+    Queues a turn for the background writer.
+
+    Parameters:
+        response (str): The answer, or None for a command a feature handled without one; such turns are
+            logged with routed_to only, and never replayed to Gemini or indexed for recall.
+        routed_to (str): The feature that handled the command, if any.
+        carried_over (bool): The turn is a copy of one from the previous session, already indexed there.
+    """
+    new_message = {"timestamp": datetime.now(), "command": command}
+    if response is not None:
+        new_message["response"] = response
+    if routed_to is not None:
+        new_message["routed_to"] = routed_to
+    if carried_over:
+        new_message["carried_over"] = True
+    # Time-ordered IDs keep the turns sorted by document ID
+    _pending_turns.put((session_id, new_sortable_id(), new_message))
+
+
+@atexit.register
+def flush_history(timeout=FLUSH_TIMEOUT):
+    """
+    Blocks until every pending turn has been written, or for at most timeout seconds.
+    """
+    with _pending_turns.all_tasks_done:
+        if not _pending_turns.all_tasks_done.wait_for(lambda: not _pending_turns.unfinished_tasks, timeout):
+            print(f"{_pending_turns.unfinished_tasks} turns could not be saved to the interaction history.")
 
 
 # Main Interaction Function
-def handle_user_command(session_id: int, command: str, chat):
-    response = chat.send_message(command)
-    save_to_chat(session_id, command, response.text)
-    # print(f"Aura: {response.text}")
-    return response.text
+def handle_user_command(session_id: str, command: str, chat, speak_response=False):
+    """
+    Sends a command to the Gemini chat with its bounded history and saves the turn.
+
+    Parameters:
+        speak_response (bool): Stream the answer and speak it sentence by sentence as it arrives.
+
+    Returns:
+        str: The full response text.
+    """
+    if speak_response:
+        started = time.perf_counter()
+        response_text = speak_streamed_response(chat.send_message(command, stream=True), "chat", started)
+    else:
+        response_text = chat.send_message(command).text
+    chat.record_turn(command, response_text)
+    save_to_chat(session_id, command, response_text)
+    # print(f"Aura: {response_text}")
+    return response_text
 
 
 def interaction_history():
     # Initialize chat history
     session_id = get_next_session_id()
-    history = get_last_session_history()
-    chat = initialize_chat_with_gemini(history)
+    summary, history = get_last_session_history()
+    # The turns kept verbatim from the previous session are saved in this one too, so the next session still
+    # starts from them if this one ends before they are folded into the summary
+    for command, response in history:
+        save_to_chat(session_id, command, response, carried_over=True)
+    chat = initialize_chat_with_gemini(session_id, summary, history)
+    if not len(get_memory_index()):
+        threading.Thread(target=_backfill_memory, name="memory-backfill", daemon=True).start()
     return session_id, chat
@@ -0,0 +1,126 @@
+from audio_io import listen, speak
+from config import LIST_PAGE_SIZE
+
+# Answers that ask for the next page
+NEXT_PAGE_WORDS = ("next", "more", "continue", "yes")
+
+
+class Pager:
+    """
+    Reads a query one page at a time, fetching only the listed fields.
+
+    Pages are read with select() and a start_after() cursor on the last document of the previous page, so
+    each page costs page_size small reads however many documents came before it and however large they are.
+    The first page can come from elsewhere, e.g. a CollectionCache, with the store read from the second on.
+    """
+
+    def __init__(self, query, fields, order_by="__name__", page_size=LIST_PAGE_SIZE, first_page=None):
+        """
+        Parameters:
+            query: A collection or query from the document store.
+            fields (list of str): The fields to fetch; the order_by field is added if needed for the cursor.
+            order_by (str): Field to sort by, the document ID by default. Must be the field of any range filter.
+            page_size (int): Documents per page.
+            first_page (callable): Called with a number of documents, returns that many of the query's first
+                documents, sorted the same way, each with its ID under "id".
+        """
+        if order_by != "__name__" and order_by not in fields:
+            fields = list(fields) + [order_by]
+        self._query = query.select(fields).order_by(order_by)
+        if order_by != "__name__":
+            # The implicit tie-break made explicit, so a cursor of values can name it too
+            self._query = self._query.order_by("__name__")
+        self._order_by = order_by
+        self._first_page = first_page
+        self.page_size = page_size
+        self.has_more = True
+        self._last = None
+
+    def next_page(self):
+        """
+        Returns the next page of documents, each with its document ID under "id".
+        """
+        if not self.has_more:
+            return []
+        if self._last is None and self._first_page is not None:
+            documents = self._first_page(self.page_size + 1)
+            self.has_more = len(documents) > self.page_size
+            documents = documents[:self.page_size]
+            if documents:
+                # A cursor of values: the order_by field, then the document ID that breaks ties
+                last = documents[-1]
+                self._last = {"__name__": last["id"]} if self._order_by == "__name__" else \
+                    {self._order_by: last.get(self._order_by), "__name__": last["id"]}
+            return [dict(document) for document in documents]
+        query = self._query if self._last is None else self._query.start_after(self._last)
+        # One extra document tells whether there is another page without an empty round-trip at the end
+        snapshots = list(query.limit(self.page_size + 1).stream())
+        self.has_more = len(snapshots) > self.page_size
+        snapshots = snapshots[:self.page_size]
+        if snapshots:
+            self._last = snapshots[-1]
+        return [dict(snapshot.to_dict(), id=snapshot.id) for snapshot in snapshots]
+
+    def all(self):
+        """
+        Returns every remaining document, page by page.
+        """
+        documents = []
+        while self.has_more:
+            documents.extend(self.next_page())
+        return documents
+
+
+class ListPager:
+    """
+    Pages through documents already in memory, e.g. a sorted folder listing, with the same interface as Pager.
+    """
+
+    def __init__(self, items, page_size=LIST_PAGE_SIZE):
+        self._items = items
+        self.page_size = page_size
+        self._position = 0
+        self.has_more = bool(items)
+
+    def next_page(self):
+        page = self._items[self._position:self._position + self.page_size]
+        self._position += len(page)
+        self.has_more = self._position < len(self._items)
+        return page
+
+    def all(self):
+        items = self._items[self._position:]
+        self._position, self.has_more = len(self._items), False
+        return items
+
+
+def browse(pager, describe, noun="items"):
+    """
+    Voice-driven listing: prints a page, then asks whether to go on to the next one.
+
+    Parameters:
+        pager (Pager): The listing to browse.
+        describe (callable): Formats one document for the console.
+        noun (str): What is listed, for the prompts, e.g. "notes".
+
+    Returns:
+        list of dict: The documents shown.
+    """
+    shown = []
+    page = pager.next_page()
+    if not page:
+        speak(f"There are no {noun}.")
+        return shown
+    while True:
+        for document in page:
+            print(describe(document))
+        shown.extend(page)
+        if not pager.has_more:
+            speak(f"That's all {len(shown)} {noun}." if len(shown) > len(page) else
+                  f"{len(shown)} {noun} are displayed on the console.")
+            return shown
+        speak(f"{len(shown)} {noun} displayed on the console. Say next page for more, or stop.")
+        answer = listen().lower()
+        if not any(word in answer for word in NEXT_PAGE_WORDS):
+            return shown
+        page = pager.next_page()
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import LLM_CACHE_DISABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_TTLS
+
+DAY = 24 * 3600
+# Lifetime of cached responses per call site, in seconds; overridden by LLM_CACHE_TTLS. Prompts that embed their
+# whole input (a note, an email, a file) stay valid as long as the input does, so they can live long.
+DEFAULT_TTLS = {
+    "summarize_note": 30 * DAY,
+    "summarize_document": 30 * DAY,
+    "summarize_chunk": 30 * DAY,
+    "summarize_text": 30 * DAY,
+    "classify_document": 30 * DAY,
+    "infer_task_details": 30 * DAY,
+    "summarize_email": 30 * DAY,
+    "suggest_command": 30 * DAY,
+    "reply_email": DAY,
+    "summarize_results_with_gemini": DAY,
+}
+
+
+def _parse_ttls(text):
+    ttls = dict(DEFAULT_TTLS)
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        call_site, _, seconds = item.partition("=")
+        try:
+            ttls[call_site.strip()] = float(seconds)
+        except ValueError:
+            print(f"Ignoring invalid LLM_CACHE_TTLS entry '{item}'.")
+    return ttls
+
+
+class CachedResponse:
+    """
+    A response answered from the cache. Like a Gemini response it has .text, and iterating over it yields
+    itself as the only chunk, so code written for streamed responses reads it too.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        yield self
+
+
+class RecordingStream:
+    """
+    Passes a streamed response through chunk by chunk, and once the stream is read to the end calls
+    on_complete(full text, last chunk), e.g. to cache the text; the last chunk carries the token counts.
+    on_close is called once when the stream ends, fails, is abandoned part way or is dropped unread.
+    """
+
+    def __init__(self, response, on_complete, on_close=None):
+        self._response = response
+        self._on_complete = on_complete
+        self._on_close = on_close
+        self._close_lock = threading.Lock()
+
+    def __iter__(self):
+        parts = []
+        chunk = None
+        try:
+            for chunk in self._response:
+                try:
+                    parts.append(chunk.text)
+                except ValueError:
+                    pass  # Chunks without text, e.g. only safety ratings
+                yield chunk
+            self._on_complete("".join(parts), chunk)
+        finally:
+            self.close()
+
+    def close(self):
+        with self._close_lock:
+            on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+    def __del__(self):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def cache_key(model_name, contents, settings):
+    """
+    Returns the cache key of a request: a hash of the model, the prompt and the generation settings, or None
+    for prompts that cannot be cached, such as images or files.
+    """
+    try:
+        settings = json.dumps({name: settings[name] for name in sorted(settings)}, sort_keys=True, default=str)
+        prompt = json.dumps(contents, sort_keys=True)
+    except TypeError:
+        return None
+    return hashlib.sha256(f"{model_name}\n{settings}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of Gemini responses, in a local SQLite file.
+
+    Entries are keyed by model, prompt and generation settings, expire after their call site's TTL, and the
+    least recently used ones are dropped beyond max_entries. Hits, misses and the latency the hits saved (the
+    time the original request took) are counted per call site.
+    """
+
+    def __init__(self, path, max_entries=LLM_CACHE_MAX_ENTRIES, ttls=None, default_ttl=LLM_CACHE_TTL,
+                 disabled=()):
+        """
+        Parameters:
+            path (str): The SQLite file.
+            max_entries (int): Most responses kept.
+            ttls (dict): Lifetime in seconds per call site.
+            default_ttl (float): Lifetime for other call sites.
+            disabled (iterable of str): Call sites never cached, e.g. conversational ones.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        self.max_entries = max_entries
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.disabled = set(disabled)
+        # call_site -> {"hits", "misses", "saved"}
+        self.stats = {}
+        self._writes = 0
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, call_site TEXT NOT NULL,
+                    response TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL, latency REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+            """)
+
+    def enabled_for(self, call_site):
+        return call_site not in self.disabled and self.ttl(call_site) > 0
+
+    def ttl(self, call_site):
+        return self.ttls.get(call_site, self.default_ttl)
+
+    def _count(self, call_site, outcome, saved=0.0):
+        with self.lock:
+            entry = self.stats.setdefault(call_site, {"hits": 0, "misses": 0, "saved": 0.0})
+            entry[outcome] += 1
+            entry["saved"] += saved
+
+    def get(self, key, call_site):
+        """
+        Returns the cached response text for a key, or None if there is none or it expired.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT response, created, latency FROM responses WHERE key = ?",
+                                          (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl(call_site):
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        if row is None:
+            self._count(call_site, "misses")
+            return None
+        self._count(call_site, "hits", row[2])
+        return row[0]
+
+    def put(self, key, call_site, response, latency):
+        now = time.time()
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                                    (key, call_site, response, now, now, latency))
+            self._writes += 1
+            # Trimming needs a scan of the index, so it is done every few writes rather than on each one
+            if self._writes % 32 == 1:
+                self.connection.execute("""
+                    DELETE FROM responses WHERE key IN
+                        (SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)
+                """, (self.max_entries,))
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the response cache at LLM_CACHE_PATH, opened on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(LLM_CACHE_PATH, ttls=_parse_ttls(LLM_CACHE_TTLS),
+                                   disabled=filter(None, (name.strip() for name in LLM_CACHE_DISABLED.split(","))))
+        return _cache
+
+
+def print_llm_cache_report():
+    """
+    Prints the hit rate and the latency saved by the response cache per call site.
+    """
+    if _cache is None or not _cache.stats:
+        return
+    print("\nGemini response cache:")
+    for call_site, entry in sorted(_cache.stats.items()):
+        total = entry["hits"] + entry["misses"]
+        print(f"  {call_site:<30} {entry['hits']:5d} hits, {entry['misses']:5d} misses "
+              f"({entry['hits'] / total:.0%} hit rate), {entry['saved']:7.1f} s saved")
@@ -0,0 +1,205 @@
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from chat_context import CHARS_PER_TOKEN, estimate_tokens
+from config import LLM_INPUT_BUDGETS, LLM_USAGE_PATH, LLM_USAGE_RETENTION_DAYS, LLM_USAGE_WINDOW_HOURS
+
+# Most input tokens per request, per call site; overridden by LLM_INPUT_BUDGETS. Longer prompts are cut to
+# the budget before they are sent. The chat is bounded by CHAT_TOKEN_BUDGET in ChatContext instead.
+DEFAULT_BUDGETS = {
+    "summarize_note": 8000,
+    "summarize_email": 4000,
+    "reply_email": 4000,
+    "summarize_results_with_gemini": 4000,
+    "infer_task_details": 1000,
+    "suggest_command": 1000,
+}
+# Call sites whose budget sets the size of the chunks a Summarizer splits its input into, instead of cutting it;
+# see Summarizer.chunk_tokens_for()
+CHUNKED_CALL_SITES = {"summarize_chunk", "summarize_document", "summarize_text", "summarize_file", "summarize"}
+
+
+def _parse_budgets(text):
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        call_site, _, tokens = item.partition("=")
+        try:
+            budgets[call_site.strip()] = int(tokens)
+        except ValueError:
+            print(f"Ignoring invalid LLM_INPUT_BUDGETS entry '{item}'.")
+    return budgets
+
+
+_budgets = _parse_budgets(LLM_INPUT_BUDGETS)
+
+
+def input_budget(call_site, default=None):
+    """
+    Returns the input token budget of a call site, or default if it has none.
+    """
+    return _budgets.get(call_site, default)
+
+
+def fit_to_budget(contents, call_site):
+    """
+    Cuts a text prompt down to its call site's input budget, keeping its start.
+
+    Returns:
+        tuple: (contents, whether they were cut)
+    """
+    budget = input_budget(call_site)
+    if budget is None or call_site in CHUNKED_CALL_SITES or not isinstance(contents, str):
+        return contents, False
+    if estimate_tokens(contents) <= budget:
+        return contents, False
+    print(f"[{call_site}] Prompt of about {estimate_tokens(contents)} tokens cut to its budget of {budget}.")
+    return contents[:budget * CHARS_PER_TOKEN], True
+
+
+def prompt_tokens(contents):
+    """
+    Estimates the tokens of a prompt: a text, or a list of texts or chat messages.
+    """
+    if isinstance(contents, str):
+        return estimate_tokens(contents)
+    if isinstance(contents, dict):
+        return prompt_tokens(contents.get("parts", ""))
+    if isinstance(contents, (list, tuple)):
+        return sum(prompt_tokens(part) for part in contents)
+    return estimate_tokens(str(getattr(contents, "parts", contents)))
+
+
+def response_tokens(response, contents, text):
+    """
+    Returns (input tokens, output tokens) of a request: the counts Gemini reports in usage_metadata when the
+    response has them, estimates from the texts otherwise.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if not input_tokens:
+        input_tokens = prompt_tokens(contents)
+    if not output_tokens:
+        output_tokens = estimate_tokens(text or "")
+    return input_tokens, output_tokens
+
+
+class UsageLedger:
+    """
+    Local record of every Gemini call, in a SQLite file: when, from which call site, input and output tokens,
+    latency, and whether it was sent, answered from the cache, coalesced with an identical request, or failed.
+
+    Rows older than the retention period are dropped when the ledger is opened, so reports cover a rolling
+    window.
+    """
+
+    def __init__(self, path, retention_days=LLM_USAGE_RETENTION_DAYS):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS calls (id INTEGER PRIMARY KEY, at REAL NOT NULL, call_site TEXT NOT NULL,
+                    model TEXT, input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, latency REAL NOT NULL,
+                    status TEXT NOT NULL, truncated INTEGER NOT NULL DEFAULT 0);
+                CREATE INDEX IF NOT EXISTS calls_at ON calls (at);
+            """)
+            self.connection.execute("DELETE FROM calls WHERE at < ?", (time.time() - retention_days * 24 * 3600,))
+
+    def record(self, call_site, model, input_tokens, output_tokens, latency, status, truncated=False):
+        """
+        Records one call.
+
+        Parameters:
+            status (str): "sent", "cached", "coalesced" or "error".
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO calls (at, call_site, model, input_tokens, output_tokens, latency, status, truncated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), call_site, model, input_tokens, output_tokens, latency, status, int(truncated)))
+
+    def report(self, hours=LLM_USAGE_WINDOW_HOURS):
+        """
+        Summarizes the calls of the last hours per call site, most input tokens first.
+
+        Returns:
+            list of dict: {"call_site", "calls", "sent", "cached", "coalesced", "errors", "truncated",
+            "input_tokens", "output_tokens", "average_latency", "p95_latency"}; tokens and latency count sent
+            calls only.
+        """
+        since = time.time() - hours * 3600
+        with self.lock:
+            rows = self.connection.execute("""
+                SELECT call_site, COUNT(*), SUM(status = 'sent'), SUM(status = 'cached'), SUM(status = 'coalesced'),
+                    SUM(status = 'error'), SUM(truncated),
+                    SUM(CASE WHEN status = 'sent' THEN input_tokens ELSE 0 END),
+                    SUM(CASE WHEN status = 'sent' THEN output_tokens ELSE 0 END)
+                FROM calls WHERE at >= ? GROUP BY call_site
+            """, (since,)).fetchall()
+            latencies = {}
+            for call_site, latency in self.connection.execute(
+                    "SELECT call_site, latency FROM calls WHERE at >= ? AND status = 'sent' ORDER BY latency",
+                    (since,)):
+                latencies.setdefault(call_site, []).append(latency)
+        report = []
+        for call_site, calls, sent, cached, coalesced, errors, truncated, input_tokens, output_tokens in rows:
+            samples = latencies.get(call_site, [])
+            report.append({
+                "call_site": call_site, "calls": calls, "sent": sent, "cached": cached, "coalesced": coalesced,
+                "errors": errors, "truncated": truncated, "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "average_latency": sum(samples) / len(samples) if samples else 0.0,
+                "p95_latency": samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0,
+            })
+        report.sort(key=lambda entry: entry["input_tokens"], reverse=True)
+        return report
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger():
+    """
+    Returns the usage ledger at LLM_USAGE_PATH, opened on first use.
+    """
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UsageLedger(LLM_USAGE_PATH)
+        return _ledger
+
+
+def record_call(call_site, model, input_tokens, output_tokens, latency, status, truncated=False):
+    """
+    Records one Gemini call in the shared ledger; a failure to record never fails the call.
+    """
+    try:
+        get_usage_ledger().record(call_site, model, input_tokens, output_tokens, latency, status, truncated)
+    except sqlite3.Error as e:
+        print(f"Error recording Gemini usage: {e}")
+
+
+def print_usage_report(hours=LLM_USAGE_WINDOW_HOURS):
+    """
+    Prints the Gemini usage of the last hours per call site.
+    """
+    report = get_usage_ledger().report(hours)
+    if not report:
+        return
+    print(f"\nGemini usage, last {hours:g} h:")
+    for entry in report:
+        print(f"  {entry['call_site']:<30} {entry['calls']:5d} calls ({entry['sent']} sent, {entry['cached']} cached, "
+              f"{entry['coalesced']} coalesced, {entry['errors']} failed, {entry['truncated']} cut), "
+              f"{entry['input_tokens']:8d} in / {entry['output_tokens']:7d} out tokens, "
+              f"{entry['average_latency'] * 1000:7.0f} ms average, {entry['p95_latency'] * 1000:7.0f} ms p95")
+
+
+if __name__ == "__main__":
+    print_usage_report(float(sys.argv[1]) if len(sys.argv) > 1 else LLM_USAGE_WINDOW_HOURS)
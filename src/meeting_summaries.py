@@ -1,46 +1,43 @@
-import os
 from pathlib import Path
 
-import google.generativeai as genai
-import pyttsx3
-import speech_recognition as sr
-import whisper
-from firebase_admin import firestore
+from audio_io import listen, speak
+from file_index import find_path
+from gemini_client import get_model
+from listing import Pager, browse
+from segmented_transcription import transcribe_long
+from storage import get_db
+from summarization import Summarizer
+from transcription_service import get_transcription_service
 
-from config import GEMINI_API_KEY
-
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
-
-# Initialize Firestore
-db = firestore.client()
+# Initialize the document store
+db = get_db()
 
 # Initialize GEMINI
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+model = get_model()
+# Long transcripts are summarized in chunks
+transcript_summarizer = Summarizer(model, "Summarize the following meeting transcript, briefly")
 
 
-# Initialize Whisper Model
-def load_model():
-    whisper_model = whisper.load_model("base")
-    return whisper_model
+# Whisper runs in worker processes that keep the model loaded between meetings; start loading it now, while
+# the user is still naming the audio file
+transcription_service = get_transcription_service()
+transcription_service.warm_up()
 
 
-# Transcribe Audio Function
-def transcribe_audio(whisper_model, file_path):
-    result = whisper_model.transcribe(file_path)
+# Transcribe Audio Function: silences are skipped and the speech is transcribed in parallel segments
+def transcribe_audio(file_path):
+    result = transcribe_long(file_path, transcription_service)
     transcript = result['text']
     print("Transcript : ", transcript)
     return transcript
 
 
-# Summarize Transcript with GEMINI
-def summarize_text(text):
-    response = model.generate_content("Summarize the following meeting transcript, briefly :" + text)
-    print("Summary : ", response.text)
-    return response.text
+# Summarize Transcript with GEMINI, optionally speaking the summary as it streams in
+def summarize_text(text, speak_summary=False):
+    summary = transcript_summarizer.summarize_text(text, "summarize_text", speak_summary,
+                                                   intro="Here is the meeting summary.")
+    print("Summary : ", summary)
+    return summary
 
 
 # Store Meeting Summary in Firestore
@@ -55,13 +52,19 @@ def store_summary(meeting_title, transcript, summary):
 
 
 # Main Function to Transcribe, Summarize, and Store
-def process_meeting_summary(file_path, meeting_title):
-    whisper_model = load_model()
+def process_meeting_summary(file_path, meeting_title, speak_summary=False):
     print("Transcribing audio...")
-    transcript = transcribe_audio(whisper_model, file_path)
+    try:
+        transcript = transcribe_audio(file_path)
+    except RuntimeError as e:
+        print(f"Error occurred : {e}")
+        return
+    if not transcript.strip():
+        print(f"No speech found in '{file_path}', nothing to summarize.")
+        return
     print("Transcription complete. Summarizing text...")
     try:
-        summary = summarize_text(transcript)
+        summary = summarize_text(transcript, speak_summary)
         print("Summary complete. Storing in Firestore...")
         store_summary(meeting_title, transcript, summary)
         with open(f"{meeting_title}_summary.txt", "w") as file:
@@ -72,20 +75,18 @@ def process_meeting_summary(file_path, meeting_title):
 
 
 def findfile(name, path):
-    """Searches for a file by name in a specified base directory."""
-    for dirpath, _, filenames in os.walk(path):
-        for filename in filenames:
-            if Path(filename).stem.lower() == name:
-                return Path(dirpath) / filename
-
-    print(f"File '{name}' not found in '{path}'.")
-    return None
+    """Searches for a file by name in a specified base directory, through the file index."""
+    file_path = find_path(path, name)
+    if file_path is None:
+        print(f"File '{name}' not found in '{path}'.")
+    return file_path
 
 
 def getmeetings():
-    meetings = db.collection("meeting_summaries").stream()
-    for meeting in meetings:
-        print(meeting.to_dict())
+    # Transcripts are left out, they are by far the largest field
+    pager = Pager(db.collection("meeting_summaries"), ["title", "summary"])
+    return browse(pager, lambda meeting: f"{meeting.get('title', meeting['id'])}: {meeting.get('summary', '')}",
+                  "meetings")
 
 
 def retrieve_a_meeting(title):
@@ -97,29 +98,6 @@ def retrieve_a_meeting(title):
         print(f"Meeting '{title}' not found in Firestore.")
 
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
-
-
 def meeting_summary_voice_interaction(command):
     """
     Handles the meeting summary command.
@@ -143,7 +121,7 @@ def meeting_summary_voice_interaction(command):
         if audio_file:
             speak(f"Processing the meeting summary from the file located at {audio_file}.")
             title = Path(audio_file).stem
-            process_meeting_summary(audio_file, title)
+            process_meeting_summary(audio_file, title, speak_summary=True)
             speak("The meeting summary has been processed and stored.")
         else:
             speak("Sorry, I couldn't process the audio file. Please try again.")
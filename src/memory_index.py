@@ -0,0 +1,306 @@
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from config import MEMORY_EMBEDDER, MEMORY_INDEX_DIR
+
+TOKEN = re.compile(r"\w+")
+# Rows added to the vector file at a time, doubling as it grows
+INITIAL_CAPACITY = 1024
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: words and word pairs hashed into a fixed number of signed buckets, with sublinear term
+    frequency. No model or network needed, and good at finding turns that share rarer words with a command.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+
+    def _bucket(self, feature):
+        digest = _feature_hash(feature)
+        # The top bit picks the sign, so colliding features tend to cancel out instead of adding up
+        return digest % self.dimensions, 1.0 if digest >> 63 else -1.0
+
+    def embed(self, texts, is_query=False):
+        """
+        Returns one L2-normalized float32 row per text.
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = TOKEN.findall(text.lower())
+            counts = {}
+            for feature in words + [f"{first} {second}" for first, second in zip(words, words[1:])]:
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                bucket, sign = self._bucket(feature)
+                vectors[row, bucket] += sign * (1.0 + np.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class GeminiEmbedder:
+    """
+    Embeds with the Gemini embedding model; closer to meaning than HashingEmbedder, at one request per text.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model="models/text-embedding-004", dimensions=768):
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed(self, texts, is_query=False):
+        from gemini_client import get_model
+
+        task_type = "retrieval_query" if is_query else "retrieval_document"
+        client = get_model()
+        vectors = np.array([client.embed_content(model=self.model, content=text, task_type=task_type,
+                                                 call_site="embed_turn")["embedding"]
+                            for text in texts], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+EMBEDDERS = {"hashing": HashingEmbedder, "gemini": GeminiEmbedder}
+
+
+class MemoryIndex:
+    """
+    Vector index of every conversation turn, for recalling the past turns most relevant to a new command.
+
+    Embeddings are rows of one contiguous float32 matrix, memory-mapped from vectors.f32, so a lookup is a
+    single matrix-vector product over all turns. The turns themselves are appended to turns.jsonl, whose
+    line count is the number of valid rows: a row only counts once its vector has been written.
+    """
+
+    def __init__(self, directory, embedder):
+        """
+        Parameters:
+            directory (str): Where the index files are kept.
+            embedder: HashingEmbedder, GeminiEmbedder, or any object with name, dimensions and
+                embed(texts, is_query).
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+        self._lock = threading.RLock()
+        self._vectors_path = self.directory / "vectors.f32"
+        self._turns_path = self.directory / "turns.jsonl"
+        self._info_path = self.directory / "index.json"
+        self._keys = set()
+
+        info = {"embedder": embedder.name, "dimensions": self.dimensions}
+        if not self._info_path.exists() or json.loads(self._info_path.read_text()) != info:
+            # Vectors from another embedder are not comparable, start over
+            self._vectors_path.unlink(missing_ok=True)
+            self._turns_path.unlink(missing_ok=True)
+            self._info_path.write_text(json.dumps(info))
+
+        self.turns = []
+        if self._turns_path.exists():
+            valid_bytes = 0
+            with open(self._turns_path, "rb") as file:
+                for line in file:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("line cut short")
+                        self.turns.append(json.loads(line))
+                    except ValueError:
+                        break  # A line cut short by a crash, and everything after it, is dropped
+                    valid_bytes += len(line)
+            if valid_bytes < self._turns_path.stat().st_size:
+                # Cut the file back to its last whole line, so turns added from now on are not appended
+                # after the broken one and lost again on the next load, and drop the rows of the lost turns
+                with open(self._turns_path, "r+b") as file:
+                    file.truncate(valid_bytes)
+                with open(self._vectors_path, "r+b") as file:
+                    file.truncate(len(self.turns) * self.dimensions * 4)
+            self._keys = {turn["key"] for turn in self.turns}
+        self._capacity = 0
+        self._vectors = None
+        self._ensure_capacity(max(len(self.turns), INITIAL_CAPACITY))
+
+    def __len__(self):
+        return len(self.turns)
+
+    def _ensure_capacity(self, rows):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self._vectors_path, "ab") as file:
+            if file.tell() < capacity * self.dimensions * 4:
+                file.truncate(capacity * self.dimensions * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                  shape=(capacity, self.dimensions))
+        self._capacity = capacity
+
+    def add(self, turns):
+        """
+        Embeds and appends turns that are not indexed yet.
+
+        Parameters:
+            turns (list of dict): Turns with session_id, key, command and response; key identifies a turn.
+
+        Returns:
+            int: The number of turns added.
+        """
+        with self._lock:
+            turns = [turn for turn in turns if turn["key"] not in self._keys]
+        if not turns:
+            return 0
+        # Embedding may be a network call, searches go on meanwhile
+        vectors = self.embedder.embed([f"{turn['command']}\n{turn['response']}" for turn in turns])
+        with self._lock:
+            new_rows = [row for row, turn in enumerate(turns) if turn["key"] not in self._keys]
+            turns, vectors = [turns[row] for row in new_rows], vectors[new_rows]
+            start = len(self.turns)
+            self._ensure_capacity(start + len(turns))
+            self._vectors[start:start + len(turns)] = vectors
+            self._vectors.flush()
+            with open(self._turns_path, "a", encoding="utf-8") as file:
+                for turn in turns:
+                    file.write(json.dumps(turn, default=str) + "\n")
+            self.turns.extend(turns)
+            self._keys.update(turn["key"] for turn in turns)
+            return len(turns)
+
+    def search(self, text, k=3, min_score=0.2, exclude_session=None):
+        """
+        Finds the past turns most similar to a text.
+
+        Parameters:
+            text (str): Usually the new command.
+            k (int): Most turns returned.
+            min_score (float): Lowest cosine similarity worth returning.
+            exclude_session (str): Session whose turns are skipped, e.g. the current one, already in the
+                prompt.
+
+        Returns:
+            list of tuple: (score, turn) pairs, most similar first.
+        """
+        query = self.embedder.embed([text], is_query=True)[0]
+        with self._lock:
+            count = len(self.turns)
+            if not count:
+                return []
+            scores = self._vectors[:count] @ query
+            # Extra candidates make up for the excluded session's turns
+            top = min(count, k * 4 if exclude_session is not None else k)
+            candidates = np.argpartition(-scores, top - 1)[:top]
+            results = []
+            for row in candidates[np.argsort(-scores[candidates])]:
+                turn = self.turns[row]
+                if scores[row] < min_score or len(results) == k:
+                    break
+                if turn["session_id"] != exclude_session:
+                    results.append((float(scores[row]), turn))
+            return results
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_memory_index():
+    """
+    Returns the memory index in MEMORY_INDEX_DIR, using the MEMORY_EMBEDDER embedder, opened on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MemoryIndex(MEMORY_INDEX_DIR, EMBEDDERS.get(MEMORY_EMBEDDER, HashingEmbedder)())
+        return _index
+
+
+def index_history(db, index=None):
+    """
+    Indexes every turn saved in interaction_history, skipping turns already indexed.
+
+    Parameters:
+        db: The document store from storage.get_db().
+        index (MemoryIndex): The index to fill, the shared one by default.
+
+    Returns:
+        int: The number of turns added.
+    """
+    index = get_memory_index() if index is None else index
+    added = 0
+    for session in db.collection("interaction_history").stream():
+        session_data = session.to_dict()
+        # Sessions saved before turns moved to their own documents keep them in a "messages" array
+        if "messages" in session_data:
+            messages = [(f"{session.id}:{position}", message)
+                        for position, message in enumerate(session_data["messages"])]
+        else:
+            messages = [(turn.id, turn.to_dict()) for turn in session.reference.collection("messages").stream()]
+        added += index.add([{"session_id": session.id, "key": key, "command": message["command"],
+                             "response": message["response"], "timestamp": message.get("timestamp")}
+                            for key, message in messages
+                            if "command" in message and "response" in message and not message.get("carried_over")])
+    return added
+
+
+def benchmark(turn_count=50000, queries=200):
+    """
+    Times indexing and top-k lookups over synthetic turns with the hashing embedder.
+    """
+    generator = random.Random(7)
+    words = [f"word{index}" for index in range(3000)]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    turns = [{
+        "session_id": str(index // 20),
+        "key": str(index),
+        "command": " ".join(generator.choices(words, weights, k=8)),
+        "response": " ".join(generator.choices(words, weights, k=30)),
+    } for index in range(turn_count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryIndex(directory, HashingEmbedder())
+        started = time.perf_counter()
+        for start in range(0, turn_count, 500):
+            index.add(turns[start:start + 500])
+        elapsed = time.perf_counter() - started
+        print(f"indexed {turn_count} turns in {elapsed:.2f} s ({turn_count / elapsed:.0f} turns/s), "
+              f"{os.path.getsize(Path(directory) / 'vectors.f32') / 1e6:.0f} MB of vectors")
+
+        started = time.perf_counter()
+        for turn in generator.sample(turns, queries):
+            index.search(turn["command"], k=3)
+        print(f"top-3 search: {(time.perf_counter() - started) / queries * 1000:.2f} ms per query")
+
+        probe = turns[1234]
+        results = index.search(probe["command"], k=3)
+        print(f"own turn recalled first: {results[0][1]['key'] == probe['key']} (score {results[0][0]:.2f})")
+        index.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,172 @@
+import importlib
+import time
+
+# Reference point for the load report, taken as early as voice_interaction imports this module
+PROCESS_START = time.perf_counter()
+
+# Feature modules. Each feature declares its entry function and the words that route commands to it:
+# "keywords" trigger the feature, while "weak_keywords" (at half weight) and "context" words only add to
+# the score of a feature already triggered. The intent router compiles all of them into one matcher;
+# the module itself is only imported (and runs its setup) the first time a command routes to it.
+# Declaration order breaks ties between equally scored features.
+FEATURE_MODULES = {
+    "tasks": {
+        "module": "task_management",
+        "entry": "task_voice_interaction",
+        "keywords": ["task", "to do", "todo"],
+        "context": ["add", "delete", "remove", "priority", "category", "upcoming", "deadline", "due"],
+    },
+    "web": {
+        "module": "web_browsing",
+        "entry": "web_browsing_voice_interaction",
+        "keywords": ["web", "search", "browse", "internet", "look up", "google"],
+        "context": ["online", "website"],
+    },
+    "notes": {
+        "module": "note_taking",
+        "entry": "note_voice_interaction",
+        "keywords": ["note", "jot down"],
+        "context": ["add", "retrieve", "all", "summarize", "delete", "edit", "search", "find", "tag"],
+    },
+    "documents": {
+        "module": "document_management",
+        "entry": "document_management_voice_interaction",
+        "keywords": ["document", "file", "folder", "directory", "drive", "pdf"],
+        "context": ["create", "make", "edit", "append", "update", "modify", "delete", "remove", "erase", "trash",
+                    "summarize", "classify", "categorize", "move", "transfer", "retrieve", "open", "read", "show",
+                    "display", "look", "list"],
+    },
+    "translation": {
+        "module": "realtime_translation",
+        "entry": "translation_voice_interaction",
+        "keywords": ["translation", "translate", "translator"],
+        "takes_command": False,
+    },
+    "email": {
+        "module": "email_management",
+        "entry": "email_voice_interaction",
+        "keywords": ["email", "mail", "inbox", "gmail"],
+        "context": ["send", "compose", "write", "reply", "fetch", "summarize"],
+    },
+    "weather_and_news": {
+        "module": "weather_and_news",
+        "entry": "weather_and_news_voice_interaction",
+        "keywords": ["weather", "news", "headline", "article", "forecast", "temperature"],
+    },
+    "recommendations": {
+        "module": "personalized_recommendations",
+        "entry": "recommendations_voice_interaction",
+        "keywords": ["recommendation", "recommend", "suggestion", "suggest", "advice"],
+        "context": ["news", "task", "personalized"],
+    },
+    "entertainment": {
+        "module": "entertainment_controls",
+        "entry": "entertainment_control_voice_interaction",
+        "keywords": ["entertainment", "music", "song", "video", "movie", "spotify", "youtube", "play", "pause",
+                     "resume", "skip", "next track", "previous", "shuffle", "repeat", "loop", "volume", "seek"],
+        "weak_keywords": ["stop", "next", "jump", "increase", "decrease"],
+        "context": ["track", "playlist"],
+    },
+    "meetings": {
+        "module": "meeting_summaries",
+        "entry": "meeting_summary_voice_interaction",
+        "keywords": ["meeting", "transcript", "transcribe", "recording"],
+        "weak_keywords": ["summary", "summaries"],
+        "context": ["list", "all", "retrieve", "get"],
+    },
+    "custom_commands": {
+        "module": "custom_commands",
+        "entry": "check_and_execute_command",
+        "keywords": ["custom", "command", "execute", "launch", "perform"],
+        "weak_keywords": ["run", "open", "start"],
+    },
+    # Not voice-routed, only used by the inactivity check in the main loop
+    "notifications": {
+        "module": "advanced_notfilications",
+        "entry": "check_and_notify_tasks",
+        "keywords": [],
+        "takes_command": False,
+    },
+}
+
+# Loaded entry functions by feature name
+_loaded = {}
+
+# (label, started at seconds since process start, duration in seconds) for everything loaded so far
+load_log = []
+
+
+def timed_load(label, loader):
+    """
+    Runs a loader callable and records when it started and how long it took in the load report.
+
+    Parameters:
+        label (str): Name shown in the load report.
+        loader (callable): Function performing the actual loading.
+
+    Returns:
+        The return value of the loader.
+    """
+    started = time.perf_counter()
+    result = loader()
+    load_log.append((label, started - PROCESS_START, time.perf_counter() - started))
+    return result
+
+
+def import_module(module_name):
+    """
+    Imports a module by name, recording the import in the load report.
+
+    Parameters:
+        module_name (str): The module to import.
+
+    Returns:
+        module: The imported module.
+    """
+    return timed_load(module_name, lambda: importlib.import_module(module_name))
+
+
+def load_feature(name):
+    """
+    Imports a feature module on first use and returns its entry function.
+
+    Parameters:
+        name (str): The feature name as declared in FEATURE_MODULES.
+
+    Returns:
+        callable: The feature's entry function.
+    """
+    if name not in _loaded:
+        spec = FEATURE_MODULES[name]
+        module = import_module(spec["module"])
+        _loaded[name] = getattr(module, spec["entry"])
+    return _loaded[name]
+
+
+def run_feature(name, command=None):
+    """
+    Loads a feature if needed and calls its entry function.
+
+    Parameters:
+        name (str): The feature name as declared in FEATURE_MODULES.
+        command (str): The voice command, passed on to features that take one.
+
+    Returns:
+        The entry function's return value.
+    """
+    entry = load_feature(name)
+    if FEATURE_MODULES[name].get("takes_command", True):
+        return entry(command)
+    return entry()
+
+
+def print_load_report():
+    """
+    Prints what has been loaded so far, when each load started and how long it took.
+    """
+    print("\nLoad report:")
+    for label, started, duration in load_log:
+        print(f"  {label:<30} at {started * 1000:8.1f} ms  took {duration * 1000:8.1f} ms")
+    not_loaded = [name for name in FEATURE_MODULES if name not in _loaded]
+    if not_loaded:
+        print(f"  Not loaded: {', '.join(not_loaded)}")
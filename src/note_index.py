@@ -0,0 +1,357 @@
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from config import NOTE_INDEX_PATH
+
+# BM25 weight of each indexed column: a match in the title or tags says more than one in the content
+TITLE_WEIGHT = 5.0
+CONTENT_WEIGHT = 1.0
+TAGS_WEIGHT = 3.0
+
+# Quoted phrases and single words in a search query
+QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+TOKEN = re.compile(r"\w+")
+
+
+def build_match_query(text, prefix=False, any_term=False):
+    """
+    Turns a spoken or typed search into an FTS5 MATCH expression.
+
+    "quoted words" are matched as a phrase and a trailing * makes a word a prefix. Every token is quoted,
+    so words like "and" or "near" are searched for instead of being read as operators.
+
+    Parameters:
+        text (str): The search.
+        prefix (bool): Treat the last word as a prefix, e.g. for a search typed as it is being entered.
+        any_term (bool): Match notes with any of the terms instead of all of them.
+
+    Returns:
+        str: The MATCH expression, empty if the search has no words.
+    """
+    parts = []
+    for phrase, word in QUERY_TERM.findall(text):
+        if phrase:
+            tokens = TOKEN.findall(phrase.lower())
+            if tokens:
+                parts.append('"' + " ".join(tokens) + '"')
+            continue
+        tokens = TOKEN.findall(word.lower())
+        for position, token in enumerate(tokens):
+            is_prefix = word.endswith("*") and position == len(tokens) - 1
+            parts.append(f'"{token}"' + ("*" if is_prefix else ""))
+    if prefix and parts and not parts[-1].endswith("*") and " " not in parts[-1]:
+        parts[-1] += "*"
+    return (" OR " if any_term else " ").join(parts)
+
+
+def _normalize_timestamp(value):
+    """
+    Returns a timestamp as naive local time in a fixed format, as the SQLite storage keeps them, so string order
+    is chronological order: notes from Firestore are timezone-aware, those from add_note() naive local time.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return value
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _row_values(note):
+    # Tags may contain spaces, so they are separated by line breaks, which the tokenizer also splits on
+    return (str(note["note_id"]), note.get("title", ""), note.get("content", ""), "\n".join(note.get("tags") or []),
+            _normalize_timestamp(note.get("timestamp")))
+
+
+class NoteIndex:
+    """
+    Persistent full-text index of the notes, in a local SQLite file with FTS5.
+
+    Each note is kept in a notes table (so search results need no Firestore round-trip) and indexed by an
+    external-content FTS5 table over title, content and tags, with Porter stemming. Results are ranked
+    by BM25. The index is kept up to date by add_note(), edit_note() and delete_note(), and can be rebuilt
+    from the notes collection in bulk.
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS notes (rowid INTEGER PRIMARY KEY, note_id TEXT UNIQUE NOT NULL, "
+                "title TEXT, content TEXT, tags TEXT, timestamp TEXT)")
+            self.connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(title, content, tags, content='notes', "
+                "content_rowid='rowid', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS index_info (key TEXT PRIMARY KEY, value TEXT)")
+            # Timestamps indexed before they were normalized are not in the fixed 26 character format
+            self.connection.create_function("normalize_timestamp", 1, _normalize_timestamp, deterministic=True)
+            self.connection.execute("UPDATE notes SET timestamp = normalize_timestamp(timestamp) "
+                                    "WHERE length(timestamp) != 26")
+
+    def is_built(self):
+        """
+        Tells whether the index has been filled from the notes collection at least once.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM index_info WHERE key = 'built_at'").fetchone() is not None
+
+    def _delete_row(self, note_id):
+        row = self.connection.execute("SELECT rowid, title, content, tags FROM notes WHERE note_id = ?",
+                                      (note_id,)).fetchone()
+        if row:
+            # External-content tables need the old values to remove their terms
+            self.connection.execute("INSERT INTO notes_fts(notes_fts, rowid, title, content, tags) "
+                                    "VALUES ('delete', ?, ?, ?, ?)", row)
+            self.connection.execute("DELETE FROM notes WHERE rowid = ?", (row[0],))
+
+    def _insert_row(self, note):
+        cursor = self.connection.execute(
+            "INSERT INTO notes (note_id, title, content, tags, timestamp) VALUES (?, ?, ?, ?, ?)", _row_values(note))
+        self.connection.execute("INSERT INTO notes_fts(rowid, title, content, tags) "
+                                "SELECT rowid, title, content, tags FROM notes WHERE rowid = ?", (cursor.lastrowid,))
+
+    def index_note(self, note):
+        """
+        Adds a note, or replaces it if it is already indexed.
+
+        Parameters:
+            note (dict): The note as stored, with note_id, title, content, tags and timestamp.
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_row(str(note["note_id"]))
+                self._insert_row(note)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def update_note(self, note_id, changes):
+        """
+        Applies a partial update, as passed to edit_note().
+
+        Returns:
+            bool: False if the note is not indexed, so the caller can index the whole note instead.
+        """
+        note = self.get_note(note_id)
+        if note is None:
+            return False
+        note.update(changes)
+        self.index_note(note)
+        return True
+
+    def remove_note(self, note_id):
+        """
+        Removes a note from the index.
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_row(str(note_id))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def rebuild(self, notes):
+        """
+        Replaces the whole index with the given notes in one transaction.
+
+        Parameters:
+            notes (iterable of dict): Every note, e.g. streamed from the notes collection.
+
+        Returns:
+            int: The number of notes indexed.
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute("INSERT INTO notes_fts(notes_fts) VALUES ('delete-all')")
+                self.connection.execute("DELETE FROM notes")
+                count = 0
+                for note in notes:
+                    self.connection.execute("INSERT OR REPLACE INTO notes (note_id, title, content, tags, timestamp) "
+                                            "VALUES (?, ?, ?, ?, ?)", _row_values(note))
+                    count += 1
+                # Indexing the content table in one pass is much faster than row by row
+                self.connection.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+                self.connection.execute("INSERT INTO notes_fts(notes_fts) VALUES ('optimize')")
+                self.connection.execute("INSERT OR REPLACE INTO index_info (key, value) VALUES ('built_at', ?)",
+                                        (datetime.now().isoformat(),))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return count
+
+    @staticmethod
+    def _to_note(row):
+        note_id, title, content, tags, timestamp = row[:5]
+        return {
+            "note_id": note_id,
+            "title": title,
+            "content": content,
+            "tags": tags.split("\n") if tags else [],
+            "timestamp": datetime.fromisoformat(timestamp) if timestamp else None,
+        }
+
+    def get_note(self, note_id):
+        """
+        Returns an indexed note, or None.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT note_id, title, content, tags, timestamp FROM notes "
+                                          "WHERE note_id = ?", (str(note_id),)).fetchone()
+        return self._to_note(row) if row else None
+
+    def search(self, text, limit=20, prefix=False, tag=None, date_range=None):
+        """
+        Finds the notes best matching a search, best first.
+
+        Notes containing every term are returned if there are any; otherwise notes containing some of
+        the terms, still ranked by BM25. The tag and date filters are applied in the same query, before
+        the limit.
+
+        Parameters:
+            text (str): Words, "quoted phrases" and prefix* words.
+            limit (int): Most notes returned, or None for every match.
+            prefix (bool): Treat the last word as a prefix.
+            tag (str): Only notes with exactly this tag.
+            date_range (tuple of datetime): Only notes with a timestamp between these two, inclusive.
+
+        Returns:
+            list of dict: The notes, with their relevance under "score" (higher is better).
+        """
+        conditions, parameters = "", []
+        if tag:
+            # Tags are stored one per line, so a whole tag is found between two line breaks
+            conditions += " AND instr(char(10) || notes.tags || char(10), char(10) || ? || char(10)) > 0"
+            parameters.append(tag)
+        if date_range:
+            conditions += " AND notes.timestamp BETWEEN ? AND ?"
+            parameters += [_normalize_timestamp(bound) for bound in date_range]
+        for any_term in (False, True):
+            match = build_match_query(text, prefix=prefix, any_term=any_term)
+            if not match:
+                return []
+            with self.lock:
+                rows = self.connection.execute(
+                    "SELECT notes.note_id, notes.title, notes.content, notes.tags, notes.timestamp, "
+                    f"bm25(notes_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT}, {TAGS_WEIGHT}) AS rank "
+                    "FROM notes_fts JOIN notes ON notes.rowid = notes_fts.rowid "
+                    f"WHERE notes_fts MATCH ?{conditions} ORDER BY rank LIMIT ?",
+                    (match, *parameters, -1 if limit is None else limit)).fetchall()
+            if rows:
+                return [dict(self._to_note(row), score=-row[5]) for row in rows]
+        return []
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the note index at NOTE_INDEX_PATH, opened on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NoteIndex(NOTE_INDEX_PATH)
+        return _index
+
+
+def rebuild_from_store(db):
+    """
+    Rebuilds the note index from every note in the notes collection.
+
+    Parameters:
+        db: The document store from storage.get_db().
+
+    Returns:
+        int: The number of notes indexed.
+    """
+    return get_index().rebuild(dict(note.to_dict(), note_id=note.to_dict().get("note_id", note.id))
+                               for note in db.collection("notes").stream())
+
+
+SYLLABLES = ("ka", "lo", "mi", "ne", "ru", "ta", "vo", "zen", "pra", "sho", "bel", "dor", "fin", "gas", "hul")
+
+
+def _synthetic_vocabulary(generator, size):
+    # Word frequencies in notes roughly follow Zipf's law, which is what makes the postings lists short
+    words = sorted({"".join(generator.choices(SYLLABLES, k=generator.randint(2, 4))) for _ in range(size * 2)})
+    words = words[:size]
+    generator.shuffle(words)
+    return words, [1 / rank for rank in range(1, len(words) + 1)]
+
+
+def benchmark(note_count=30000, queries=200):
+    """
+    Times a bulk rebuild and ranked searches on synthetic notes, against the previous linear scan with
+    a substring test.
+    """
+    generator = random.Random(42)
+    words, weights = _synthetic_vocabulary(generator, 5000)
+    start = datetime(2024, 1, 1)
+    notes = [{
+        "note_id": str(index),
+        "title": " ".join(generator.choices(words, weights, k=3)),
+        "content": " ".join(generator.choices(words, weights, k=60)),
+        "tags": generator.choices(words[:50], k=2),
+        "timestamp": start + timedelta(minutes=index),
+    } for index in range(note_count)]
+    # Searches use words from the middle of the frequency range, like names and topics rather than stop words
+    searches = [" ".join(generator.sample(words[20:500], 2)) for _ in range(queries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = NoteIndex(str(Path(directory) / "notes.db"))
+        started = time.perf_counter()
+        index.rebuild(notes)
+        print(f"rebuild: {note_count} notes in {time.perf_counter() - started:.2f} s")
+
+        started = time.perf_counter()
+        for note in notes[:500]:
+            index.index_note(dict(note, content=note["content"] + " updated"))
+        print(f"incremental update: {(time.perf_counter() - started) / 500 * 1000:.2f} ms per note")
+
+        for name, query, options in (("terms", searches, {}),
+                                     ("phrase", ['"' + search + '"' for search in searches], {}),
+                                     ("prefix", [search[:-2] for search in searches], {"prefix": True})):
+            started = time.perf_counter()
+            for search in query:
+                index.search(search, **options)
+            print(f"{name} search: {(time.perf_counter() - started) / len(query) * 1000:.2f} ms per query, "
+                  f"top 20 ranked")
+
+        started = time.perf_counter()
+        for search in searches[:20]:
+            [note for note in notes if search.lower() in note["content"].lower()]
+        print(f"linear substring scan: {(time.perf_counter() - started) / 20 * 1000:.2f} ms per query, "
+              f"unranked, in memory (before the network transfer of every note)")
+        index.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,35 +1,69 @@
 from datetime import datetime
 
-import google.generativeai as genai
-import pyttsx3
-import speech_recognition as sr
-from firebase_admin import firestore
+from audio_io import listen, speak
+from collection_cache import get_cache
+from config import NOTE_ID_MODE
+from gemini_client import get_model
+from id_service import next_id, normalize_id
+from listing import browse
+from note_index import get_index, rebuild_from_store
+from storage import get_db
+
+# Initialize the document store
+db = get_db()
 
-from config import GEMINI_API_KEY
+# Initialize Gemini model
+model = get_model()
 
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
 
-# Initialize Firestore
-db = firestore.client()
+def get_next_note_id():
+    """
+    Get a new note ID: the next number from the note counter document in Firestore, incremented
+    atomically, or a time-ordered ID made locally when NOTE_ID_MODE is "sortable". Note IDs are
+    spoken by the user, which is why numbers are the default; resolve_note_id() maps the spoken number
+    back to the zero-padded ID.
+    """
+    return next_id(db, "note", NOTE_ID_MODE)
 
-# Initialize Gemini model
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
 
+def resolve_note_id(text):
+    """
+    Returns the ID of the note a user named, e.g. "N0000000012" for "12", or "12" itself for a note made
+    before counter IDs were zero-padded.
+    """
+    note_id = normalize_id(text)
+    if note_id != text.strip() and get_cache("notes").get_document(note_id) is None:
+        return text.strip()
+    return note_id
 
-def get_next_note_id():
+
+def _update_index(update, *args):
+    """
+    Applies a change to the local note index. The note itself is already saved, so a failure is only reported.
+    """
+    try:
+        update(*args)
+    except Exception as e:
+        print(f"Error updating the note index: {e}")
+
+
+def search_notes(text, limit=20, tag=None, date_range=None):
     """
-    Retrieve and increment the note ID from a dedicated counter document in Firestore.
+    Searches note titles, content and tags in the local full-text index, building it on first use.
+
+    Parameters:
+        text (str): Words, "quoted phrases" or prefix* words.
+        limit (int): Most notes returned, or None for every match.
+        tag (str): Only notes with this tag.
+        date_range (tuple of datetime): Only notes from between these dates.
+
+    Returns:
+        list: The best matching notes, best first.
     """
-    counter_ref = db.collection("metadata").document("note_counter")
-    counter_doc = counter_ref.get()
-    current_id = counter_doc.to_dict().get("count", 0) if counter_doc.exists else 0
-    next_id = current_id + 1
-    counter_ref.set({"count": next_id})  # Update the counter in Firestore
-    return next_id  # Use plain numeric ID
+    index = get_index()
+    if not index.is_built():
+        print(f"Indexed {rebuild_from_store(db)} notes.")
+    return index.search(text, limit=limit, tag=tag, date_range=date_range)
 
 
 def add_note(title, content, tags=None):
@@ -42,7 +76,7 @@ def add_note(title, content, tags=None):
         tags (list of str): Optional tags for the note.
     """
     note_id = get_next_note_id()
-    note_ref = db.collection("notes").document(str(note_id))
+    note_ref = db.collection("notes").document(note_id)
     note_data = {
         "note_id": note_ref.id,
         "title": title,
@@ -51,6 +85,8 @@ def add_note(title, content, tags=None):
         "tags": tags if tags else []
     }
     note_ref.set(note_data)
+    get_cache("notes").invalidate(note_id)
+    _update_index(get_index().index_note, note_data)
     print("Note added successfully!")
 
 
@@ -59,48 +95,47 @@ def retrieve_notes(note_id=None, keyword=None, tag=None, date_range=None):
     Retrieves notes based on a keyword, tag, or date range.
 
     Parameters:
-        keyword (str): Keyword to search within note content.
+        keyword (str): Words to search for in note titles, content and tags; the results are then ranked
+            by relevance.
         tag (str): Tag to filter notes.
         date_range (tuple of datetime): Start and end date for filtering notes.
 
     Returns:
         list: List of notes matching the criteria.
     """
-    query = db.collection("notes")
+    notes_cache = get_cache("notes")
 
     if note_id:
-        query = query.where("note_id", "==", note_id)
-        return [note.to_dict() for note in query.stream()]
+        return notes_cache.query([("note_id", "==", note_id)])
+
+    if keyword:
+        # Every match, like the scan this replaced, with the filters applied in the index query itself
+        return search_notes(keyword, limit=None, tag=tag, date_range=date_range)
 
+    filters = []
     if tag:
-        query = query.where("tags", "array_contains", tag)
+        filters.append(("tags", "array_contains", tag))
     if date_range:
         start_date, end_date = date_range
-        query = query.where("timestamp", ">=", start_date).where("timestamp", "<=", end_date)
+        filters += [("timestamp", ">=", start_date), ("timestamp", "<=", end_date)]
+    return notes_cache.query(filters)
 
-    notes = [note.to_dict() for note in query.stream()]
 
-    if keyword:
-        notes = [note for note in notes if keyword.lower() in note["content"].lower()]
-
-    return notes
+def note_pager():
+    """
+    Lists notes by ID a page at a time, fetching only their titles; the first page comes from the cache.
+    """
+    return get_cache("notes").pager([], ["title"])
 
 
 def retrieve_all_notes():
     """
-    Retrieves and displays all notes by their IDs and titles.
+    Retrieves all notes by their IDs and titles, without their content.
 
     Returns:
         list: A list of dictionaries containing note IDs and titles.
     """
-    notes = db.collection("notes").stream()
-    all_notes = [{"note_id": note.id, "title": note.to_dict().get("title", "Untitled")} for note in notes]
-
-    print("\nAll Notes:")
-    # for note in all_notes:
-    #     print(f"Note ID: {note['note_id']}, Title: {note['title']}")
-
-    return all_notes
+    return [{"note_id": note["id"], "title": note.get("title", "Untitled")} for note in note_pager().all()]
 
 
 def summarize_note(note_content):
@@ -113,7 +148,7 @@ def summarize_note(note_content):
     Returns:
         str: Summary of the note.
     """
-    response = model.generate_content("Summarize the following text: " + note_content)
+    response = model.generate_content("Summarize the following text: " + note_content, call_site="summarize_note")
     return response.text
 
 
@@ -125,6 +160,8 @@ def delete_note(note_id):
         note_id (str): ID of the note to delete.
     """
     db.collection("notes").document(note_id).delete()
+    get_cache("notes").invalidate(note_id)
+    _update_index(get_index().remove_note, note_id)
     print("Note deleted successfully!")
 
 
@@ -148,30 +185,17 @@ def edit_note(note_id, new_title=None, new_content=None, new_tags=None):
         update_data["tags"] = new_tags
 
     note_ref.update(update_data)
+    get_cache("notes").invalidate(note_id)
+    _update_index(_reindex_note, note_id, update_data)
     print("Note updated successfully!")
 
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
+def _reindex_note(note_id, update_data):
+    # Notes missing from the index (e.g. added by another client) are indexed in full
+    if not get_index().update_note(note_id, update_data):
+        note = get_cache("notes").get_document(note_id)
+        if note is not None:
+            get_index().index_note(dict(note, note_id=note.get("note_id", note_id)))
 
 
 def note_voice_interaction(choice):
@@ -191,7 +215,7 @@ def note_voice_interaction(choice):
 
     elif "retrieve" in choice and "all" not in choice:
         speak("Please say the note ID to retrieve or leave blank.")
-        note_id = listen() or None
+        note_id = resolve_note_id(listen()) or None
         speak("Please say a keyword or leave blank.")
         keyword = listen() or None
         speak("Please say a tag to filter by, or leave blank.")
@@ -202,17 +226,15 @@ def note_voice_interaction(choice):
             print(f"Note ID: {note['note_id']}, Title: {note['title']}, Content: {note['content']}")
 
     elif "retrieve all" in choice:
-        notes = retrieve_all_notes()
-        speak("All notes retrieved. Check the console for details.")
-        for note in notes:
-            print(f"Note ID: {note['note_id']}, Title: {note['title']}")
+        print("\nAll Notes:")
+        browse(note_pager(), lambda note: f"Note ID: {note['id']}, Title: {note.get('title', 'Untitled')}", "notes")
 
     elif "summarize" in choice:
         speak("Please say the note ID to summarize.")
-        note_id = listen()
-        note = db.collection("notes").document(note_id).get()
-        if note.exists:
-            summary = summarize_note(note.to_dict()["content"])
+        note_id = resolve_note_id(listen())
+        note = get_cache("notes").get_document(note_id)
+        if note is not None:
+            summary = summarize_note(note["content"])
             speak("Note summarized. Check the console for details.")
             print(f"Summary: {summary}")
         else:
@@ -220,13 +242,13 @@ def note_voice_interaction(choice):
 
     elif "delete" in choice:
         speak("Please say the note ID to delete.")
-        note_id = listen()
+        note_id = resolve_note_id(listen())
         delete_note(note_id)
         speak("Note deleted successfully.")
 
     elif "edit" in choice:
         speak("Please say the note ID to edit.")
-        note_id = listen()
+        note_id = resolve_note_id(listen())
         speak("Please say the new title or say 'skip' to leave unchanged.")
         new_title = listen()
         if "skip" in new_title.lower():
@@ -244,5 +266,18 @@ def note_voice_interaction(choice):
         edit_note(note_id, new_title, new_content, new_tags)
         speak("Note edited successfully.")
 
+    elif "search" in choice or "find" in choice:
+        speak("What would you like to search your notes for?")
+        notes = search_notes(listen())
+        speak(f"Found {len(notes)} notes, best matches first. Check the console for details." if notes
+              else "No matching notes.")
+        for note in notes:
+            print(f"Note ID: {note['note_id']}, Title: {note['title']}, Relevance: {note['score']:.2f}")
+
+    elif "rebuild" in choice:
+        speak("Rebuilding the note search index.")
+        count = rebuild_from_store(db)
+        speak(f"Indexed {count} notes.")
+
     else:
         speak("Option not recognized, please try again.")
@@ -1,71 +1,37 @@
 import random
+import time
 from datetime import datetime, timedelta
 
-import google.generativeai as genai
-import pyttsx3
-import speech_recognition as sr
-from firebase_admin import firestore
-
-from config import GEMINI_API_KEY
+from audio_io import speak
+from collection_cache import get_cache
+from gemini_client import get_model
+from storage import get_db
+from streaming_speech import speak_streamed_response
 from weather_and_news import get_news
 
-# Initialize Firestore
-db = firestore.client()
+# Initialize the document store
+db = get_db()
 
 # Initialize Gemini model
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+model = get_model()
 
 # Example categories for recommendations
 INTEREST_CATEGORIES = ["technology", "health", "entertainment", "business", "sports"]
 
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)
-
-
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
-
 
 # Store user preferences
 def update_preferences(user_id, preference_type, preference):
     doc_ref = db.collection("user_preferences").document(user_id)
-    doc = doc_ref.get()
-    if doc.exists:
+    if get_cache("user_preferences").get_document(user_id) is not None:
         doc_ref.update({preference_type: preference})
     else:
         doc_ref.set({preference_type: preference})
+    get_cache("user_preferences").invalidate(user_id)
 
 
-# Fetch user preferences
+# Fetch user preferences, from the local cache when possible
 def fetch_preferences(user_id):
-    doc_ref = db.collection("user_preferences").document(user_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        return doc.to_dict()
-    else:
-        return {}
+    return get_cache("user_preferences").get_document(user_id) or {}
 
 
 # Recommend news based on preferences
@@ -77,8 +43,7 @@ def recommend_news(user_id):
 
 # Recommend tasks based on user's activity
 def recommend_tasks(user_id):
-    doc_ref = db.collection("tasks").where("user_id", "==", user_id).stream()
-    tasks = [doc.to_dict() for doc in doc_ref]
+    tasks = get_cache("tasks").query([("user_id", "==", user_id)])
 
     # Filter high-priority or urgent tasks
     recommended_tasks = [
@@ -90,19 +55,29 @@ def recommend_tasks(user_id):
     return recommended_tasks if recommended_tasks else ["No urgent tasks!"]
 
 
-# Recommend general activities (e.g., personalized greetings)
-def general_recommendations(user_id):
+# Recommend general activities (e.g., personalized greetings), optionally speaking them as they stream in
+def general_recommendations(user_id, speak_recommendation=False):
     preferences = fetch_preferences(user_id)
     if not preferences:
-        return "Welcome! Set some preferences to get personalized recommendations."
+        gemini_recommendation = "Welcome! Set some preferences to get personalized recommendations."
+        if speak_recommendation:
+            speak(gemini_recommendation)
+        return gemini_recommendation
 
     # Use Gemini to suggest personalized recommendations
+    prompt = (f"User preferences are: {preferences}. "
+              f"Suggest some activities or recommendations, don't ask any questions.")
     try:
-        response = model.generate_content(
-            f"User preferences are: {preferences}. Suggest some activities or recommendations, don't ask any questions.")
+        if speak_recommendation:
+            started = time.perf_counter()
+            response = model.generate_content(prompt, stream=True, call_site="general_recommendations")
+            return speak_streamed_response(response, "general_recommendations", started)
+        response = model.generate_content(prompt, call_site="general_recommendations")
         gemini_recommendation = response.text
     except Exception as e:
         gemini_recommendation = f"Could not generate recommendation due to an error: {e}"
+    if speak_recommendation:
+        speak(gemini_recommendation)
 
     return gemini_recommendation
 
@@ -125,8 +100,7 @@ def recommendations_voice_interaction(command):
 
 
     elif "recommendations" in command.lower() or "personalized" in command.lower() or "recommendation" in command.lower():
-        recommendation = general_recommendations(user_id)
-        speak(recommendation)
+        general_recommendations(user_id, speak_recommendation=True)
 
     else:
         return "Sorry, I didn't quite catch that. Please specify if you want news, tasks, or general recommendations."
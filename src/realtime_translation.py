@@ -1,11 +1,6 @@
-import pyttsx3
-import speech_recognition as sr
 from googletrans import Translator
 
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
+from audio_io import listen, speak
 
 # Initialize the translator
 translator = Translator()
@@ -38,29 +33,6 @@ def translate_text(text, target_language="en"):
         return None
 
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
-
-
 def translation_voice_interaction():
     """
     Main function to interact with the Real-Time Translation system.
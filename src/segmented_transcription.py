@@ -0,0 +1,193 @@
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from config import SEGMENT_MAX_SECONDS, VAD_MIN_SILENCE
+from transcription_service import TranscriptionService, get_transcription_service
+
+# Whisper's input format
+SAMPLE_RATE = 16000
+# Length of the frames speech is detected in, in seconds
+FRAME_SECONDS = 0.03
+# A frame is speech when it is this many dB above the noise floor, estimated as a low percentile of all frames
+SPEECH_MARGIN_DB = 12.0
+NOISE_PERCENTILE = 10
+# Frames below this energy, in dB, are silence whatever the noise floor
+SILENCE_DB = -60.0
+# Shortest stretch of sound kept as speech, and silence kept around each stretch, in seconds
+MIN_SPEECH = 0.2
+PADDING = 0.2
+# Pauses up to this long, in seconds, stay inside a segment; longer ones are skipped
+MERGE_GAP = 1.5
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """
+    Decodes an audio file once, with ffmpeg, to mono float32 samples at 16 kHz, the format Whisper works on.
+
+    Returns:
+        numpy.ndarray: The samples, between -1 and 1.
+    """
+    command = ["ffmpeg", "-nostdin", "-threads", "0", "-i", str(path), "-f", "s16le", "-ac", "1",
+               "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg is needed to decode audio files") from None
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode '{path}': {e.stderr.decode(errors='replace')[-500:]}") from None
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+
+def frame_energies(audio, sample_rate=SAMPLE_RATE):
+    """
+    Returns the energy of each frame of the audio, in dB.
+    """
+    frame = int(sample_rate * FRAME_SECONDS)
+    count = len(audio) // frame
+    frames = audio[:count * frame].reshape(count, frame)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+def _runs(mask):
+    """
+    Returns the (start, end) frame ranges where a boolean mask is True.
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return [(int(start), int(end)) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def detect_speech(energies, min_silence=VAD_MIN_SILENCE):
+    """
+    Energy-based voice activity detection.
+
+    Frames well above the recording's own noise floor count as speech; pauses shorter than min_silence are
+    bridged, so sentences stay whole, and blips shorter than MIN_SPEECH are dropped.
+
+    Parameters:
+        energies (numpy.ndarray): Frame energies from frame_energies().
+        min_silence (float): Shortest pause, in seconds, that separates two stretches of speech.
+
+    Returns:
+        list of tuple: (start, end) frame ranges of speech.
+    """
+    if not len(energies):
+        return []
+    noise_floor = np.percentile(energies, NOISE_PERCENTILE)
+    speech = energies > max(noise_floor + SPEECH_MARGIN_DB, SILENCE_DB)
+    regions = []
+    for start, end in _runs(speech):
+        if regions and (start - regions[-1][1]) * FRAME_SECONDS < min_silence:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return [(start, end) for start, end in regions if (end - start) * FRAME_SECONDS >= MIN_SPEECH]
+
+
+def plan_segments(regions, energies, max_seconds=SEGMENT_MAX_SECONDS):
+    """
+    Groups stretches of speech into segments of at most max_seconds for transcription.
+
+    Neighbouring stretches are joined while they fit, so each segment gives Whisper enough context; a stretch
+    longer than max_seconds is cut at its quietest frame in the second half of the allowed length. Silence
+    between segments is never transcribed.
+
+    Returns:
+        list of tuple: (start, end) frame ranges.
+    """
+    max_frames = int(max_seconds / FRAME_SECONDS)
+    padding = int(PADDING / FRAME_SECONDS)
+    merge_gap = int(MERGE_GAP / FRAME_SECONDS)
+    segments = []
+    for start, end in regions:
+        start, end = max(0, start - padding), min(len(energies), end + padding)
+        if segments:
+            start = max(start, segments[-1][1])
+            if end - segments[-1][0] <= max_frames and start - segments[-1][1] <= merge_gap:
+                segments[-1] = (segments[-1][0], end)
+                continue
+        while end - start > max_frames:
+            window = energies[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(window))
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, end))
+    return segments
+
+
+def transcribe_long(path, service=None, **options):
+    """
+    Transcribes a long recording in parallel.
+
+    The audio is decoded once, split at silences, and the stretches of speech are transcribed concurrently by
+    the transcription service's worker processes; the results are stitched back in order, with timestamps
+    relative to the whole recording.
+
+    Parameters:
+        path (str): The audio file.
+        service (TranscriptionService): The workers to use, the shared service by default.
+        options: Passed on to Whisper's transcribe(), e.g. language="en".
+
+    Returns:
+        dict: {"text", "segments", "speech_seconds", "duration"}; segments are {"start", "end", "text"}.
+    """
+    service = get_transcription_service() if service is None else service
+    audio = decode_audio(path)
+    energies = frame_energies(audio)
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    regions = detect_speech(energies)
+    if not regions and len(energies) and energies.max() > SILENCE_DB:
+        # Sound throughout, e.g. speech over constant background noise, leaves no quiet stretch to measure the
+        # noise floor on: transcribe the whole recording, cut into segments of at most SEGMENT_MAX_SECONDS
+        print(f"No pauses found in '{path}', transcribing it whole.")
+        regions = [(0, len(energies))]
+    segments = plan_segments(regions, energies)
+    futures = [service.submit_audio(audio[start * frame:end * frame], **options) for start, end in segments]
+
+    texts, timed = [], []
+    for (start, _), future in zip(segments, futures):
+        result = future.result()
+        offset = start * FRAME_SECONDS
+        texts.append(result["text"].strip())
+        timed.extend({"start": offset + segment["start"], "end": offset + segment["end"], "text": segment["text"]}
+                     for segment in result["segments"])
+    return {"text": " ".join(text for text in texts if text), "segments": timed,
+            "speech_seconds": sum(end - start for start, end in segments) * FRAME_SECONDS,
+            "duration": len(audio) / SAMPLE_RATE}
+
+
+def benchmark(path, workers=4):
+    """
+    Times a recording transcribed in one Whisper call against the segmented transcription on a pool of
+    workers. Models are loaded before timing, so only transcription is compared.
+    """
+    single = TranscriptionService(workers=1)
+    pool = TranscriptionService(workers=workers)
+    try:
+        for future in single.warm_up() + pool.warm_up():
+            future.result()
+
+        started = time.perf_counter()
+        whole = single.transcribe(path)
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        segmented = transcribe_long(path, pool)
+        segmented_seconds = time.perf_counter() - started
+    finally:
+        single.shutdown()
+        pool.shutdown()
+
+    print(f"{segmented['duration']:.0f} s of audio, {segmented['speech_seconds']:.0f} s of it speech")
+    print(f"single call:              {single_seconds:7.1f} s, {len(whole['text'].split())} words")
+    print(f"segmented, {workers} workers:    {segmented_seconds:7.1f} s, {len(segmented['text'].split())} words")
+    print(f"speedup: {single_seconds / segmented_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python segmented_transcription.py <audio file> [workers]")
+    else:
+        benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 4)
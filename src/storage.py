@@ -0,0 +1,560 @@
+import atexit
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+
+from config import FIREBASE_CREDENTIALS_PATH, STORAGE_BACKEND, SQLITE_DB_PATH
+
+# Sort directions, the same values Firestore's Query.ASCENDING and Query.DESCENDING have
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+# Fields queried with where()/order_by(), indexed by the SQLite backend
+INDEXED_FIELDS = {
+    "tasks": ["priority", "category", "deadline", "user_id"],
+    "notes": ["note_id", "timestamp"],
+}
+
+# Change notifications delivered to on_snapshot() listeners of the SQLite backend
+ChangeType = Enum("ChangeType", ["ADDED", "MODIFIED", "REMOVED"])
+DocumentChange = namedtuple("DocumentChange", ["type", "document"])
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_db():
+    """
+    Returns the storage backend selected by STORAGE_BACKEND ("firestore" or "sqlite"), created on first use.
+
+    Both backends offer the subset of the Firestore client API the assistant uses: collection(), document(),
+    get/set/update/delete, where/order_by/limit queries with select() projections and start_after() cursors,
+    array_contains, subcollections, batch() and on_snapshot() listeners on collections, plus
+    increment_counter() for atomic counters.
+    """
+    global _db
+    with _db_lock:
+        if _db is None:
+            _db = SQLiteStorage(SQLITE_DB_PATH) if STORAGE_BACKEND == "sqlite" else FirestoreStorage()
+        return _db
+
+
+class NotFound(LookupError):
+    """
+    Raised when updating a document that does not exist, like Firestore does.
+    """
+
+
+class FirestoreStorage:
+    """
+    Firestore backend, hands out the Firestore client's own references.
+    """
+
+    def __init__(self):
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS_PATH))
+        self._firestore = firestore
+        self.client = firestore.client()
+
+    def collection(self, name):
+        return self.client.collection(name)
+
+    def batch(self):
+        return self.client.batch()
+
+    def increment_counter(self, collection, doc_id, field="count"):
+        """
+        Atomically increments a counter field in a transaction and returns its new value.
+        """
+        counter_ref = self.client.collection(collection).document(doc_id)
+
+        @self._firestore.transactional
+        def increment(transaction):
+            counter_doc = counter_ref.get(transaction=transaction)
+            value = (counter_doc.to_dict().get(field, 0) if counter_doc.exists else 0) + 1
+            transaction.set(counter_ref, {field: value}, merge=True)
+            return value
+
+        return increment(self.client.transaction())
+
+
+def _normalize_datetime(value):
+    # Stored as naive local time with a fixed format, so string order is chronological order
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _encode(data):
+    """
+    Converts a document to JSON, recording where datetimes were so they can be restored.
+
+    Returns:
+        tuple: (JSON text, JSON list of paths to datetime values)
+    """
+    datetime_paths = []
+
+    def convert(value, path):
+        if isinstance(value, datetime):
+            datetime_paths.append(path)
+            return _normalize_datetime(value)
+        if isinstance(value, dict):
+            return {key: convert(item, path + [key]) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [convert(item, path + [index]) for index, item in enumerate(value)]
+        return value
+
+    return json.dumps(convert(data, [])), json.dumps(datetime_paths)
+
+
+def _decode(data, datetime_paths):
+    data = json.loads(data)
+    for path in json.loads(datetime_paths):
+        container = data
+        for key in path[:-1]:
+            container = container[key]
+        container[path[-1]] = datetime.fromisoformat(container[path[-1]])
+    return data
+
+
+def _merge(current, data):
+    # As Firestore's set(merge=True): nested maps are merged field by field, anything else (an empty map
+    # included) replaces the current value
+    for key, value in data.items():
+        if isinstance(value, dict) and value and isinstance(current.get(key), dict):
+            _merge(current[key], value)
+        else:
+            current[key] = value
+    return current
+
+
+def _json_path(field):
+    return "$" + "".join(f'."{part}"' for part in field.split("."))
+
+
+def _query_value(value):
+    return _normalize_datetime(value) if isinstance(value, datetime) else value
+
+
+class SQLiteStorage:
+    """
+    Embedded backend storing every document as a JSON row in a single SQLite table.
+
+    Rows are keyed by (collection path, document ID), which also serves collection scans and ordering by
+    document ID; the fields in INDEXED_FIELDS get expression indexes for where()/order_by().
+    """
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.RLock()
+        # on_snapshot() callbacks by collection path, and changes held back until the running transaction commits
+        self._listeners = {}
+        self._pending_changes = None
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, datetimes TEXT NOT NULL, "
+                "PRIMARY KEY (collection, id)) WITHOUT ROWID")
+            for field in sorted({field for fields in INDEXED_FIELDS.values() for field in fields}):
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{field.replace('.', '_')} "
+                    f"ON documents(collection, json_extract(data, '{_json_path(field)}'))")
+            # Without statistics the planner prefers the primary key over the field indexes
+            if not self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+                self.connection.execute("ANALYZE")
+        atexit.register(self.close)
+
+    def close(self):
+        """
+        Refreshes the planner statistics if needed and closes the database.
+        """
+        with self.lock:
+            if self.connection is not None:
+                self.connection.execute("PRAGMA optimize")
+                self.connection.close()
+                self.connection = None
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def increment_counter(self, collection, doc_id, field="count"):
+        """
+        Atomically increments a counter field and returns its new value.
+        """
+        ref = self.collection(collection).document(doc_id)
+        with self.transaction():
+            snapshot = ref.get()
+            value = (snapshot.to_dict().get(field, 0) if snapshot.exists else 0) + 1
+            self._write(ref, {field: value}, merge=True)
+        return value
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the enclosed reads and writes in one SQLite transaction, rolled back if an exception escapes.
+        Listeners are notified of the changes once the transaction has committed.
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self._pending_changes = []
+            try:
+                yield
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                self._pending_changes = None
+                raise
+            changes, self._pending_changes = self._pending_changes, None
+        self._notify(changes)
+
+    def add_listener(self, path, callback):
+        with self.lock:
+            self._listeners.setdefault(path, []).append(callback)
+
+    def remove_listener(self, path, callback):
+        with self.lock:
+            callbacks = self._listeners.get(path, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def _record_change(self, ref, data, existed):
+        if ref.parent.path not in self._listeners:
+            return
+        if data is None:
+            change_type = ChangeType.REMOVED
+        else:
+            change_type = ChangeType.MODIFIED if existed else ChangeType.ADDED
+        change = DocumentChange(change_type, DocumentSnapshot(ref, data))
+        if self._pending_changes is not None:
+            self._pending_changes.append(change)
+        else:
+            self._notify([change])
+
+    def _notify(self, changes):
+        by_collection = {}
+        for change in changes:
+            by_collection.setdefault(change.document.reference.parent.path, []).append(change)
+        read_time = datetime.now()
+        for path, collection_changes in by_collection.items():
+            documents = [change.document for change in collection_changes if change.document.exists]
+            for callback in list(self._listeners.get(path, [])):
+                try:
+                    callback(documents, collection_changes, read_time)
+                except Exception as e:
+                    print(f"Error in snapshot listener for {path}: {e}")
+
+    def _read(self, ref):
+        with self.lock:
+            row = self.connection.execute("SELECT data, datetimes FROM documents WHERE collection = ? AND id = ?",
+                                          (ref.parent.path, ref.id)).fetchone()
+        return DocumentSnapshot(ref, _decode(*row) if row else None)
+
+    def _write(self, ref, data, merge=False):
+        with self.lock:
+            existed = None
+            if merge or ref.parent.path in self._listeners:
+                current = self._read(ref).to_dict()
+                existed = current is not None
+                if merge:
+                    data = _merge(current or {}, data)
+            self.connection.execute("INSERT OR REPLACE INTO documents (collection, id, data, datetimes) "
+                                    "VALUES (?, ?, ?, ?)", (ref.parent.path, ref.id, *_encode(data)))
+            self._record_change(ref, data, existed)
+
+    def _update(self, ref, changes):
+        with self.lock:
+            data = self._read(ref).to_dict()
+            if data is None:
+                raise NotFound(f"No document to update: {ref.path}")
+            for field, value in changes.items():
+                container = data
+                *parents, last = field.split(".")
+                for part in parents:
+                    container = container.setdefault(part, {})
+                container[last] = value
+            self._write(ref, data)
+
+    def _delete(self, ref):
+        with self.lock:
+            deleted = self.connection.execute("DELETE FROM documents WHERE collection = ? AND id = ?",
+                                              (ref.parent.path, ref.id)).rowcount
+            if deleted:
+                self._record_change(ref, None, True)
+
+    def _run_query(self, query):
+        sql = ["SELECT id, data, datetimes FROM documents WHERE collection = ?"]
+        params = [query.parent.path]
+        for field, op, value in query.filters:
+            if op == "array_contains":
+                sql.append(f"AND EXISTS (SELECT 1 FROM json_each(data, '{_json_path(field)}') WHERE value = ?)")
+                params.append(_query_value(value))
+            elif op == "in":
+                sql.append(f"AND json_extract(data, '{_json_path(field)}') IN ({', '.join('?' * len(value))})")
+                params.extend(_query_value(item) for item in value)
+            elif op in ("==", "!=", "<", "<=", ">", ">="):
+                column = "id" if field == "__name__" else f"json_extract(data, '{_json_path(field)}')"
+                sql.append(f"AND {column} {'=' if op == '==' else op} ?")
+                params.append(_query_value(value))
+            else:
+                raise ValueError(f"Unsupported query operator: {op}")
+
+        # (column, direction) pairs the results are sorted by; like Firestore, the document ID breaks ties in
+        # the direction of the last order_by()
+        ordering = []
+        for field, direction in query.orders:
+            if field == "__name__":
+                ordering.append(("id", direction))
+            else:
+                # Like Firestore, documents without the ordered field are left out
+                sql.append(f"AND json_type(data, '{_json_path(field)}') IS NOT NULL")
+                ordering.append((f"json_extract(data, '{_json_path(field)}')", direction))
+        if not any(field == "__name__" for field, _ in query.orders):
+            ordering.append(("id", query.orders[-1][1] if query.orders else ASCENDING))
+
+        if query.cursor is not None:
+            condition, cursor_params = self._cursor_condition(query, ordering)
+            sql.append(f"AND ({condition})")
+            params.extend(cursor_params)
+
+        sql.append("ORDER BY " + ", ".join(f"{column} {'DESC' if direction == DESCENDING else 'ASC'}"
+                                           for column, direction in ordering))
+        if query.limit_count is not None:
+            sql.append("LIMIT ?")
+            params.append(query.limit_count)
+
+        with self.lock:
+            rows = self.connection.execute(" ".join(sql), params).fetchall()
+        collection = CollectionReference(self, query.parent.path)
+        snapshots = []
+        for doc_id, data, datetimes in rows:
+            data = _decode(data, datetimes)
+            if query.projection is not None:
+                # Firestore leaves the other fields on the server; here it only keeps the results small
+                data = {field: data[field] for field in query.projection if field in data}
+            snapshots.append(DocumentSnapshot(collection.document(doc_id), data))
+        return snapshots
+
+    @staticmethod
+    def _cursor_condition(query, ordering):
+        """
+        Builds the WHERE condition selecting rows after a start_after() cursor, in the query's sort order.
+        """
+        cursor = query.cursor
+        if isinstance(cursor, DocumentSnapshot):
+            data = cursor.to_dict() or {}
+            values = [cursor.id if field == "__name__" else data.get(field) for field, _ in query.orders]
+            if len(ordering) > len(query.orders):
+                values.append(cursor.id)
+        else:
+            # A dict cursor holds values for the order_by() fields only
+            values = [cursor.get(field) for field, _ in query.orders]
+        ordering = ordering[:len(values)]
+
+        # (a, b) after (x, y) is: a beyond x, or a equal to x and b beyond y
+        clauses, params = [], []
+        for position, (column, direction) in enumerate(ordering):
+            parts = [f"{previous} = ?" for previous, _ in ordering[:position]]
+            parts.append(f"{column} {'<' if direction == DESCENDING else '>'} ?")
+            clauses.append("(" + " AND ".join(parts) + ")")
+            params.extend(_query_value(value) for value in values[:position + 1])
+        return " OR ".join(clauses), params
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+
+class DocumentReference:
+    def __init__(self, storage, parent, doc_id):
+        self._storage = storage
+        self.parent = parent
+        self.id = doc_id
+        self.path = f"{parent.path}/{doc_id}"
+
+    def get(self, transaction=None):
+        return self._storage._read(self)
+
+    def set(self, data, merge=False):
+        self._storage._write(self, data, merge)
+
+    def update(self, changes):
+        self._storage._update(self, changes)
+
+    def delete(self):
+        self._storage._delete(self)
+
+    def collection(self, name):
+        return CollectionReference(self._storage, f"{self.path}/{name}")
+
+
+class Query:
+    def __init__(self, storage, parent, filters=(), orders=(), limit_count=None, projection=None, cursor=None):
+        self._storage = storage
+        self.parent = parent
+        self.filters = list(filters)
+        self.orders = list(orders)
+        self.limit_count = limit_count
+        self.projection = projection
+        self.cursor = cursor
+
+    def _copy(self, **changes):
+        values = {"filters": self.filters, "orders": self.orders, "limit_count": self.limit_count,
+                  "projection": self.projection, "cursor": self.cursor}
+        values.update(changes)
+        return Query(self._storage, self.parent, **values)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self.filters + [(field, op, value)])
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy(orders=self.orders + [(field, direction)])
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def select(self, field_paths):
+        return self._copy(projection=list(field_paths))
+
+    def start_after(self, cursor):
+        """
+        Starts the results after a document snapshot, or after a dict of values for the order_by() fields.
+        """
+        return self._copy(cursor=cursor)
+
+    def stream(self):
+        return iter(self._storage._run_query(self))
+
+    def get(self):
+        return self._storage._run_query(self)
+
+
+class CollectionReference(Query):
+    def __init__(self, storage, path):
+        super().__init__(storage, self)
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id=None):
+        return DocumentReference(self._storage, self, doc_id if doc_id is not None else uuid.uuid4().hex[:20])
+
+    def on_snapshot(self, callback):
+        """
+        Calls callback(documents, changes, read_time) after each committed change to this collection, like
+        Firestore's listeners. Unlike Firestore, there is no initial snapshot of the whole collection and
+        documents only holds the changed documents.
+
+        Returns:
+            Watch: Call unsubscribe() on it to stop listening.
+        """
+        self._storage.add_listener(self.path, callback)
+        return Watch(self._storage, self.path, callback)
+
+
+class Watch:
+    def __init__(self, storage, path, callback):
+        self._storage = storage
+        self._path = path
+        self._callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self._storage.remove_listener(self._path, self._callback)
+        self.is_active = False
+
+
+class WriteBatch:
+    """
+    Collects writes and applies them in one SQLite transaction on commit().
+    """
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference, changes):
+        self._writes.append(("update", reference, changes, False))
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference, None, False))
+
+    def commit(self):
+        storage = self._storage
+        with storage.transaction():
+            for kind, reference, data, merge in self._writes:
+                if kind == "set":
+                    storage._write(reference, data, merge)
+                elif kind == "update":
+                    storage._update(reference, data)
+                else:
+                    storage._delete(reference)
+        self._writes = []
+
+
+def benchmark(task_count=10000, repeat=1000):
+    """
+    Times point reads and indexed queries on the SQLite backend with synthetic tasks.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        storage = SQLiteStorage(str(Path(directory) / "bench.db"))
+        tasks = storage.collection("tasks")
+        batch = storage.batch()
+        for index in range(task_count):
+            batch.set(tasks.document(f"task {index}"), {
+                "title": f"task {index}",
+                "priority": ("high", "medium", "low")[index % 3],
+                "category": ("work", "personal")[index % 2],
+                "deadline": datetime(2030, 1, 1 + index % 28),
+                "created_at": datetime.now(),
+            })
+        batch.commit()
+        storage.connection.execute("ANALYZE")
+
+        started = time.perf_counter()
+        for index in range(repeat):
+            tasks.document(f"task {index % task_count}").get()
+        print(f"point read: {(time.perf_counter() - started) / repeat * 1e6:.1f} us")
+
+        started = time.perf_counter()
+        for _ in range(repeat // 10):
+            tasks.where("priority", "==", "high").limit(20).get()
+        print(f"where + limit 20: {(time.perf_counter() - started) / (repeat // 10) * 1e6:.1f} us")
+
+        started = time.perf_counter()
+        for _ in range(repeat // 10):
+            tasks.where("deadline", "<=", datetime(2030, 1, 3)).order_by("deadline").limit(20).get()
+        print(f"range + order_by + limit 20: {(time.perf_counter() - started) / (repeat // 10) * 1e6:.1f} us")
+        storage.close()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,109 @@
+import re
+import time
+
+from audio_io import interrupted, speak
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a line break
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# One {"call_site", "first_audio", "completed"} entry per streamed response, times in seconds from the request
+first_audio_latencies = []
+
+
+def response_chunks(response):
+    """
+    Yields the text of each chunk of a streamed Gemini response, skipping chunks without text
+    (e.g. ones that only carry safety ratings).
+    """
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+
+def split_sentences(chunks):
+    """
+    Regroups streamed text chunks into complete sentences as soon as each one is available.
+
+    Parameters:
+        chunks (iterable of str): Text as it arrives.
+
+    Yields:
+        str: One sentence at a time, the remainder once the stream ends.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        parts = SENTENCE_BOUNDARY.split(buffer)
+        buffer = parts.pop()
+        for sentence in parts:
+            if sentence.strip():
+                yield sentence.strip()
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def speak_streamed_response(response, call_site, started=None, intro=None):
+    """
+    Speaks a streamed Gemini response sentence by sentence while it is still being generated.
+
+    Parameters:
+        response: A response from generate_content(..., stream=True) or send_message(..., stream=True).
+        call_site (str): Name of the caller, used in the latency report.
+        started (float): time.perf_counter() when the request was made, now if not given.
+        intro (str): Optional text to say before the response.
+
+    Returns:
+        str: The full response text, e.g. for persisting it.
+    """
+    started = time.perf_counter() if started is None else started
+    latency = {"call_site": call_site, "first_audio": None, "completed": None}
+    first_audio_latencies.append(latency)
+
+    def on_start():
+        # Runs on the speech worker, possibly after this function has returned
+        if latency["first_audio"] is None:
+            latency["first_audio"] = time.perf_counter() - started
+
+    # Time to first audio counts from the first sentence of the response itself, not the intro
+    if intro:
+        speak(intro)
+
+    parts = []
+
+    def collected():
+        for text in response_chunks(response):
+            parts.append(text)
+            yield text
+
+    for sentence in split_sentences(collected()):
+        # Once the user has talked over the answer, keep reading the stream for the full text but stop speaking
+        if not interrupted():
+            speak(sentence, interruptible=True, on_start=on_start)
+
+    latency["completed"] = time.perf_counter() - started
+    if latency["first_audio"] is not None:
+        print(f"[{call_site}] first audio after {latency['first_audio'] * 1000:.0f} ms, "
+              f"full response after {latency['completed'] * 1000:.0f} ms")
+    return "".join(parts)
+
+
+def print_first_audio_report():
+    """
+    Prints the average time to first audio and to the full response per call site.
+    """
+    totals = {}
+    for latency in first_audio_latencies:
+        if latency["first_audio"] is not None and latency["completed"] is not None:
+            totals.setdefault(latency["call_site"], []).append((latency["first_audio"], latency["completed"]))
+    if not totals:
+        return
+    print("\nTime to first audio:")
+    for call_site, samples in totals.items():
+        average_audio = sum(sample[0] for sample in samples) / len(samples)
+        average_full = sum(sample[1] for sample in samples) / len(samples)
+        print(f"  {call_site:<30} {len(samples):4d} responses, first audio {average_audio * 1000:8.1f} ms, "
+              f"full response {average_full * 1000:8.1f} ms")
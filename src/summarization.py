@@ -0,0 +1,253 @@
+import hashlib
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from audio_io import speak
+from chat_context import CHARS_PER_TOKEN
+from config import SUMMARY_CACHE_DIR, SUMMARY_CHUNK_TOKENS, SUMMARY_WORKERS
+from llm_usage import input_budget
+from streaming_speech import speak_streamed_response
+from text_extraction import iter_lines
+
+# Files are hashed this many bytes at a time
+HASH_BLOCK_SIZE = 1 << 20
+# Most rounds of combining partial summaries; if they still do not fit in one request, each is cut to fit
+MAX_COMBINE_ROUNDS = 3
+
+
+def file_digest(path):
+    """
+    Hashes a file's content without loading it whole.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_chunks(lines, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """
+    Groups lines of text into chunks of at most max_tokens, as they are read.
+
+    Chunks end at a paragraph break when one is close to the limit, so a chunk rarely cuts a paragraph
+    in two. A single line longer than a chunk is cut at spaces.
+
+    Parameters:
+        lines (iterable of str): The text, line by line, e.g. an open file.
+        max_tokens (int): Most tokens per chunk.
+
+    Yields:
+        str: One chunk at a time.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunk, size, last_break = [], 0, 0
+    for line in lines:
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if chunk:
+                yield "".join(chunk)
+                chunk, size, last_break = [], 0, 0
+            yield line[:cut]
+            line = line[cut:].lstrip(" ")
+        if size + len(line) > max_chars:
+            # Cut at the last paragraph break if it keeps at least half a chunk, otherwise right here
+            if last_break > len(chunk) // 2:
+                yield "".join(chunk[:last_break])
+                chunk = chunk[last_break:]
+            else:
+                yield "".join(chunk)
+                chunk = []
+            size, last_break = sum(len(part) for part in chunk), 0
+        chunk.append(line)
+        size += len(line)
+        if not line.strip():
+            last_break = len(chunk)
+    if chunk and "".join(chunk).strip():
+        yield "".join(chunk)
+
+
+def shorten_to_fit(parts, max_tokens, separator="\n\n"):
+    """
+    Cuts every part by the same proportion, at a space, so that joined with the separator they fit in
+    max_tokens; the last parts keep their share instead of being dropped.
+
+    Returns:
+        str: The joined parts.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN - len(separator) * len(parts)
+    total = sum(len(part) for part in parts)
+    if total > max_chars:
+        ratio = max(0, max_chars) / total
+        shortened = []
+        for part in parts:
+            limit = int(len(part) * ratio)
+            cut = part.rfind(" ", 0, limit)
+            shortened.append(part[:cut if cut > 0 else limit])
+        parts = shortened
+    return "".join(part + separator for part in parts)
+
+
+def bounded_map(function, items, workers=SUMMARY_WORKERS):
+    """
+    Like ThreadPoolExecutor.map, but only takes items from the iterable as workers free up, so a large
+    file is never held in memory whole.
+
+    Returns:
+        list: The results, in item order.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarizer") as pool:
+        pending = deque()
+        for item in items:
+            if len(pending) >= workers * 2:
+                results.append(pending.popleft().result())
+            pending.append(pool.submit(function, item))
+        while pending:
+            results.append(pending.popleft().result())
+    return results
+
+
+class Summarizer:
+    """
+    Map-reduce summarization of texts too large for one request.
+
+    The text is split into token-bounded chunks that are summarized concurrently by a bounded pool of
+    workers; the partial summaries are then combined, in several rounds if they are still too long, into
+    one summary. Results are cached on disk by content hash, instruction and model.
+    """
+
+    def __init__(self, model, instruction="Summarize the following text", chunk_tokens=None,
+                 workers=SUMMARY_WORKERS, cache_dir=SUMMARY_CACHE_DIR):
+        """
+        Parameters:
+            model (GeminiClient): The Gemini model to summarize with.
+            instruction (str): What to do with the text, e.g. "Summarize the following meeting transcript".
+            chunk_tokens (int): Most tokens per chunk and per combining request; the summarize_chunk input
+                budget if set, else SUMMARY_CHUNK_TOKENS. A caller's call site with an input budget of its own
+                gets chunks of at most that budget.
+            workers (int): Most requests in flight at once.
+            cache_dir (str): Where summaries are cached, None to disable the cache.
+        """
+        self.model = model
+        self.instruction = instruction
+        self.chunk_tokens = chunk_tokens or input_budget("summarize_chunk", SUMMARY_CHUNK_TOKENS)
+        self.workers = workers
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+    def _cache_path(self, content_hash):
+        key = hashlib.sha256(f"{getattr(self.model, 'model_name', '')}\n{self.instruction}\n{content_hash}"
+                             .encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{key}.txt"
+
+    def _cached(self, content_hash):
+        if self.cache_dir is None:
+            return None
+        path = self._cache_path(content_hash)
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    def _store(self, content_hash, summary):
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_path(content_hash)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(summary, encoding="utf-8")
+        temporary.replace(path)
+
+    def chunk_tokens_for(self, call_site):
+        """
+        Returns the chunk size for a call site: its input budget, if it has one, within the chunk size.
+        """
+        return min(self.chunk_tokens, input_budget(call_site, self.chunk_tokens))
+
+    def _summarize_chunk(self, chunk):
+        prompt = (f"{self.instruction}. It is one part of a longer text; keep the key facts, names, figures and "
+                  f"decisions, briefly:\n\n{chunk}")
+        return self.model.generate_content(prompt, call_site="summarize_chunk").text.strip()
+
+    def _final(self, text, call_site, combining, speak_summary, intro):
+        if combining:
+            prompt = (f"{self.instruction}. Below are summaries of consecutive parts of one text; combine them "
+                      f"into a single summary:\n\n{text}")
+        else:
+            prompt = f"{self.instruction}: {text}"
+        if speak_summary:
+            started = time.perf_counter()
+            return speak_streamed_response(self.model.generate_content(prompt, stream=True, call_site=call_site),
+                                           call_site, started, intro=intro)
+        return self.model.generate_content(prompt, call_site=call_site).text
+
+    def summarize_chunks(self, chunks, content_hash=None, call_site="summarize", speak_summary=False, intro=None):
+        """
+        Summarizes text given as chunks.
+
+        Parameters:
+            chunks (iterable of str): The text, already split, e.g. from split_chunks().
+            content_hash (str): Hash of the whole text, used as cache key; no caching if not given.
+            call_site (str): Name of the caller, for its input budget and the reports.
+            speak_summary (bool): Stream the final summary and speak it sentence by sentence.
+            intro (str): Said before the summary when speaking it.
+
+        Returns:
+            str: The summary.
+        """
+        cached = self._cached(content_hash) if content_hash else None
+        if cached is not None:
+            if speak_summary:
+                if intro:
+                    speak(intro)
+                speak(cached, interruptible=True)
+            return cached
+
+        chunks = iter(chunks)
+        first = next(chunks, "")
+        second = next(chunks, None)
+        if second is None:
+            # Small enough for a single request
+            summary = self._final(first, call_site, False, speak_summary, intro)
+        else:
+            partials = bounded_map(self._summarize_chunk, _chain(first, second, chunks), self.workers)
+            # Combine in rounds until the partial summaries fit in one request; only while each round shrinks
+            # them and for a bounded number of rounds, so verbose summaries cannot keep spending requests
+            chunk_tokens = self.chunk_tokens_for(call_site)
+            groups = list(split_chunks((partial + "\n\n" for partial in partials), chunk_tokens))
+            rounds = 0
+            while 1 < len(groups) < len(partials) and rounds < MAX_COMBINE_ROUNDS:
+                partials = bounded_map(self._summarize_chunk, groups, self.workers)
+                groups = list(split_chunks((partial + "\n\n" for partial in partials), chunk_tokens))
+                rounds += 1
+            if len(groups) > 1:
+                print(f"[{call_site}] Partial summaries still too long after {rounds} rounds, each cut to fit.")
+                groups = [shorten_to_fit(partials, chunk_tokens)]
+            summary = self._final("".join(groups), call_site, True, speak_summary, intro)
+
+        if content_hash:
+            self._store(content_hash, summary)
+        return summary
+
+    def summarize_file(self, path, call_site="summarize_file", speak_summary=False, intro=None):
+        """
+        Summarizes a document, text, PDF or DOCX, streaming its text; unchanged files are answered from the
+        cache.
+        """
+        content_hash = file_digest(path)
+        return self.summarize_chunks(split_chunks(iter_lines(path), self.chunk_tokens_for(call_site)), content_hash,
+                                     call_site, speak_summary, intro)
+
+    def summarize_text(self, text, call_site="summarize_text", speak_summary=False, intro=None):
+        """
+        Summarizes a text already in memory, e.g. a transcript.
+        """
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return self.summarize_chunks(split_chunks(text.splitlines(keepends=True), self.chunk_tokens_for(call_site)),
+                                     content_hash, call_site, speak_summary, intro)
+
+
+def _chain(first, second, rest):
+    yield first
+    yield second
+    yield from rest
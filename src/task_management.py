@@ -1,54 +1,25 @@
 from datetime import datetime
 
 import dateparser
-import google.generativeai as genai
-import pyttsx3
-import speech_recognition as sr
-from firebase_admin import firestore
 
-from config import GEMINI_API_KEY
+from audio_io import listen, speak
+from collection_cache import get_cache
+from gemini_client import get_model
+from listing import browse
+from storage import get_db
 
-# Initialize Firestore
-db = firestore.client()
+# Initialize the document store
+db = get_db()
 
 # Initialize Gemini model
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
-
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)
-
-
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
+model = get_model()
 
 
 # Function to infer priority and category using Gemini
 def infer_task_details(task_description):
     response = model.generate_content(
-        f"What is the priority and category of this task? Only provide the priority (high,medium,low) as priority : and category (work, personal) as category : , nothing else, no description, no extra information. : {task_description}"
-    )
+        f"What is the priority and category of this task? Only provide the priority (high,medium,low) as priority : and category (work, personal) as category : , nothing else, no description, no extra information. : {task_description}",
+        call_site="infer_task_details")
     return response.text.lower()
 
 
@@ -71,41 +42,39 @@ def add_task_from_input(task_description, deadline):
 
     doc_ref = db.collection("tasks").document(task_description)
     doc_ref.set(task_data)
+    get_cache("tasks").invalidate(task_description)
     speak(f"Task '{task_description}' added with priority: {priority} and category: {category}")
 
 
-def get_tasks_by_priority(priority):
-    tasks = db.collection("tasks").where("priority", "==", priority).stream()
-    task_list = [task.to_dict() for task in tasks]
+# Only the fields shown in task listings are fetched
+TASK_LIST_FIELDS = ["title", "deadline"]
+
+
+def describe_task(task):
+    return f"{task.get('title', task['id'])} with deadline on {task.get('deadline')}"
+
 
+def get_tasks_by_priority(priority):
     speak(f"Tasks with priority '{priority}' are being displayed on the console")
-    for task in task_list:
-        print(f"{task['title']} with deadline on {task['deadline']}")
-    return task_list
+    pager = get_cache("tasks").pager([("priority", "==", priority)], TASK_LIST_FIELDS)
+    return browse(pager, describe_task, "tasks")
 
 
 def get_tasks_by_category(category):
-    tasks = db.collection("tasks").where("category", "==", category).stream()
-    task_list = [task.to_dict() for task in tasks]
-
     speak(f"Tasks in category '{category}' are being displayed on the console")
-    for task in task_list:
-        print(f"{task['title']} with deadline on {task['deadline']}")
-    return task_list
+    pager = get_cache("tasks").pager([("category", "==", category)], TASK_LIST_FIELDS)
+    return browse(pager, describe_task, "tasks")
 
 
 def get_upcoming_tasks(deadline_date):
-    tasks = db.collection("tasks").where("deadline", "<=", deadline_date).order_by("deadline").stream()
-    upcoming_tasks = [task.to_dict() for task in tasks]
-
     speak("Here are the upcoming tasks")
-    for task in upcoming_tasks:
-        print(f"{task['title']} with deadline on {task['deadline']}")
-    return upcoming_tasks
+    pager = get_cache("tasks").pager([("deadline", "<=", deadline_date)], TASK_LIST_FIELDS, order_by="deadline")
+    return browse(pager, describe_task, "tasks")
 
 
 def delete_task(task_title):
     db.collection("tasks").document(task_title).delete()
+    get_cache("tasks").invalidate(task_title)
     speak(f"Task '{task_title}' deleted successfully!")
 
 
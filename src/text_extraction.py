@@ -0,0 +1,194 @@
+import codecs
+import hashlib
+import importlib.util
+import mmap
+import os
+import zipfile
+from pathlib import Path
+from xml.etree import ElementTree
+
+from config import EXTRACT_BLOCK_CHARS, EXTRACT_CACHE_DIR, EXTRACT_MMAP_THRESHOLD
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Formats whose text has to be extracted, and is therefore worth caching
+CONVERTED_SUFFIXES = (".pdf", ".docx")
+
+
+def _text_blocks(path, block_size=EXTRACT_BLOCK_CHARS):
+    size = os.path.getsize(path)
+    if size < EXTRACT_MMAP_THRESHOLD:
+        # Read as the blocks are consumed, so a caller that only wants the start reads only the start; the
+        # decoder carries a character split between two reads over to the next block
+        with open(path, "rb") as file:
+            data = file.read(1024)
+            if b"\0" in data:
+                return
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while data:
+                text = decoder.decode(data)
+                if text:
+                    yield text
+                data = file.read(block_size)
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        return
+    # Large files are paged in by the OS as blocks are read, never held whole. Blocks end at a line break
+    # close to block_size, or else at the start of a UTF-8 character, so that no character is cut
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if b"\0" in data[:1024]:
+            return
+        start = 0
+        while start < size:
+            end = data.find(b"\n", start + block_size, start + 2 * block_size)
+            if end != -1:
+                end += 1
+            elif start + 2 * block_size >= size:
+                end = size
+            else:
+                end = start + 2 * block_size
+                while data[end] & 0xC0 == 0x80:
+                    end -= 1
+            yield data[start:end].decode("utf-8", errors="replace")
+            start = end
+
+
+def _docx_blocks(path, block_size=EXTRACT_BLOCK_CHARS):
+    block, length = [], 0
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as document:
+        # Paragraphs are read one at a time and dropped once their text is taken
+        for _, element in ElementTree.iterparse(document):
+            if element.tag != WORD_NAMESPACE + "p":
+                continue
+            paragraph = "".join(text.text or "" for text in element.iter(WORD_NAMESPACE + "t")) + "\n"
+            element.clear()
+            block.append(paragraph)
+            length += len(paragraph)
+            if length >= block_size:
+                yield "".join(block)
+                block, length = [], 0
+    if block:
+        yield "".join(block)
+
+
+def _pdf_blocks(path):
+    from pypdf import PdfReader
+
+    for page in PdfReader(path).pages:
+        yield (page.extract_text() or "") + "\n"
+
+
+def _cache_paths(path):
+    path = Path(path).resolve()
+    stat = path.stat()
+    path_key = hashlib.sha256(str(path).encode("utf-8")).hexdigest()[:32]
+    version = hashlib.sha256(f"{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8")).hexdigest()[:16]
+    return Path(EXTRACT_CACHE_DIR) / f"{path_key}-{version}.txt", path_key
+
+
+def iter_blocks(path, block_size=EXTRACT_BLOCK_CHARS):
+    """
+    Streams the text of a document block by block: page by page for PDF, a few paragraphs at a time for
+    DOCX, and fixed-size blocks for anything else, which is read as UTF-8 text.
+
+    Text extracted from PDF and DOCX is cached per file, by modification time and size, so only the first
+    read of a file pays for the extraction. Binary files yield nothing.
+
+    Parameters:
+        path (Path): The document.
+        block_size (int): About how many characters of text are read per block.
+
+    Yields:
+        str: Consecutive blocks of the text.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix not in CONVERTED_SUFFIXES:
+        yield from _text_blocks(path, block_size)
+        return
+
+    cache_path, path_key = _cache_paths(path)
+    if cache_path.exists():
+        yield from _text_blocks(cache_path, block_size)
+        return
+    if suffix == ".pdf" and importlib.util.find_spec("pypdf") is None:
+        print("Install pypdf to read PDF files.")
+        return
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    complete = False
+    try:
+        with open(temporary, "w", encoding="utf-8") as cache:
+            try:
+                for block in _docx_blocks(path) if suffix == ".docx" else _pdf_blocks(path):
+                    cache.write(block)
+                    yield block
+            except Exception as e:
+                # Damaged files: zipfile, XML and pypdf errors alike
+                print(f"Error reading '{path}': {e}")
+                return
+        complete = True
+    finally:
+        if complete:
+            # Text of older versions of the file is no longer needed
+            for stale in cache_path.parent.glob(f"{path_key}-*.txt"):
+                stale.unlink(missing_ok=True)
+            temporary.replace(cache_path)
+        else:
+            # Stopped early, e.g. after one window: the partial text is not cached
+            temporary.unlink(missing_ok=True)
+
+
+def iter_lines(path):
+    """
+    Streams the text of a document line by line, e.g. for summarization.split_chunks().
+    """
+    rest = ""
+    for block in iter_blocks(path):
+        lines = (rest + block).splitlines(keepends=True)
+        rest = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        yield from lines
+        if len(rest) > EXTRACT_BLOCK_CHARS:
+            # No line break in sight, e.g. minified text: pass it on rather than let it grow
+            yield rest
+            rest = ""
+    if rest:
+        yield rest
+
+
+def iter_windows(path, size=EXTRACT_BLOCK_CHARS):
+    """
+    Streams the text of a document in windows of about size characters, ending at a line break where
+    possible, for showing a document part by part.
+    """
+    window, length = [], 0
+    for line in iter_lines(path):
+        if window and length + len(line) > size:
+            yield "".join(window)
+            window, length = [], 0
+        window.append(line)
+        length += len(line)
+    if window:
+        yield "".join(window)
+
+
+def read_window(path, max_chars, start=0):
+    """
+    Returns at most max_chars characters of a document's text, from character start, reading only as much
+    of the document as needed.
+
+    Returns:
+        str: The text, empty if there is none there or the document is not text.
+    """
+    parts, skipped, length = [], 0, 0
+    for block in iter_blocks(path, min(EXTRACT_BLOCK_CHARS, max(start + max_chars, 1024))):
+        if skipped + len(block) <= start:
+            skipped += len(block)
+            continue
+        block = block[max(start - skipped, 0):]
+        skipped = start
+        parts.append(block[:max_chars - length])
+        length += len(parts[-1])
+        if length >= max_chars:
+            break
+    return "".join(parts)
@@ -0,0 +1,284 @@
+import atexit
+import gc
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import WHISPER_IDLE_TIMEOUT, WHISPER_MODEL, WHISPER_WORKERS
+
+# Job kind that only loads the model, so it is ready before the first real job
+WARM_UP = "warm_up"
+# Seconds an idle worker waits on the shared queue before looking at its own warm-up queue again
+WARM_UP_POLL = 0.5
+
+
+def _worker(jobs, warm_ups, results, model_name, idle_timeout, threads, worker_id):
+    """
+    Worker process: loads the Whisper model on the first job, transcribes jobs from the shared queue, takes the
+    warm-ups sent to it alone from its own queue, and unloads the model after idle_timeout seconds without a
+    job. Runs until it receives None.
+    """
+    import torch
+    import whisper
+
+    # Workers share the cores instead of each starting a thread per core
+    torch.set_num_threads(threads)
+    results.put({"event": "ready", "worker": worker_id})
+    model = None
+    last_job = time.monotonic()
+    while True:
+        try:
+            job = warm_ups.get_nowait()
+        except queue.Empty:
+            try:
+                job = jobs.get(timeout=WARM_UP_POLL)
+            except queue.Empty:
+                if model is not None and time.monotonic() - last_job >= idle_timeout:
+                    model = None
+                    gc.collect()
+                    results.put({"event": "unloaded", "worker": worker_id})
+                continue
+        if job is None:
+            return
+        results.put({"event": "taken", "id": job["id"], "worker": worker_id})
+
+        result = {"id": job["id"], "load_seconds": 0.0}
+        try:
+            if model is None:
+                started = time.perf_counter()
+                model = whisper.load_model(model_name)
+                result["load_seconds"] = time.perf_counter() - started
+            if job["kind"] != WARM_UP:
+                started = time.perf_counter()
+                # Either a file, or audio already decoded to 16 kHz mono float32 samples
+                source = job["audio"] if job.get("audio") is not None else job["path"]
+                transcription = model.transcribe(source, **job["options"])
+                result["transcribe_seconds"] = time.perf_counter() - started
+                result["text"] = transcription["text"]
+                result["segments"] = [{"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                                      for segment in transcription.get("segments", [])]
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        results.put(result)
+        last_job = time.monotonic()
+
+
+class TranscriptionService:
+    """
+    Whisper transcription in long-lived worker processes.
+
+    The model is loaded once per worker and kept between meetings, instead of being re-read and re-initialized
+    for each one, and the voice loop never shares the GIL with transcription. Jobs go to the workers over one
+    queue, so a free worker takes the next job, and come back as futures; warm-ups go to each worker's own
+    queue, so every worker loads the model. After idle_timeout seconds without a
+    job a worker unloads its model to free its memory; its next job loads it again. A worker that dies fails
+    the job it was on and is restarted.
+    """
+
+    def __init__(self, model_name=WHISPER_MODEL, idle_timeout=WHISPER_IDLE_TIMEOUT, workers=WHISPER_WORKERS):
+        """
+        Parameters:
+            model_name (str): The Whisper model, e.g. "base".
+            idle_timeout (float): Seconds without a job before a worker unloads the model.
+            workers (int): Worker processes, each with its own copy of the model.
+        """
+        self.model_name = model_name
+        self.idle_timeout = idle_timeout
+        self.workers = max(1, workers)
+        # One {"kind", "waiting", "load", "transcribe", "total"} entry per finished job, times in seconds
+        self.latencies = []
+        self.unloads = 0
+        # Seconds from starting a worker until it could take jobs, per start
+        self.startups = []
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._jobs = None
+        self._results = None
+        # Worker number -> its own queue, for warm-ups
+        self._warm_ups = {}
+        # Worker number -> (process, time it was started)
+        self._processes = {}
+        # Job ID -> (future, job), and job ID -> number of the worker on it
+        self._pending = {}
+        self._taken = {}
+        self._ids = itertools.count()
+        self._stopping = False
+
+    def _start_worker(self, worker_id):
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        process = self._context.Process(target=_worker, name=f"transcription-worker-{worker_id}", daemon=True,
+                                        args=(self._jobs, self._warm_ups[worker_id], self._results,
+                                              self.model_name, self.idle_timeout, threads, worker_id))
+        process.start()
+        self._processes[worker_id] = (process, time.perf_counter())
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._stopping = False
+            if self._jobs is None:
+                self._jobs = self._context.Queue()
+                self._results = self._context.Queue()
+                threading.Thread(target=self._read_results, name="transcription-results", daemon=True).start()
+            for worker_id in range(self.workers):
+                if worker_id not in self._warm_ups:
+                    self._warm_ups[worker_id] = self._context.Queue()
+                if worker_id not in self._processes or not self._processes[worker_id][0].is_alive():
+                    self._fail_taken(worker_id)
+                    self._start_worker(worker_id)
+
+    def _fail_taken(self, worker_id):
+        for job_id in [job_id for job_id, taken_by in self._taken.items() if taken_by == worker_id]:
+            del self._taken[job_id]
+            future, _ = self._pending.pop(job_id, (None, None))
+            if future is not None:
+                future.set_exception(RuntimeError("Transcription worker stopped"))
+
+    def _check_workers(self):
+        with self._lock:
+            if self._stopping:
+                return
+            for worker_id, (process, _) in list(self._processes.items()):
+                if not process.is_alive():
+                    self._fail_taken(worker_id)
+                    if self._pending:
+                        self._start_worker(worker_id)
+
+    def _read_results(self):
+        """
+        Resolves the futures of finished jobs, and watches for dead workers, on a background thread.
+        """
+        while True:
+            try:
+                result = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            event = result.get("event")
+            if event == "ready":
+                _, started = self._processes.get(result["worker"], (None, None))
+                if started is not None:
+                    self.startups.append(time.perf_counter() - started)
+                continue
+            if event == "taken":
+                with self._lock:
+                    if result["id"] in self._pending:
+                        self._taken[result["id"]] = result["worker"]
+                continue
+            if event == "unloaded":
+                self.unloads += 1
+                print(f"Whisper model unloaded by worker {result['worker']} after {self.idle_timeout:.0f} s idle.")
+                continue
+            with self._lock:
+                self._taken.pop(result["id"], None)
+                future, job = self._pending.pop(result["id"], (None, None))
+            if future is None:
+                continue
+            total = time.perf_counter() - job["submitted"]
+            transcribe = result.get("transcribe_seconds", 0.0)
+            self.latencies.append({"kind": job["kind"], "load": result["load_seconds"], "transcribe": transcribe,
+                                   "total": total, "waiting": total - result["load_seconds"] - transcribe})
+            if result["load_seconds"]:
+                print(f"Whisper '{self.model_name}' loaded in {result['load_seconds']:.1f} s.")
+            if "error" in result:
+                future.set_exception(RuntimeError(result["error"]))
+            else:
+                future.set_result(result)
+
+    def _submit(self, kind, path=None, options=None, audio=None, worker=None):
+        self._ensure_workers()
+        future = Future()
+        job = {"id": next(self._ids), "kind": kind, "path": path, "audio": audio, "options": options or {}}
+        with self._lock:
+            self._pending[job["id"]] = (future, {"kind": kind, "submitted": time.perf_counter()})
+        (self._jobs if worker is None else self._warm_ups[worker]).put(job)
+        return future
+
+    def warm_up(self):
+        """
+        Starts the workers and has each of them load the model in the background, so a transcription requested
+        soon after does not wait for it.
+
+        Returns:
+            list of Future: One per worker, resolved once its model is loaded.
+        """
+        return [self._submit(WARM_UP, worker=worker_id) for worker_id in range(self.workers)]
+
+    def submit(self, path, **options):
+        """
+        Queues an audio file for transcription.
+
+        Parameters:
+            path (str): The audio file.
+            options: Passed on to Whisper's transcribe(), e.g. language="en".
+
+        Returns:
+            Future: Resolved with {"text", "segments", "load_seconds", "transcribe_seconds"}; segments are
+            {"start", "end", "text"} with times in seconds.
+        """
+        return self._submit("transcribe", str(path), options)
+
+    def submit_audio(self, audio, **options):
+        """
+        Queues audio already decoded to 16 kHz mono float32 samples, e.g. one stretch of speech of a longer
+        recording. See submit().
+        """
+        return self._submit("transcribe", options=options, audio=audio)
+
+    def transcribe(self, path, timeout=None, **options):
+        """
+        Transcribes an audio file, waiting for the result. See submit().
+        """
+        return self.submit(path, **options).result(timeout)
+
+    def shutdown(self):
+        """
+        Stops the workers, letting them finish the jobs they are on.
+        """
+        with self._lock:
+            self._stopping = True
+            processes = [process for process, _ in self._processes.values() if process.is_alive()]
+            self._processes = {}
+        for _ in processes:
+            self._jobs.put(None)
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_transcription_service():
+    """
+    Returns the shared transcription service, created on first use; its workers start with the first job.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TranscriptionService()
+            atexit.register(_service.shutdown)
+        return _service
+
+
+def print_transcription_report():
+    """
+    Prints model load and transcription times: the first jobs pay for starting the workers and loading the
+    model, the later ones only for transcription while the model stays warm.
+    """
+    if _service is None or not _service.latencies:
+        return
+    print("\nTranscription:")
+    for startup in _service.startups:
+        print(f"  worker started in {startup:.1f} s")
+    for latency in _service.latencies:
+        print(f"  {latency['kind']:<12} total {latency['total']:7.1f} s: model load {latency['load']:6.1f} s, "
+              f"transcription {latency['transcribe']:7.1f} s, waiting {latency['waiting']:6.1f} s")
+    if _service.unloads:
+        print(f"  model unloaded {_service.unloads} time{'s' if _service.unloads > 1 else ''} after "
+              f"{_service.idle_timeout:.0f} s idle")
@@ -1,103 +1,85 @@
 import random
 import time
 
-import firebase_admin
-import pyttsx3
-import speech_recognition as sr
-from firebase_admin import credentials
-
-from config import FIREBASE_CREDENTIALS_PATH
-
-# Firebase initialization
-cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-firebase_admin.initialize_app(cred)
-
-# Import all the modules as needed
-from interaction_history import interaction_history, handle_user_command
-from task_management import task_voice_interaction
-from web_browsing import web_browsing_voice_interaction
-from note_taking import note_voice_interaction
-from document_management import document_management_voice_interaction
-from custom_commands import check_and_execute_command
-from realtime_translation import translation_voice_interaction
-from email_management import email_voice_interaction
-from weather_and_news import weather_and_news_voice_interaction
-from personalized_recommendations import recommendations_voice_interaction
-from entertainment_controls import entertainment_control_voice_interaction
-from meeting_summaries import meeting_summary_voice_interaction
-from advanced_notfilications import check_and_notify_tasks
-
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
+# Imported first so the load report measures from process start
+from module_registry import timed_load, import_module, run_feature, print_load_report
+
+from audio_io import listen, speak
+from collection_cache import get_cache, print_cache_report
+from config import CHAT_ON_EVERY_COMMAND
+from intent_router import best_feature
+from llm_cache import print_llm_cache_report
+from llm_usage import print_usage_report
+from storage import get_db
+from streaming_speech import print_first_audio_report
+from transcription_service import print_transcription_report
+
+# Initialize the document store, Firestore or SQLite depending on STORAGE_BACKEND
+timed_load("storage", get_db)
+
+# Feature modules are imported on demand by module_registry, only interaction history is needed up front
+history = import_module("interaction_history")
 
 # Initialize chat history
-session_id, chat = interaction_history()
+session_id, chat = timed_load("chat session", history.interaction_history)
 
 # Constants
 INACTIVITY_THRESHOLD = 1800  # 30 minutes in seconds
-Entertainment_Commands = ["play", "pause", "stop", "resume", "skip", "next", "previous", "shuffle", "repeat", "look"
-                                                                                                              "volume up",
-                          "volume down", "increase", "decrease", "seek", "jump"]
-
-
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
+
+# (handled by, seconds from command to the feature starting or the answer being ready) per command
+command_latencies = []
+
+
+def is_saved_custom_command(command):
+    """
+    Tells whether a command is a custom command the user saved; they are stored under the whole command.
+    """
+    # Document IDs cannot be empty or contain a slash
+    if not command or "/" in command:
+        return False
+    return get_cache("custom_commands").get_document(command) is not None
 
 
 def activate_module(command):
     """
     Activate the appropriate module based on the user's command.
-    """
 
-    response = handle_user_command(session_id, command, chat)
-
-    if "task" in command:
-        task_voice_interaction(command)
-    elif "web" in command or "search" in command or "browse" in command:
-        web_browsing_voice_interaction(command)
-    elif "note" in command:
-        note_voice_interaction(command)
-    elif "document" in command or "file" in command or "folder" in command or "directory" in command or "drive" in command:
-        document_management_voice_interaction(command)
-    elif "translation" in command or "translate" in command:
-        translation_voice_interaction()
-    elif "email" in command or "mail" in command or "inbox" in command:
-        email_voice_interaction(command)
-    elif "weather" in command or "news" in command or "headline" in command or "article" in command:
-        weather_and_news_voice_interaction(command)
-    elif "recommendation" in command or "suggestion" in command or "advice" in command or "recommendations" in command or "recommend" in command:
-        recommendations_voice_interaction(command)
-    elif "entertainment" in command or "music" in command or "video" in command or "movie" in command or "spotify" in command or "youtube" in command or any(
-            cmd in command for cmd in Entertainment_Commands):
-        entertainment_control_voice_interaction(command)
-    elif "meeting" in command or "summary" in command or "transcript" in command or "transcribe" in command:
-        meeting_summary_voice_interaction(command)
-    elif "custom" in command or "execute" in command or "run" in command or "perform" in command or "open" in command or "launch" in command or "start" in command:
-        check_and_execute_command(command)
+    Only commands no feature handles go to the Gemini chat; routed commands are logged to the
+    interaction history in the background with the feature that handled them, and its result if it
+    returned one.
+    """
+    started = time.perf_counter()
+    response = history.handle_user_command(session_id, command, chat) if CHAT_ON_EVERY_COMMAND else None
+
+    feature = best_feature(command, is_custom_command=is_saved_custom_command)
+    if feature:
+        command_latencies.append((feature, time.perf_counter() - started))
+        result = run_feature(feature, command)
+        if not CHAT_ON_EVERY_COMMAND:
+            history.save_to_chat(session_id, command, None if result is None else str(result), routed_to=feature)
+    elif response is not None:
+        command_latencies.append(("chat", time.perf_counter() - started))
+        print(response)
+        speak(response, interruptible=True)
     else:
+        response = history.handle_user_command(session_id, command, chat, speak_response=True)
+        command_latencies.append(("chat", time.perf_counter() - started))
         print(response)
-        speak(response)
+
+
+def print_latency_report():
+    """
+    Prints the average time from hearing a command to acting on it, per feature.
+    """
+    if not command_latencies:
+        return
+    mode = "chat on every command" if CHAT_ON_EVERY_COMMAND else "chat on fallback only"
+    print(f"\nCommand latency ({mode}):")
+    totals = {}
+    for handled_by, seconds in command_latencies:
+        totals.setdefault(handled_by, []).append(seconds)
+    for handled_by, samples in totals.items():
+        print(f"  {handled_by:<20} {len(samples):4d} commands, avg {sum(samples) / len(samples) * 1000:8.1f} ms")
 
 
 def main():
@@ -109,6 +91,7 @@ def main():
     goodbyes = ["See you later!", "Goodbye, have a great day!", "Goodbye, take care!", "Goodbye, see you soon!",
                 "Goodbye, have a nice day!"]
     speak(random.choice(greetings))
+    print_load_report()
 
     # Track last command time
     last_command_time = time.time()
@@ -116,13 +99,21 @@ def main():
     while True:
         # Check inactivity
         if time.time() - last_command_time >= INACTIVITY_THRESHOLD:
-            check_and_notify_tasks()
+            run_feature("notifications")
             # Reset timer after notification
             last_command_time = time.time()
 
         command = listen()
         if "exit" in command.lower():
-            speak(random.choice(goodbyes))
+            speak(random.choice(goodbyes), wait=True)
+            history.flush_history()
+            print_load_report()
+            print_latency_report()
+            print_first_audio_report()
+            print_cache_report()
+            print_llm_cache_report()
+            print_usage_report()
+            print_transcription_report()
             break
         activate_module(command.lower())
 
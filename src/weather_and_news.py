@@ -1,14 +1,8 @@
-import pyttsx3
 import requests
-import speech_recognition as sr
 
+from audio_io import speak
 from config import WEATHER_API_KEY, WEATHER_API_HOST, NEWS_API_KEY
 
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
-
 # Weather API setup
 WEATHER_API_URL = "https://weatherapi-com.p.rapidapi.com/current.json"
 
@@ -75,29 +69,6 @@ def get_news(country="us", category="general", num_articles=5):
         return None
 
 
-def speak(text):
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    with sr.Microphone() as source:
-        while True:
-            print("Listening...")
-            audio = recognizer.listen(source)
-            try:
-                command = recognizer.recognize_google(audio)
-                print("Command : " + command)
-                return command
-            except sr.WaitTimeoutError:
-                continue
-            except sr.UnknownValueError:
-                continue
-            except sr.RequestError:
-                speak("Voice service unavailable.")
-                return ""
-
-
 # Function to handle voice commands for Weather and News
 def weather_and_news_voice_interaction(command):
     if "weather" in command:
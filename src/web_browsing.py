@@ -1,20 +1,15 @@
+import time
 import webbrowser
 
-import google.generativeai as genai
-import pyttsx3
 import requests
-import speech_recognition as sr
 
-from config import GOOGLE_API_KEY, GOOGLE_CSE_ID, GEMINI_API_KEY
-
-# Initialize recognizer and text-to-speech
-recognizer = sr.Recognizer()
-engine = pyttsx3.init()
-engine.setProperty('rate', 250)  # Adjust speaking rate if needed
+from audio_io import listen, speak
+from config import GOOGLE_API_KEY, GOOGLE_CSE_ID
+from gemini_client import get_model
+from streaming_speech import speak_streamed_response
 
 # Configure Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")
+model = get_model()
 
 
 def search_web(query, num_results=5):
@@ -74,12 +69,13 @@ def display_results(results):
         print(f"Snippet: {result['snippet']}\n")
 
 
-def summarize_results_with_gemini(results):
+def summarize_results_with_gemini(results, speak_summary=False):
     """
     Summarizes the snippets from search results using Gemini API.
 
     Parameters:
         results (list): List of search results.
+        speak_summary (bool): Stream the summary and speak it sentence by sentence as it arrives.
 
     Returns:
         str: Summarized text of search result snippets.
@@ -88,7 +84,14 @@ def summarize_results_with_gemini(results):
 
     if snippets:
         # Send the snippets to Gemini for summarization
-        response = model.generate_content("Summarize the following text: " + snippets)
+        prompt = "Summarize the following text: " + snippets
+        if speak_summary:
+            started = time.perf_counter()
+            return speak_streamed_response(model.generate_content(prompt, stream=True,
+                                                                 call_site="summarize_results_with_gemini"),
+                                           "summarize_results_with_gemini", started,
+                                           intro="Here is a summary of the search results.")
+        response = model.generate_content(prompt, call_site="summarize_results_with_gemini")
         return response.text
     return "No content available for summarization."
 
@@ -111,27 +114,6 @@ def open_link(results):
         print("No link selected.")
 
 
-def speak(text):
-    """Convert text to speech."""
-    engine.say(text)
-    engine.runAndWait()
-
-
-def listen():
-    """Capture audio input from user."""
-    with sr.Microphone() as source:
-        print("Listening...")
-        audio = recognizer.listen(source)
-    try:
-        return recognizer.recognize_google(audio)
-    except sr.UnknownValueError:
-        speak("I didn't catch that.")
-        return ""
-    except sr.RequestError:
-        speak("Voice service unavailable.")
-        return ""
-
-
 def web_browsing_voice_interaction(query):
     """
     Voice interaction for the Web Browsing Module.
@@ -150,8 +132,7 @@ def web_browsing_voice_interaction(query):
         # Summarize results with Gemini
         speak("Would you like a summary of the results?")
         if "yes" in listen().lower():
-            summary = summarize_results_with_gemini(results)
-            speak("Here is a summary of the search results.")
+            summary = summarize_results_with_gemini(results, speak_summary=True)
             print("\nSummary of Search Results:\n", summary)
 
         # Open a link if requested
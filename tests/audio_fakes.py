@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import deque
+
+
+class FakeAudioSource:
+    """
+    Audio source that hears scripted phrases instead of a microphone, for audio_io.configure().
+    """
+
+    def __init__(self, phrases=(), barge_ins=(), transcripts=None):
+        """
+        Parameters:
+            phrases (iterable of str): What listen() hears, one phrase per call; then an empty string, as
+                when the voice service is unavailable.
+            barge_ins (iterable): One entry per interruptible utterance: None for no interruption, or
+                (seconds into playback, result) where result is what listen_for_barge_in() returns.
+            transcripts (dict): What recognize() makes of recorded audio; anything else is not available.
+        """
+        self.phrases = deque(phrases)
+        self.barge_ins = deque(barge_ins)
+        self.transcripts = transcripts or {}
+
+    def listen(self):
+        return self.phrases.popleft() if self.phrases else ""
+
+    def recognize(self, audio):
+        return self.transcripts.get(audio, "")
+
+    def listen_for_barge_in(self, stop_event, on_speech_start):
+        barge_in = self.barge_ins.popleft() if self.barge_ins else None
+        if barge_in is None:
+            stop_event.wait()
+            return None
+        delay, result = barge_in
+        if stop_event.wait(delay):
+            # Playback finished before the user spoke
+            return None
+        on_speech_start()
+        return result
+
+
+class FakeSink:
+    """
+    TTS sink that takes word_seconds per word and records what it said, for audio_io.configure().
+    """
+
+    def __init__(self, word_seconds=0.01):
+        self.word_seconds = word_seconds
+        # (text, whether it was spoken to the end) per utterance
+        self.spoken = []
+        self._stop_requested = threading.Event()
+
+    def say(self, text):
+        completed = True
+        for _ in text.split():
+            if self._stop_requested.is_set():
+                completed = False
+                break
+            time.sleep(self.word_seconds)
+        self._stop_requested.clear()
+        self.spoken.append((text, completed))
+
+    def stop(self):
+        self._stop_requested.set()
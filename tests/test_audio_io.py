@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+pytest.importorskip("pyttsx3")
+pytest.importorskip("speech_recognition")
+
+import audio_io  # noqa: E402
+from audio_fakes import FakeAudioSource, FakeSink  # noqa: E402
+
+LONG_TEXT = " ".join(["word"] * 100)
+
+
+@pytest.fixture(scope="module")
+def sink():
+    # The speech worker builds its sink once, on the first speak(), so every test shares this one
+    sink = FakeSink(word_seconds=0.01)
+    audio_io.configure(source=FakeAudioSource(), sink_factory=lambda: sink)
+    return sink
+
+
+@pytest.fixture(autouse=True)
+def clean(sink):
+    audio_io.wait_for_speech()
+    sink.spoken.clear()
+    yield
+    audio_io.wait_for_speech()
+
+
+def test_speak_returns_before_speech_is_done(sink):
+    started = time.perf_counter()
+    done = audio_io.speak(LONG_TEXT)
+    assert time.perf_counter() - started < 0.1
+    assert not done.is_set()
+
+    audio_io.speak("second")
+    audio_io.wait_for_speech()
+    assert done.is_set()
+    assert sink.spoken == [(LONG_TEXT, True), ("second", True)]
+
+
+def test_listen_waits_for_queued_speech(sink):
+    audio_io.configure(source=FakeAudioSource(phrases=["open my notes"]))
+    audio_io.speak("Which note?")
+    assert audio_io.listen() == "open my notes"
+    assert sink.spoken == [("Which note?", True)]
+
+
+def test_barge_in_cuts_playback_and_drops_queued_speech(sink):
+    audio_io.configure(source=FakeAudioSource(barge_ins=[(0.1, "stop and check the weather")]))
+    audio_io.speak(LONG_TEXT, interruptible=True)
+    audio_io.speak("queued after the answer")
+    audio_io.wait_for_speech()
+
+    assert audio_io.interrupted()
+    assert audio_io.listen() == "stop and check the weather"
+    assert not audio_io.interrupted()
+    assert sink.spoken == [(LONG_TEXT, False)]
+
+
+def test_interruptible_speech_plays_to_the_end_without_barge_in(sink):
+    audio_io.configure(source=FakeAudioSource(barge_ins=[None]))
+    audio_io.speak("short answer", interruptible=True, wait=True)
+    assert not audio_io.interrupted()
+    assert sink.spoken == [("short answer", True)]
+
+
+def test_barge_in_audio_is_recognized_again_when_the_service_was_unavailable(sink):
+    recording = b"recorded phrase"
+    audio_io.configure(source=FakeAudioSource(barge_ins=[(0.1, recording)],
+                                              transcripts={recording: "read my email"}))
+    audio_io.speak(LONG_TEXT, interruptible=True, wait=True)
+    assert audio_io.listen() == "read my email"